@@ -6,7 +6,8 @@ from db_core import (insert_express_order, query_express_order, update_express_o
                      insert_user, query_user,
                      insert_courier, query_courier, update_courier, delete_courier)
 from spatial_core import express_spatial_track
-from index_core import HashIndex
+from index_core import get_hash_index
+from phone_search_example import search_orders_by_phone_prefix
 from datetime import datetime
 
 # 导入可视化模块
@@ -241,8 +242,8 @@ class ExpressGUI:
         # 配置样式
         setup_styles()
         
-        # 初始化用户手机号散列索引
-        self.user_phone_index = HashIndex("User", "uphone")
+        # 用户手机号散列索引（进程内共享实例，增删改由db_core写路径增量维护）
+        self.user_phone_index = get_hash_index("User", "uphone")
         
         # 创建主布局
         self.create_layout()
@@ -734,7 +735,6 @@ class ExpressGUI:
             update_data = {k: v.get().strip() for k, v in var_dict.items() if v.get().strip()}
             if update_user(uid, update_data):
                 messagebox.showinfo("成功", "✅ 用户信息更新成功！")
-                self.user_phone_index.rebuild()
                 dialog.destroy()
             else:
                 messagebox.showerror("失败", "❌ 更新失败！")
@@ -774,7 +774,6 @@ class ExpressGUI:
                 return
             if delete_user(uid):
                 messagebox.showinfo("成功", "✅ 用户删除成功！")
-                self.user_phone_index.rebuild()
                 dialog.destroy()
             else:
                 messagebox.showerror("失败", "❌ 删除失败！")
@@ -1040,7 +1039,7 @@ class ExpressGUI:
     
     def show_query_order(self):
         """查询快递单对话框"""
-        dialog = self.create_dialog("🔍 查询快递单", 450, 280)
+        dialog = self.create_dialog("🔍 查询快递单", 450, 380)
         
         tk.Label(dialog,
                 text="查询快递单",
@@ -1053,10 +1052,14 @@ class ExpressGUI:
         
         order_id_var = tk.StringVar()
         status_var = tk.StringVar(value="全部")
+        phone_var = tk.StringVar()
+        phone_mode_var = tk.StringVar(value="尾号")
         
         self.create_form_field(form_frame, 0, "快递单号", order_id_var)
         self.create_form_field(form_frame, 1, "快递状态", status_var, "combobox",
                               ["全部", "0(待收件)", "1(已收件)", "2(中转中)", "3(派送中)", "4(已签收)", "5(异常)"])
+        self.create_form_field(form_frame, 2, "手机号", phone_var)
+        self.create_form_field(form_frame, 3, "匹配方式", phone_mode_var, "combobox", ["尾号", "前缀"])
         
         btn_frame = tk.Frame(dialog, bg=ThemeConfig.CARD_BG)
         btn_frame.pack(pady=30)
@@ -1067,7 +1070,15 @@ class ExpressGUI:
                 condition['orderId'] = order_id_var.get().strip()
             if status_var.get() != "全部":
                 condition['orderStatus'] = status_var.get().split('(')[0]
-            results = query_express_order(condition, use_index=True)
+            phone = phone_var.get().strip()
+            if phone:
+                # 按寄件人/收件人手机号尾号或前缀查询（走手机号Trie索引），再按其余条件过滤
+                results = search_orders_by_phone_prefix(phone, suffix=phone_mode_var.get() == "尾号")
+                results = [order for order in results
+                           if order['快递单号'] == condition.get('orderId', order['快递单号'])
+                           and order['快递状态'] == condition.get('orderStatus', order['快递状态'])]
+            else:
+                results = query_express_order(condition)
             self.update_tree_view(results)
             dialog.destroy()
         
@@ -0,0 +1,381 @@
+# archive_core.py
+"""
+冷数据归档：已签收（4）和异常（5）的快递单状态不会再变化（见 ORDER_STATUS_TRANSITIONS），
+归档任务把它们连同轨迹一起移出热表，写入只读压缩段（gzip/xz），热表只保留在途快递
+
+目录结构（ARCHIVE_DIR）：
+- seg-000001.orders.csv.gz / seg-000001.tracks.csv.gz：归档段（快递单与其轨迹在同一段号中）
+- segments.meta：段目录（格式同views.meta）
+- segments.stats：段汇总，每段按 (状态, 寄件网点, 目标网点, 寄件日期) 的快递单数（格式同views.meta）
+- ExpressOrder_orderId.idx：单号 -> 段号（文本格式，每行"单号,段号"，只追加）
+
+query_express_order 按单号查询、express_spatial_track 在热表未命中时自动回落到归档查询；
+统计（count_group_by、BranchMonthlySend、CourierDailyStats）同样计入归档的快递单：段只读，
+按段预先汇总后统计时无需解压；join_courier_orders 由段汇总定位到相关的段再解压读取；
+手机号前缀/尾号索引构建时包含归档的快递单，查询结果在热表未命中时从归档读取
+归档中途失败（段已登记、热表未重写）时，重新执行归档前这些快递单在统计中会被重复计入
+"""
+
+import csv
+import gzip
+import lzma
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+from db_core import (DATA_DIR, read_csv, write_csv, compact_table, rebuild_table_indexes, parse_time, format_time,
+                     _table_lock, _file_lock, _file_signature, _atomic_write, _condition_predicate)
+
+ARCHIVE_DIR = "database/archive"
+SEGMENTS_META_PATH = os.path.join(ARCHIVE_DIR, "segments.meta")
+SEGMENT_STATS_PATH = os.path.join(ARCHIVE_DIR, "segments.stats")
+ARCHIVE_INDEX_PATH = os.path.join(ARCHIVE_DIR, "ExpressOrder_orderId.idx")
+# 终态：已签收、异常
+ARCHIVE_STATUSES = ('4', '5')
+# 每段最多归档的快递单数（按单号查询时只需解压一个段）
+ARCHIVE_SEGMENT_ORDERS = 10000
+# 压缩格式：gz（解压快）或 xz（压缩率高）
+ARCHIVE_OPENERS = {'gz': gzip.open, 'xz': lzma.open}
+# 最近解压的段缓存（段只读，不会失效）
+ARCHIVE_SEGMENT_CACHE_SIZE = 4
+# 段汇总的维度列（寄件日期为sendTime的规范日期 YYYY-MM-DD，无法解析时为空）
+ARCHIVE_STATS_COLUMNS = ('orderStatus', 'sendBranchId', 'targetBranchId')
+
+_archive_index = None      # (签名, {单号: 段号})
+_segment_cache = OrderedDict()  # {(段号, 表): 行字典列表}
+_segment_stats = None      # (签名, {段号: {(状态, 寄件网点, 目标网点, 寄件日期): 快递单数}})
+
+
+# ==================== 段目录与单号索引 ====================
+
+def _load_segments():
+    """读取段目录，返回 {段号: {'orders': 文件名, 'tracks': 文件名}}"""
+    segments = {}
+    if not os.path.exists(SEGMENTS_META_PATH):
+        return segments
+    with open(SEGMENTS_META_PATH, 'r', encoding='utf-8') as f:
+        next(f, None)  # 跳过表头
+        for line in f:
+            parts = line.strip().split('|')
+            if len(parts) >= 3:
+                segments[int(parts[0])] = {'orders': parts[1], 'tracks': parts[2]}
+    return segments
+
+
+def _load_archive_index():
+    """加载单号索引 {单号: 段号}（按文件签名缓存）"""
+    global _archive_index
+    signature = _file_signature(ARCHIVE_INDEX_PATH)
+    if signature is None:
+        return {}
+    if _archive_index and _archive_index[0] == signature:
+        return _archive_index[1]
+    index = {}
+    with open(ARCHIVE_INDEX_PATH, 'r', encoding='utf-8') as f:
+        for line in f:
+            order_id, _, segment = line.strip().rpartition(',')
+            if order_id:
+                index[order_id] = int(segment)
+    _archive_index = (signature, index)
+    return index
+
+
+def archived_order_ids():
+    """返回已归档的全部快递单号集合（插入校验单号唯一性时使用）"""
+    return set(_load_archive_index())
+
+
+def is_archived(order_id):
+    """单号是否已归档（单条插入校验单号唯一性时使用）"""
+    return order_id in _load_archive_index()
+
+
+# ==================== 段读写 ====================
+
+def _write_segment(file_name, rows, fieldnames):
+    """写入一个压缩段（先写临时文件再重命名，写入中途失败不会留下残缺的段）"""
+    path = os.path.join(ARCHIVE_DIR, file_name)
+    opener = ARCHIVE_OPENERS[file_name.rsplit('.', 1)[1]]
+    tmp_path = path + '.tmp'
+    with opener(tmp_path, 'wt', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_segment(segment, table):
+    """解压读取段中的行（table为'orders'或'tracks'），最近使用的段保留在内存中"""
+    key = (segment, table)
+    if key in _segment_cache:
+        _segment_cache.move_to_end(key)
+        return _segment_cache[key]
+    file_name = _load_segments().get(segment, {}).get(table)
+    if not file_name:
+        return []
+    path = os.path.join(ARCHIVE_DIR, file_name)
+    try:
+        with ARCHIVE_OPENERS[file_name.rsplit('.', 1)[1]](path, 'rt', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+    except (OSError, EOFError, lzma.LZMAError) as e:
+        print(f"❌ 读取归档段{file_name}失败：{e}")
+        return []
+    _segment_cache[key] = rows
+    while len(_segment_cache) > ARCHIVE_SEGMENT_CACHE_SIZE:
+        _segment_cache.popitem(last=False)
+    return rows
+
+
+def get_archived_order(order_id):
+    """按单号查询归档的快递单，未归档返回None"""
+    segment = _load_archive_index().get(order_id)
+    if segment is None:
+        return None
+    return next((dict(row) for row in _read_segment(segment, 'orders') if row['orderId'] == order_id), None)
+
+
+def get_archived_tracks(order_id):
+    """按单号查询归档的快递轨迹，未归档返回空列表"""
+    segment = _load_archive_index().get(order_id)
+    if segment is None:
+        return []
+    return [dict(row) for row in _read_segment(segment, 'tracks') if row['orderId'] == order_id]
+
+
+def iter_archived_orders():
+    """按段顺序流式产出全部归档的快递单（不经过段缓存；构建索引、非汇总维度的统计时使用）"""
+    segments = _load_segments()
+    for segment in sorted(segments):
+        file_name = segments[segment]['orders']
+        path = os.path.join(ARCHIVE_DIR, file_name)
+        try:
+            with ARCHIVE_OPENERS[file_name.rsplit('.', 1)[1]](path, 'rt', encoding='utf-8', newline='') as f:
+                yield from csv.DictReader(f)
+        except (OSError, EOFError, lzma.LZMAError) as e:
+            print(f"❌ 读取归档段{file_name}失败：{e}")
+
+
+# ==================== 段汇总 ====================
+
+def _summarize(orders):
+    """一段快递单的汇总 {(状态, 寄件网点, 目标网点, 寄件日期): 快递单数}"""
+    summary = {}
+    for order in orders:
+        key = tuple(order.get(col) or '' for col in ARCHIVE_STATS_COLUMNS) + \
+            (format_time(parse_time(order.get('sendTime')))[:10],)
+        summary[key] = summary.get(key, 0) + 1
+    return summary
+
+
+def _write_segment_stats(stats):
+    """写入段汇总文件 {段号: 汇总}（先写临时文件再替换）"""
+    def write(f):
+        f.write('|'.join(('segment',) + ARCHIVE_STATS_COLUMNS + ('sendDate', 'count')) + '\n')
+        for segment in sorted(stats):
+            for key, count in stats[segment].items():
+                f.write('|'.join((str(segment),) + key + (str(count),)) + '\n')
+    _atomic_write(SEGMENT_STATS_PATH, write, 'utf-8')
+
+
+def _load_segment_stats():
+    """
+    加载段目录中已登记的段的汇总 {段号: 汇总}（按文件签名缓存）
+    早于段汇总归档的段缺少汇总：解压统计一次并写回
+    """
+    global _segment_stats
+    signature = (_file_signature(SEGMENTS_META_PATH), _file_signature(SEGMENT_STATS_PATH))
+    if _segment_stats and _segment_stats[0] == signature:
+        return _segment_stats[1]
+    segments = _load_segments()
+    stats = {}
+    if os.path.exists(SEGMENT_STATS_PATH):
+        with open(SEGMENT_STATS_PATH, 'r', encoding='utf-8') as f:
+            next(f, None)  # 跳过表头
+            for line in f:
+                parts = line.rstrip('\n').split('|')
+                if len(parts) == len(ARCHIVE_STATS_COLUMNS) + 3 and int(parts[0]) in segments:
+                    summary = stats.setdefault(int(parts[0]), {})
+                    summary[tuple(parts[1:-1])] = int(parts[-1])
+    missing = [segment for segment in segments if segment not in stats]
+    if missing:
+        with _file_lock(SEGMENT_STATS_PATH).exclusive():
+            for segment in missing:
+                stats[segment] = _summarize(_read_segment(segment, 'orders'))
+            _write_segment_stats(stats)
+        signature = (_file_signature(SEGMENTS_META_PATH), _file_signature(SEGMENT_STATS_PATH))
+    _segment_stats = (signature, stats)
+    return stats
+
+
+def archived_group_counts(column, condition=None):
+    """
+    归档快递单的分组计数 {值: 快递单数}（count_group_by 计入归档时使用）
+    分组列和条件列都是段汇总的维度列时由段汇总得出，否则解压扫描全部归档段
+    """
+    condition = condition or {}
+    counts = {}
+    if column in ARCHIVE_STATS_COLUMNS and all(col in ARCHIVE_STATS_COLUMNS for col in condition):
+        pos = ARCHIVE_STATS_COLUMNS.index(column)
+        wanted = [(ARCHIVE_STATS_COLUMNS.index(col), value) for col, value in condition.items()]
+        for summary in _load_segment_stats().values():
+            for key, count in summary.items():
+                if all(key[i] == value for i, value in wanted):
+                    counts[key[pos]] = counts.get(key[pos], 0) + count
+        return counts
+    match = _condition_predicate(condition)
+    for order in iter_archived_orders():
+        if match(order):
+            value = order.get(column) or ''
+            counts[value] = counts.get(value, 0) + 1
+    return counts
+
+
+def archived_send_counts():
+    """归档快递单按 (寄件网点, 年月) 的寄件量（由段汇总得出，寄件时间无法解析的不计）"""
+    counts = {}
+    for summary in _load_segment_stats().values():
+        for (_, branch_id, _, send_date), count in summary.items():
+            if send_date:
+                key = (branch_id, send_date[:7])
+                counts[key] = counts.get(key, 0) + count
+    return counts
+
+
+def _delivery_keys(summary, branch_ids, statuses, period):
+    """段汇总中目标网点在branch_ids、状态在statuses、寄件日期落在period内的项"""
+    for key, count in summary.items():
+        status, _, branch_id, send_date = key
+        if status in statuses and branch_id in branch_ids and send_date:
+            if period is None or period[0] <= parse_time(send_date) < period[1]:
+                yield key, count
+
+
+def archived_delivery_counts(branch_ids, statuses, period=None):
+    """
+    归档快递单按 (目标网点, 寄件日期) 的派送量（由段汇总得出，CourierDailyStats 计入归档时使用）
+    :param period: (start, end) epoch秒区间，None表示不限
+    """
+    counts = {}
+    for summary in _load_segment_stats().values():
+        for (_, _, branch_id, send_date), count in _delivery_keys(summary, set(branch_ids), statuses, period):
+            counts[(branch_id, send_date)] = counts.get((branch_id, send_date), 0) + count
+    return counts
+
+
+def archived_delivery_orders(branch_ids, statuses, period=None):
+    """
+    归档的目标网点在branch_ids、状态在statuses、寄件时间落在period内的快递单（join_courier_orders 使用）
+    由段汇总定位到含有这类快递单的段，只解压这些段
+    """
+    branch_ids = set(branch_ids)
+    results = []
+    for segment, summary in sorted(_load_segment_stats().items()):
+        if next(_delivery_keys(summary, branch_ids, statuses, period), None) is None:
+            continue
+        for order in _read_segment(segment, 'orders'):
+            epoch = parse_time(order.get('sendTime'))
+            if order.get('targetBranchId') in branch_ids and order.get('orderStatus') in statuses and \
+                    epoch is not None and (period is None or period[0] <= epoch < period[1]):
+                results.append(dict(order))
+    return results
+
+
+# ==================== 归档任务 ====================
+
+def archive_orders(statuses=ARCHIVE_STATUSES, compression='gz', segment_orders=ARCHIVE_SEGMENT_ORDERS):
+    """
+    将终态快递单及其轨迹移入归档段，并从热表中删除
+    顺序：写段 -> 更新段目录 -> 追加单号索引 -> 重写热表（中途失败时数据至多同时存在于两层，
+    查询优先命中热表；重新执行时已归档的单号不会重复写入段）
+    :param statuses: 需要归档的状态
+    :param compression: 'gz' 或 'xz'
+    :param segment_orders: 每段最多的快递单数
+    :return: {'orders': 归档快递单数, 'tracks': 归档轨迹数, 'segments': 新增段数}
+    """
+    if compression not in ARCHIVE_OPENERS:
+        print(f"错误：不支持的压缩格式{compression}（支持：{', '.join(ARCHIVE_OPENERS)}）")
+        return None
+    order_path = f"{DATA_DIR}/ExpressOrder.csv"
+    track_path = f"{DATA_DIR}/ExpressTrack.csv"
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+
+    # 归档期间锁住两张热表：不会有新的更新落到正在归档的快递单上
+    with _table_lock(order_path), _file_lock(order_path).exclusive(), \
+            _table_lock(track_path), _file_lock(track_path).exclusive(), \
+            _file_lock(ARCHIVE_INDEX_PATH).exclusive():
+        orders = read_csv(order_path)  # 已合并变更日志
+        tracks = read_csv(track_path)
+        archived_index = _load_archive_index()
+        terminal = [order for order in orders if order.get('orderStatus') in statuses]
+        terminal_ids = {order['orderId'] for order in terminal}
+        # 上次归档中途失败时，已归档快递单的轨迹可能仍留在热表中，一并清理
+        stale_tracks = any(track.get('orderId') in archived_index for track in tracks)
+        if not terminal and not stale_tracks:
+            print("ℹ️ 没有需要归档的快递单")
+            return {'orders': 0, 'tracks': 0, 'segments': 0}
+        pending = [order for order in terminal if order['orderId'] not in archived_index]
+
+        # 1. 写归档段（段内快递单与其轨迹段号相同）
+        segments = _load_segments()
+        next_segment = max(segments, default=0) + 1
+        order_fields = list(orders[0].keys()) if orders else []
+        track_fields = list(tracks[0].keys()) if tracks else ['orderId']
+        tracks_by_order = {}
+        for track in tracks:
+            if track.get('orderId') in terminal_ids:
+                tracks_by_order.setdefault(track['orderId'], []).append(track)
+        new_segments, index_lines, summaries = [], [], {}
+        for i in range(0, len(pending), segment_orders):
+            chunk = pending[i:i + segment_orders]
+            segment = next_segment + len(new_segments)
+            chunk_tracks = [t for order in chunk for t in tracks_by_order.get(order['orderId'], [])]
+            names = (f"seg-{segment:06d}.orders.csv.{compression}", f"seg-{segment:06d}.tracks.csv.{compression}")
+            _write_segment(names[0], chunk, order_fields)
+            _write_segment(names[1], chunk_tracks, track_fields)
+            new_segments.append((segment, names, len(chunk), len(chunk_tracks)))
+            index_lines.extend(f"{order['orderId']},{segment}\n" for order in chunk)
+            summaries[segment] = _summarize(chunk)
+
+        # 2. 写段汇总（只保留已登记的段，上次失败留下的未登记段的汇总随之清除），更新段目录，
+        #    再追加单号索引（索引只指向目录中已登记的段）
+        stats = _load_segment_stats()
+        with _file_lock(SEGMENT_STATS_PATH).exclusive():
+            _write_segment_stats({**stats, **summaries})
+        create_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        def write_meta(f):
+            f.write("segment|orderFile|trackFile|orderCount|trackCount|createTime\n")
+            if os.path.exists(SEGMENTS_META_PATH):
+                with open(SEGMENTS_META_PATH, 'r', encoding='utf-8') as old:
+                    next(old, None)
+                    f.writelines(old)
+            for segment, names, n_orders, n_tracks in new_segments:
+                f.write(f"{segment}|{names[0]}|{names[1]}|{n_orders}|{n_tracks}|{create_time}\n")
+        _atomic_write(SEGMENTS_META_PATH, write_meta, 'utf-8')
+        with open(ARCHIVE_INDEX_PATH, 'a', encoding='utf-8') as f:
+            f.writelines(index_lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # 3. 从热表移除（快递单表同时合并变更日志；轨迹表整表重写一次）
+        if terminal and not compact_table(order_path, keep=lambda order: order['orderId'] not in terminal_ids):
+            print("❌ 热表重写失败：已归档的快递单暂时仍保留在热表中，可重新执行归档")
+            return None
+        archived_ids = terminal_ids | set(archived_index)
+        if not write_csv(track_path, [t for t in tracks if t.get('orderId') not in archived_ids], mode='w'):
+            print("❌ 轨迹表重写失败：已归档的轨迹暂时仍保留在热表中，可重新执行归档")
+            return None
+    rebuild_table_indexes("ExpressTrack")
+
+    stats = {'orders': len(terminal), 'tracks': sum(len(v) for v in tracks_by_order.values()),
+             'segments': len(new_segments)}
+    print(f"✅ 归档完成：{stats['orders']}条快递单、{stats['tracks']}条轨迹，新增{stats['segments']}个归档段")
+    return stats
+
+
+if __name__ == "__main__":
+    import sys
+    # 命令行：python archive_core.py [gz|xz]
+    archive_orders(compression=sys.argv[1] if len(sys.argv) > 1 else 'gz')
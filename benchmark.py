@@ -0,0 +1,166 @@
+# benchmark.py
+# 存储层性能基准测试（在临时目录中的数据副本上运行，不修改 database/ 下的真实数据）
+#
+# 用法：
+#   python benchmark.py concurrency [--writers 2] [--readers 4] [--seconds 5]
+#       多进程并发读写：写进程交替追加和整表重写，读进程反复整表读取，
+#       统计吞吐量并检查读者是否读到残缺的表
+#   python benchmark.py rows [--count 100000]
+#       生成count行快递单，比较 read_csv 字符串字典与 typed_rows 类型化记录
+#       的每行内存占用（tracemalloc）和加载时间
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import db_core
+
+
+def _prepare_workspace():
+    """复制ExpressOrder表到临时目录，返回(临时目录, 表路径)"""
+    workspace = tempfile.mkdtemp(prefix="ts2_bench_")
+    table_path = os.path.join(workspace, "ExpressOrder.csv")
+    shutil.copy(os.path.join(db_core.DATA_DIR, "ExpressOrder.csv"), table_path)
+    return workspace, table_path
+
+
+def _writer(table_path, lock_dir, seconds, worker_id, result_queue):
+    """写进程：每追加9行做一次整表重写（模拟合并），返回写入次数"""
+    db_core.LOCK_DIR = lock_dir
+    ops = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        if ops % 10 == 9:
+            rows = db_core.read_csv(table_path)
+            db_core.write_csv(table_path, rows, mode='w')
+        else:
+            db_core.write_csv(table_path, {
+                'orderId': f"BENCH{worker_id}_{ops}", 'senderId': 'U001', 'receiverId': 'U002',
+                'goodsName': '基准测试', 'goodsWeight': '1', 'sendBranchId': 'B001',
+                'targetBranchId': 'B002', 'sendTime': '2024-12-15 08:00:00',
+                'estimatedTime': '2024-12-17 18:00:00', 'orderStatus': '0'
+            })
+        ops += 1
+    result_queue.put(('writer', ops, 0))
+
+
+def _reader(table_path, lock_dir, seconds, result_queue):
+    """读进程：关闭表缓存后反复整表读取，统计读到残缺行（字段缺失）的次数"""
+    db_core.LOCK_DIR = lock_dir
+    db_core.set_table_cache_budget(0)
+    ops = torn = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        rows = db_core.read_csv(table_path, apply_log=False)
+        if not rows or any(None in row.values() or None in row for row in rows):
+            torn += 1
+        ops += 1
+    result_queue.put(('reader', ops, torn))
+
+
+def bench_concurrency(writers, readers, seconds):
+    """并发读写基准：返回{'writes_per_sec', 'reads_per_sec', 'torn_reads'}"""
+    workspace, table_path = _prepare_workspace()
+    lock_dir = os.path.join(workspace, "lock")
+    # spawn：子进程各自打开锁文件，不继承父进程的文件描述符
+    ctx = multiprocessing.get_context('spawn')
+    result_queue = ctx.Queue()
+    procs = [ctx.Process(target=_writer, args=(table_path, lock_dir, seconds, i, result_queue))
+             for i in range(writers)]
+    procs += [ctx.Process(target=_reader, args=(table_path, lock_dir, seconds, result_queue))
+              for _ in range(readers)]
+    try:
+        for p in procs:
+            p.start()
+        results = [result_queue.get() for _ in procs]
+        for p in procs:
+            p.join()
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    writes = sum(ops for kind, ops, _ in results if kind == 'writer')
+    reads = sum(ops for kind, ops, _ in results if kind == 'reader')
+    torn = sum(t for kind, _, t in results if kind == 'reader')
+    stats = {
+        'writes_per_sec': round(writes / seconds, 1),
+        'reads_per_sec': round(reads / seconds, 1),
+        'torn_reads': torn
+    }
+    print(f"并发读写（{writers}写/{readers}读，{seconds}秒）：")
+    print(f"  写入 {stats['writes_per_sec']} 次/秒，读取 {stats['reads_per_sec']} 次/秒，"
+          f"残缺读取 {stats['torn_reads']} 次")
+    return stats
+
+
+def _synthesize_orders(table_path, count):
+    """生成count行快递单（网点/用户/物品取值高度重复，接近真实分布）"""
+    header, _ = db_core._read_fieldnames(os.path.join(db_core.DATA_DIR, "ExpressOrder.csv"))
+    goods = ['手机', '衣服', '书籍', '电脑', '食品', '化妆品']
+    with open(table_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(','.join(header) + '\n')
+        for i in range(count):
+            day = 1 + i % 28
+            f.write(f"EO{i:08d},U{i % 5000:04d},U{(i * 7) % 5000:04d},{goods[i % len(goods)]},"
+                    f"{(i % 200) / 10:g},B{i % 50:03d},B{(i * 3) % 50:03d},"
+                    f"2024-12-{day:02d} 08:{i % 60:02d}:00,2024-12-{day:02d} 18:00:00,{i % 6}\n")
+
+
+def _measure(load):
+    """返回(耗时秒, 结果占用字节)；计时与内存统计分两次加载，避免tracemalloc拖慢计时"""
+    start = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = load()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, size
+
+
+def bench_rows(count):
+    """行表示基准：比较字符串字典与类型化记录的内存和加载时间"""
+    from typed_rows import ExpressOrderRecord
+
+    workspace = tempfile.mkdtemp(prefix="ts2_bench_")
+    table_path = os.path.join(workspace, "ExpressOrder.csv")
+    db_core.set_table_cache_budget(0)
+    try:
+        _synthesize_orders(table_path, count)
+        dict_time, dict_bytes = _measure(lambda: db_core.read_csv(table_path))
+        typed_time, typed_bytes = _measure(
+            lambda: [ExpressOrderRecord(row) for row in db_core.iter_csv(table_path)])
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    stats = {
+        'dict_bytes_per_row': round(dict_bytes / count),
+        'typed_bytes_per_row': round(typed_bytes / count),
+        'dict_load_sec': round(dict_time, 3),
+        'typed_load_sec': round(typed_time, 3),
+    }
+    print(f"快递单行表示（{count}行）：")
+    print(f"  字典：{stats['dict_bytes_per_row']} 字节/行，加载 {stats['dict_load_sec']} 秒")
+    print(f"  类型化记录：{stats['typed_bytes_per_row']} 字节/行，加载 {stats['typed_load_sec']} 秒")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="存储层性能基准测试")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("concurrency", help="多进程并发读写吞吐量与一致性")
+    p.add_argument("--writers", type=int, default=2)
+    p.add_argument("--readers", type=int, default=4)
+    p.add_argument("--seconds", type=float, default=5)
+    p = sub.add_parser("rows", help="字典与类型化记录的内存/加载时间对比")
+    p.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.command == "concurrency":
+        bench_concurrency(args.writers, args.readers, args.seconds)
+    elif args.command == "rows":
+        bench_rows(args.count)
@@ -0,0 +1,300 @@
+# bulk_loader.py
+"""
+大批量导入：新区域上线时把GB级的 User / ExpressOrder / ExpressTrack CSV导出文件导入数据表
+
+逐批 insert_* 每次都要整表读取键集合并重建索引，这种规模下需要数小时。这里分三步流水线处理：
+1. 源文件按行边界切块（默认16MB），由 ProcessPoolExecutor 多进程并行解码、解析和校验；
+   外键在预先构建的键集合上校验（寄件人/收件人 -> User.uid，网点 -> ExpressBranch.branchId，
+   轨迹单号 -> ExpressOrder.orderId 或已归档的快递单号）
+2. 主进程按块的原始顺序依次写入目标表，每块一次 write_csv（分区表、sqlite存储引擎仍由write_csv分发），
+   主键唯一性在这里跨块校验
+3. 表上已登记的索引在写入的同一遍中并入新行，不再重新扫描整表：各类行号索引由write_csv按块记入增量；
+   表已分区时散列、文本索引只在导入结束时整体重建一次，其余行号索引在下次查询时重建；
+   手机号前缀/尾号索引按单号而非行号索引，每块写入后直接追加增量
+
+切块只在换行处进行，源文件的字段内不能含换行（导出文件满足该条件；否则被切开的行因字段数不符被拒绝）
+
+命令行：python bulk_loader.py <表名> <源文件> [--workers N] [--chunk-mb 16]
+"""
+
+import argparse
+import codecs
+import csv
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from db_core import (DATA_DIR, PRIMARY_KEYS, ORDER_REQUIRED_FIELDS, CSV_ENCODINGS,
+                     iter_csv, write_csv, deferred_index_rebuild, _user_error, _batch_result,
+                     _read_fieldnames, _phone_tries, _order_phones)
+
+BULK_CHUNK_BYTES = 16 * 1024 * 1024
+# 探测源文件编码时读取的字节数
+SNIFF_BYTES = 1 << 20
+
+_worker_context = None  # 工作进程内的校验上下文（由 _init_worker 设置）
+
+
+# ==================== 行校验（在工作进程中执行） ====================
+# 规则与 insert_users / insert_express_orders / generate_express_tracks 一致，返回错误信息（合法时返回None）
+
+def _user_row_error(record, keys, now):
+    return _user_error(record)
+
+
+def _order_row_error(record, keys, now):
+    record.setdefault('sendTime', now)
+    record.setdefault('orderStatus', '0')  # 0=待收件
+    if not all(field in record for field in ORDER_REQUIRED_FIELDS):
+        return "缺少必填字段"
+    if record['senderId'] not in keys['uids'] or record['receiverId'] not in keys['uids']:
+        return "寄件人或收件人不存在（uid未在User表中）"
+    if record['sendBranchId'] not in keys['branches'] or record['targetBranchId'] not in keys['branches']:
+        return "寄件网点或目标网点不存在（branchId未在ExpressBranch表中）"
+    return None
+
+
+def _track_row_error(record, keys, now):
+    record['prevBranchId'] = record.get('prevBranchId') or 'NULL'
+    record['nextBranchId'] = record.get('nextBranchId') or 'NULL'
+    record['operateTime'] = record.get('operateTime') or now
+    if not all(record.get(field) for field in ('orderId', 'operateBranchId', 'operateType')):
+        return "缺少必填字段（orderId/operateBranchId/operateType）"
+    if record['operateType'] not in ['0', '1', '2', '3', '4']:
+        return f"操作类型错误：{record['operateType']}（应为0-4）"
+    if record['orderId'] not in keys['orders']:
+        return "快递单不存在（orderId未在ExpressOrder表和归档中）"
+    if any(b != 'NULL' and b not in keys['branches']
+           for b in (record['operateBranchId'], record['prevBranchId'], record['nextBranchId'])):
+        return "网点不存在（branchId未在ExpressBranch表中）"
+    return None
+
+
+# 支持导入的表：{表名: (行校验函数, 结果中报告的键列)}
+BULK_TABLES = {
+    'User': (_user_row_error, 'uid'),
+    'ExpressOrder': (_order_row_error, 'orderId'),
+    'ExpressTrack': (_track_row_error, 'orderId'),
+}
+
+
+def _init_worker(table_name, header, columns, encoding, keys):
+    """工作进程初始化：外键集合每个进程只传递一次"""
+    global _worker_context
+    _worker_context = {'table': table_name, 'header': header, 'columns': columns,
+                       'encoding': encoding, 'keys': keys}
+
+
+def _parse_chunk(source_path, start, end):
+    """
+    解码、解析并校验源文件 [start, end) 字节范围内的行
+    :return: (数据行数, 通过的行 [(块内序号, 按目标表列序的值列表)], 拒绝的行 [(块内序号, 键, 原因)])
+    """
+    ctx = _worker_context
+    header, columns, keys = ctx['header'], ctx['columns'], ctx['keys']
+    validate, report_col = BULK_TABLES[ctx['table']]
+    with open(source_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    try:
+        text = data.decode(ctx['encoding'])
+    except UnicodeDecodeError as e:
+        count = sum(1 for line in data.splitlines() if line.strip())
+        return count, [], [(i, None, f"源文件解码失败（{ctx['encoding']}）：{e}") for i in range(count)]
+
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    accepted, rejected = [], []
+    count = 0
+    for values in csv.reader(io.StringIO(text, newline='')):
+        if not values:
+            continue  # 空行（与csv.DictReader相同，不计行号）
+        i, count = count, count + 1
+        record = dict(zip(header, values))
+        if len(values) != len(header):
+            rejected.append((i, record.get(report_col), "字段数与表头不一致"))
+            continue
+        error = validate(record, keys, now)
+        if error:
+            rejected.append((i, record.get(report_col), error))
+        else:
+            accepted.append((i, [record.get(col, 'NULL') for col in columns]))
+    return count, accepted, rejected
+
+
+# ==================== 源文件切块 ====================
+
+def _read_source_header(source_path):
+    """读取源文件表头，返回(编码, 列名列表, 数据起始字节偏移)；编码按开头一段探测"""
+    with open(source_path, 'rb') as f:
+        first = f.readline()
+        sample = first + f.read(SNIFF_BYTES)
+    for encoding in CSV_ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample)  # 末尾被截断的多字节字符不算失败
+        except UnicodeDecodeError:
+            continue
+        header_encoding = 'utf-8-sig' if encoding == 'utf-8' else encoding
+        header = next(csv.reader([first.decode(header_encoding)]), [])
+        return encoding, [col.strip() for col in header], len(first)
+    return None, None, None
+
+
+def _split_chunks(source_path, start, chunk_bytes):
+    """从start开始按约chunk_bytes切块，块边界对齐到换行之后，返回[(起始偏移, 结束偏移)]"""
+    size = os.path.getsize(source_path)
+    chunks = []
+    with open(source_path, 'rb') as f:
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()  # 读到本行末尾
+            end = min(f.tell(), size)
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+def _reference_keys(table_name):
+    """预先构建外键校验使用的键集合"""
+    keys = {}
+    if table_name in ('ExpressOrder', 'ExpressTrack'):
+        keys['branches'] = {b['branchId'] for b in iter_csv(f"{DATA_DIR}/ExpressBranch.csv", columns=['branchId'])}
+    if table_name == 'ExpressOrder':
+        keys['uids'] = {user['uid'] for user in iter_csv(f"{DATA_DIR}/User.csv", columns=['uid'])}
+    if table_name == 'ExpressTrack':
+        from archive_core import archived_order_ids
+        # 已归档快递单的轨迹同样可以导入（轨迹查询在热表未命中时读取归档，见 spatial_core）
+        keys['orders'] = {o['orderId'] for o in iter_csv(f"{DATA_DIR}/ExpressOrder.csv", columns=['orderId'])}
+        keys['orders'] |= archived_order_ids()
+    return keys
+
+
+# ==================== 写入与索引维护 ====================
+
+class _IndexFeed:
+    """
+    顺序写入目标表：表上已登记的索引由write_csv逐块增量维护（新行追加在基础表末尾，行号从写入前的行数顺延），
+    快递单的寄件人/收件人手机号逐块追加到手机号前缀/尾号索引的增量中
+    分区表（追加会使后续分区的行号整体后移）的散列、文本索引在导入结束后整体重建一次，其余行号索引按基础表签名
+    在下次查询时重建；存储引擎接管的表由引擎维护索引
+    """
+
+    def __init__(self, table_name, file_path, columns):
+        self.file_path = file_path
+        self.columns = columns
+        # 手机号前缀/尾号索引（不依赖行号，分区表和存储引擎接管的表同样逐块维护）
+        self.tries = _phone_tries() if table_name == 'ExpressOrder' else []
+        self.uid_to_phone = {user['uid']: user['uphone'] for user in
+                             iter_csv(f"{DATA_DIR}/User.csv", columns=['uid', 'uphone'])} if self.tries else None
+
+    def write(self, records):
+        """写入一块记录（值列表按目标表列序），返回是否成功"""
+        written = [dict(zip(self.columns, values)) for values in records]
+        if not write_csv(self.file_path, written):
+            return False
+        if self.tries:
+            added = [(order['orderId'], _order_phones(order, self.uid_to_phone)) for order in written]
+            for trie in self.tries:
+                trie.add_orders(added)
+        return True
+
+
+# ==================== 导入入口 ====================
+
+def bulk_load(table_name, source_path, workers=None, chunk_bytes=BULK_CHUNK_BYTES):
+    """
+    从CSV导出文件大批量导入数据表（源文件表头须包含目标表的列名，缺失的列补NULL或默认值）
+    :param table_name: 目标表（User / ExpressOrder / ExpressTrack）
+    :param source_path: 源CSV文件路径（编码自动探测）
+    :param workers: 解析进程数，默认为CPU核数
+    :param chunk_bytes: 每块的字节数
+    :return: {'rows': 源数据行数, 'accepted': 写入行数, 'rejected': 拒绝行数, 'seconds': 耗时,
+              'rows_per_sec': 每秒处理行数, 'errors': 被拒绝行的处理结果（格式同批量插入接口，row从0开始）}；
+             无法导入时返回None
+    """
+    if table_name not in BULK_TABLES:
+        print(f"错误：不支持批量导入表{table_name}（支持：{', '.join(BULK_TABLES)}）")
+        return None
+    if not os.path.exists(source_path):
+        print(f"错误：源文件{source_path}不存在")
+        return None
+    file_path = f"{DATA_DIR}/{table_name}.csv"
+    columns, _ = _read_fieldnames(file_path)
+    if columns is None:
+        print(f"错误：无法读取文件{file_path}的列名")
+        return None
+    encoding, header, data_start = _read_source_header(source_path)
+    if not header or BULK_TABLES[table_name][1] not in header:
+        print(f"错误：源文件{source_path}表头无法识别或缺少{BULK_TABLES[table_name][1]}列")
+        return None
+
+    key_col = PRIMARY_KEYS.get(table_name)
+    existing = set() if key_col is None else {r[key_col] for r in iter_csv(file_path, columns=[key_col])}
+    if table_name == 'ExpressOrder':
+        from archive_core import archived_order_ids
+        existing |= archived_order_ids()  # 单号在归档中同样必须唯一
+    key_idx = columns.index(key_col) if key_col in columns else None
+    chunks = _split_chunks(source_path, data_start, chunk_bytes)
+    workers = workers or os.cpu_count() or 1
+    feed = _IndexFeed(table_name, file_path, columns)
+    stats = {'rows': 0, 'accepted': 0, 'rejected': 0}
+    errors = []
+    started = time.perf_counter()
+
+    def write_chunk(result):
+        count, rows, rejects = result
+        base = stats['rows']  # 本块第一行的全局序号
+        errors.extend(_batch_result(base + i, key, error) for i, key, error in rejects)
+        records = []
+        for i, values in rows:
+            if key_idx is not None:
+                if values[key_idx] in existing:
+                    errors.append(_batch_result(base + i, values[key_idx], f"{key_col}已存在（主键必须唯一）"))
+                    continue
+                existing.add(values[key_idx])
+            records.append((i, values))
+        if records and not feed.write([values for _, values in records]):
+            errors.extend(_batch_result(base + i, values[key_idx] if key_idx is not None else None, "写入失败")
+                          for i, values in records)
+            records = []
+        stats['rows'] += count
+        stats['accepted'] += len(records)
+        stats['rejected'] = stats['rows'] - stats['accepted']
+        rate = stats['rows'] / max(time.perf_counter() - started, 1e-9)
+        print(f"  {table_name}：已处理{stats['rows']}行，写入{stats['accepted']}行，"
+              f"拒绝{stats['rejected']}行（{rate:.0f}行/秒）")
+
+    # 结果按块顺序消费；同时在途的块数有上限，避免解析远快于写入时结果堆积在内存中
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(table_name, header, columns, encoding, _reference_keys(table_name))) as pool, \
+            deferred_index_rebuild():
+        pending = deque()
+        for start, end in chunks:
+            pending.append(pool.submit(_parse_chunk, source_path, start, end))
+            if len(pending) >= workers * 2:
+                write_chunk(pending.popleft().result())
+        while pending:
+            write_chunk(pending.popleft().result())
+
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    stats['rows_per_sec'] = round(stats['rows'] / max(stats['seconds'], 1e-9))
+    stats['errors'] = sorted(errors, key=lambda result: result['row'])
+    print(f"✅ 批量导入{table_name}完成：{stats['rows']}行，写入{stats['accepted']}行，拒绝{stats['rejected']}行，"
+          f"耗时{stats['seconds']}秒（{stats['rows_per_sec']}行/秒）")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="大批量导入CSV导出文件")
+    parser.add_argument("table", choices=list(BULK_TABLES))
+    parser.add_argument("source")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-mb", type=float, default=BULK_CHUNK_BYTES / (1024 * 1024))
+    args = parser.parse_args()
+    result = bulk_load(args.table, args.source, workers=args.workers,
+                       chunk_bytes=int(args.chunk_mb * 1024 * 1024))
+    if result:
+        for error in result['errors'][:20]:
+            print(f"  第{error['row']}行（{error['key']}）：{error['error']}")
@@ -1,8 +1,23 @@
 # db_core.py
 
 
+import calendar
 import csv
+import io
+import mmap
 import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime
 
 
@@ -21,29 +36,1025 @@ ORDER_STATUS_MAP = {
     '5': '异常'
 }
 
-# db_core.py 中修改 read_csv 函数
-def read_csv(file_path):
-    """通用读取CSV文件，返回字典列表（增加编码兼容）"""
-    # 定义常见编码列表（按优先级尝试）
-    encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1']
-    
-    for encoding in encodings:
+# -------------------------- 时间解析 --------------------------
+# 数据中同时存在「2024/12/10 8:30」与「2024-12-10 08:30:00」两种写法，统一换算为epoch秒
+DATA_UTC_OFFSET = 8 * 3600  # 数据时间按东八区解释
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+@lru_cache(maxsize=4096)
+def _date_epoch(date_part):
+    """日期部分（YYYY-MM-DD 或 YYYY/M/D）转为当天零点的UTC epoch秒，无法解析返回None"""
+    try:
+        year, month, day = map(int, date_part.replace('/', '-').split('-'))
+    except ValueError:
+        return None
+    if not (1 <= year and 1 <= month <= 12 and 1 <= day <= calendar.monthrange(year, month)[1]):
+        return None  # 按当月实际天数校验（如2024-02-31无效，不顺延到3月）
+    return calendar.timegm((year, month, day, 0, 0, 0))
+
+
+def parse_time(value):
+    """
+    解析时间字符串为epoch秒（整数），兼容 / 与 - 分隔、时分秒可省略或不补零
+    :return: epoch秒，空值或无法解析时返回None
+    """
+    if not value:
+        return None
+    date_part, _, time_part = value.strip().partition(' ')
+    day_epoch = _date_epoch(date_part)  # 同一天的时间大量重复，日期部分走缓存
+    if day_epoch is None:
+        return None
+    try:
+        hms = [int(x) for x in time_part.split(':')] if time_part else []
+    except ValueError:
+        return None
+    hms += [0] * (3 - len(hms))
+    if not (len(hms) == 3 and 0 <= hms[0] < 24 and 0 <= hms[1] < 60 and 0 <= hms[2] < 60):
+        return None
+    return day_epoch + hms[0] * 3600 + hms[1] * 60 + hms[2] - DATA_UTC_OFFSET
+
+
+def period_range(period):
+    """
+    日期/月份转为epoch秒区间 [start, end)
+    :param period: 'YYYY-MM-DD'（或 'YYYY/M/D'）表示一天，'YYYY-MM'（或 'YYYY/M'）表示一个月
+    :return: (start, end)，无法解析时返回None
+    """
+    parts = (period or '').strip().replace('/', '-').split('-')
+    if len(parts) == 3:
+        start = parse_time(period)
+        return None if start is None else (start, start + 86400)
+    if len(parts) == 2 and all(p.isdigit() for p in parts) and 1 <= int(parts[1]) <= 12:
+        year, month = int(parts[0]), int(parts[1])
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return (calendar.timegm((year, month, 1, 0, 0, 0)) - DATA_UTC_OFFSET,
+                calendar.timegm((next_year, next_month, 1, 0, 0, 0)) - DATA_UTC_OFFSET)
+    return None
+
+
+def format_time(epoch):
+    """epoch秒格式化为规范时间字符串（YYYY-MM-DD HH:MM:SS），None返回空字符串"""
+    if epoch is None:
+        return ''
+    return time.strftime(TIME_FORMAT, time.gmtime(epoch + DATA_UTC_OFFSET))
+
+
+# -------------------------- 文件锁（跨进程读写锁）--------------------------
+try:
+    import fcntl  # POSIX建议锁；Windows下没有fcntl，退化为仅进程内加锁
+except ImportError:
+    fcntl = None
+
+# 锁文件目录（数据文件通过原子重命名替换，锁不能加在数据文件本身上）
+LOCK_DIR = "database/lock"
+
+
+class FileLock:
+    """
+    数据文件读写锁：进程内用条件变量协调线程，进程间用fcntl.flock建议锁
+    （读者共享锁，写者排他锁）。每个进程对同一文件只打开一个锁文件句柄
+    同一线程可重入：持有排他锁时可再加共享锁，持有共享锁时可升级为排他锁
+    """
+
+    def __init__(self, file_path):
+        self.lock_path = os.path.join(LOCK_DIR, os.path.basename(file_path) + '.lock')
+        self._cond = threading.Condition()
+        self._fd = None
+        self._readers = {}      # {线程ID: 共享锁重入次数}
+        self._writer = None     # 持有排他锁的线程ID
+        self._writer_depth = 0
+
+    def _flock(self, mode):
+        """对锁文件加锁/解锁：mode为'sh'、'ex'或'un'"""
+        if fcntl is None:
+            return
+        if self._fd is None:
+            os.makedirs(LOCK_DIR, exist_ok=True)
+            self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, {'sh': fcntl.LOCK_SH, 'ex': fcntl.LOCK_EX, 'un': fcntl.LOCK_UN}[mode])
+
+    @contextmanager
+    def shared(self):
+        """共享锁（读者）"""
+        me = threading.get_ident()
+        with self._cond:
+            while self._writer not in (None, me):
+                self._cond.wait()
+            if self._writer is None and not self._readers:
+                self._flock('sh')
+            self._readers[me] = self._readers.get(me, 0) + 1
         try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                reader = csv.DictReader(f)
-                return list(reader)
-        except UnicodeDecodeError:
-            continue  # 该编码失败，尝试下一个
-        except FileNotFoundError:
-            print(f"错误：文件{file_path}不存在")
-            return []
-        except Exception as e:
-            print(f"读取CSV失败（编码{encoding}）：{e}")
+            yield
+        finally:
+            with self._cond:
+                self._readers[me] -= 1
+                if not self._readers[me]:
+                    del self._readers[me]
+                if self._writer is None and not self._readers:
+                    self._flock('un')
+                self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        """排他锁（写者）"""
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+            else:
+                while self._writer is not None or any(t != me for t in self._readers):
+                    self._cond.wait()
+                self._flock('ex')
+                self._writer = me
+                self._writer_depth = 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                    # 本线程仍持有共享锁时降级为共享锁
+                    self._flock('sh' if self._readers else 'un')
+                    self._cond.notify_all()
+
+
+# 文件锁实例：{规范化路径: FileLock}
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+def _file_lock(file_path):
+    """获取数据文件对应的读写锁"""
+    key = _path_key(file_path)
+    with _file_locks_guard:
+        if key not in _file_locks:
+            _file_locks[key] = FileLock(file_path)
+        return _file_locks[key]
+
+
+def _reset_file_locks():
+    """fork出的子进程不能共用父进程的锁文件句柄（flock按打开的文件描述归属）"""
+    _file_locks.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_file_locks)
+
+
+def _atomic_write(file_path, write_rows, encoding):
+    """
+    原子替换写入：先写同目录临时文件并fsync，再通过os.replace重命名覆盖原文件，
+    读者要么看到旧文件要么看到完整的新文件，写入中途崩溃也不会留下残缺的表
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(file_path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding=encoding) as f:
+            write_rows(f)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    # 目录项也需要落盘，重命名才算持久化（Windows不支持打开目录，跳过）
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+# -------------------------- 文件编码探测（带缓存）--------------------------
+# 常见编码列表（按优先级尝试）
+CSV_ENCODINGS = ['utf-8', 'gbk', 'gb2312', 'latin-1']
+# 编码目录：记录各数据文件的编码（由 migrate_csv_encoding 生成）
+ENCODING_CATALOG_PATH = "database/encoding.meta"
+# 编码探测缓存：{规范化路径: ((mtime_ns, size), 编码)}，文件变化后才重新探测
+_encoding_cache = {}
+_encoding_catalog = None
+
+
+def _path_key(file_path):
+    """规范化文件路径，作为各类缓存的键（兼容 f"{DATA_DIR}/x" 与 os.path.join 两种写法）"""
+    return os.path.normcase(os.path.abspath(file_path))
+
+
+def _file_signature(file_path):
+    """文件版本签名（修改时间+大小），文件不存在时返回None"""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load_encoding_catalog():
+    """读取编码目录，返回 {文件名: 编码}"""
+    global _encoding_catalog
+    if _encoding_catalog is None:
+        _encoding_catalog = {}
+        if os.path.exists(ENCODING_CATALOG_PATH):
+            with open(ENCODING_CATALOG_PATH, 'r', encoding='utf-8') as f:
+                next(f, None)  # 跳过表头
+                for line in f:
+                    parts = line.strip().split('|')
+                    if len(parts) >= 2:
+                        _encoding_catalog[parts[0]] = parts[1]
+    return _encoding_catalog
+
+
+def _can_decode(file_path, encoding, chunk_size=1 << 20):
+    """按块增量解码整个文件，判断编码是否可用（内存占用与文件大小无关）"""
+    import codecs
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    decoder.decode(b'', final=True)
+                    return True
+                decoder.decode(chunk)
+    except UnicodeDecodeError:
+        return False
+
+
+def _remember_encoding(file_path, encoding):
+    """写入文件后刷新编码缓存（编码不变，只更新版本签名，避免重新探测）"""
+    signature = _file_signature(file_path)
+    if signature is not None:
+        _encoding_cache[_path_key(file_path)] = (signature, encoding)
+
+
+def detect_encoding(file_path):
+    """
+    探测CSV文件编码（read_csv/write_csv 共用）
+    同一文件在(mtime, size)不变时只探测一次；编码目录中登记的编码优先尝试
+    :return: 编码名称，文件不存在或所有编码都失败时返回None
+    """
+    signature = _file_signature(file_path)
+    if signature is None:
+        return None
+    key = _path_key(file_path)
+    cached = _encoding_cache.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    candidates = list(CSV_ENCODINGS)
+    hinted = _load_encoding_catalog().get(_catalog_name(file_path))
+    if hinted:
+        candidates.insert(0, hinted)
+    with _file_lock(file_path).shared():
+        # 加锁后重新取签名，确保探测的是完整写入后的文件
+        signature = _file_signature(file_path)
+        for encoding in candidates:
+            try:
+                if _can_decode(file_path, encoding):
+                    _encoding_cache[key] = (signature, encoding)
+                    return encoding
+            except LookupError:
+                continue  # 目录中登记了未知编码，忽略
+            except OSError as e:
+                print(f"读取CSV失败（编码{encoding}）：{e}")
+                return None
+    return None
+
+
+def _catalog_name(file_path, data_dir=DATA_DIR):
+    """文件在编码目录中的登记名：相对数据目录的路径（分区文件为"<表名>/<YYYY-MM>.csv"）"""
+    return os.path.relpath(file_path, data_dir).replace(os.sep, '/')
+
+
+def _table_files(data_dir):
+    """数据目录下各表的CSV文件：{表名: [基础表文件, 分区文件...]}（分区目录以其中的partitions.meta识别）"""
+    tables = {}
+    for name in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, name)
+        if name.endswith('.csv') and os.path.isfile(path):
+            tables.setdefault(name[:-len('.csv')], []).insert(0, path)
+        elif os.path.isfile(os.path.join(path, 'partitions.meta')):
+            tables.setdefault(name, []).extend(os.path.join(path, part) for part in sorted(os.listdir(path))
+                                               if part.endswith('.csv'))
+    return tables
+
+
+def migrate_csv_encoding(data_dir=DATA_DIR, target_encoding='utf-8'):
+    """
+    一次性迁移：将数据目录下的CSV表（含按月分区的分区文件）统一转码为目标编码（默认UTF-8），
+    并把各文件编码登记到编码目录（ENCODING_CATALOG_PATH）
+    每张表转码期间持有表锁（与write_csv等写者互斥），各文件经同目录的唯一临时文件原子替换
+    :return: {登记名: 迁移前编码}
+    """
+    global _encoding_catalog
+    migrated = {}
+    for table_name, file_paths in _table_files(data_dir).items():
+        table_path = os.path.join(data_dir, f"{table_name}.csv")
+        with _table_lock(table_path), _file_lock(table_path).exclusive():
+            for file_path in file_paths:
+                name = _catalog_name(file_path, data_dir)
+                source_encoding = detect_encoding(file_path)
+                if source_encoding is None:
+                    print(f"⚠️ 跳过{name}：无法识别编码")
+                    continue
+                if source_encoding != target_encoding:
+                    # 先写临时文件再替换，避免转码中途失败损坏原表
+                    def copy_lines(dst, file_path=file_path, source_encoding=source_encoding):
+                        with open(file_path, 'r', encoding=source_encoding, newline='') as src:
+                            for line in src:
+                                dst.write(line)
+                    _atomic_write(file_path, copy_lines, target_encoding)
+                    print(f"✅ {name}：{source_encoding} → {target_encoding}")
+                else:
+                    print(f"ℹ️ {name}：已是{target_encoding}")
+                _remember_encoding(file_path, target_encoding)
+                migrated[name] = source_encoding
+
+    # 登记编码目录（格式同views.meta）
+    update_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with open(ENCODING_CATALOG_PATH, 'w', encoding='utf-8') as f:
+        f.write("fileName|encoding|updateTime\n")
+        for name in migrated:
+            f.write(f"{name}|{target_encoding}|{update_time}\n")
+    _encoding_catalog = None  # 下次探测时重新加载目录
+    return migrated
+
+
+# -------------------------- 表数据缓存（LRU）--------------------------
+# 表缓存内存预算（字节），可通过 set_table_cache_budget 调整
+TABLE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# 表缓存：{规范化路径: ((mtime_ns, size, inode), 列名, 行元组列表, 估算字节数)}，按最近使用排序
+_table_cache = OrderedDict()
+_table_cache_bytes = 0
+_table_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+# 后台合并线程也会读表，缓存的增删需要加锁
+_table_cache_lock = threading.RLock()
+
+
+def _stat_signature(file_path):
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _table_signature(file_path):
+    """表缓存版本签名（修改时间+大小+inode；分区表为分区目录与各分区签名的组合），文件不存在时返回None"""
+    partitions = _load_partitions(file_path)
+    if partitions is None:
+        return _stat_signature(file_path)
+    signatures = tuple(_stat_signature(path) for path in
+                       [_partition_catalog_path(file_path)] + [path for _, path, _ in partitions])
+    return None if None in signatures else signatures
+
+
+def _drop_cached_table(key):
+    """从表缓存中移除一项并扣减内存占用"""
+    global _table_cache_bytes
+    with _table_cache_lock:
+        entry = _table_cache.pop(key, None)
+        if entry is not None:
+            _table_cache_bytes -= entry[3]
+    return entry is not None
+
+
+def _touch_cached_table(key):
+    """缓存命中：标记为最近使用并计数"""
+    with _table_cache_lock:
+        if key in _table_cache:
+            _table_cache.move_to_end(key)
+        _table_cache_stats['hits'] += 1
+
+
+def _cache_table(file_path, signature, fieldnames, rows):
+    """将解析结果放入表缓存，超出预算时按LRU淘汰"""
+    global _table_cache_bytes
+    size = sys.getsizeof(rows) + sum(
+        sys.getsizeof(row) + sum(map(sys.getsizeof, row)) for row in rows
+    )
+    key = _path_key(file_path)
+    with _table_cache_lock:
+        _drop_cached_table(key)
+        if size > TABLE_CACHE_MAX_BYTES:
+            return  # 单表超出预算，不缓存
+        _table_cache[key] = (signature, fieldnames, rows, size)
+        _table_cache_bytes += size
+        while _table_cache_bytes > TABLE_CACHE_MAX_BYTES:
+            _drop_cached_table(next(iter(_table_cache)))
+            _table_cache_stats['evictions'] += 1
+
+
+def _invalidate_table_cache(file_path):
+    """文件被写入后使其缓存失效"""
+    if _drop_cached_table(_path_key(file_path)):
+        _table_cache_stats['invalidations'] += 1
+
+
+def set_table_cache_budget(max_bytes):
+    """设置表缓存内存预算（字节），设为0即关闭缓存"""
+    global TABLE_CACHE_MAX_BYTES
+    TABLE_CACHE_MAX_BYTES = max_bytes
+    with _table_cache_lock:
+        while _table_cache and _table_cache_bytes > TABLE_CACHE_MAX_BYTES:
+            _drop_cached_table(next(iter(_table_cache)))
+            _table_cache_stats['evictions'] += 1
+
+
+def clear_table_cache():
+    """清空表缓存（统计计数保留）"""
+    global _table_cache_bytes
+    with _table_cache_lock:
+        _table_cache.clear()
+        _table_cache_bytes = 0
+
+
+def table_cache_stats():
+    """返回表缓存统计：命中/未命中/淘汰/失效次数、已缓存表数和内存占用"""
+    stats = dict(_table_cache_stats)
+    stats['tables'] = len(_table_cache)
+    stats['bytes'] = _table_cache_bytes
+    stats['max_bytes'] = TABLE_CACHE_MAX_BYTES
+    return stats
+
+
+# 各表主键（唯一键查询命中一条即可停止读取；变更日志按主键合并）
+PRIMARY_KEYS = {
+    'ExpressOrder': 'orderId',
+    'User': 'uid',
+    'Courier': 'courierId'
+}
+
+
+def _table_name(file_path):
+    """由CSV路径得到表名（如 database/data/User.csv -> User）"""
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+
+def _routed_engine(file_path):
+    """
+    数据表由非CSV存储引擎（如sqlite，见storage_engine）接管时返回该引擎，否则返回None（按CSV文件读写）
+    read_csv / iter_csv / write_csv / append_change_log 及主键、条件查询据此分发，调用方无需改动
+    """
+    from storage_engine import active_engine
+    engine = active_engine()
+    if engine is None or os.path.dirname(_path_key(file_path)) != _path_key(DATA_DIR):
+        return None
+    return engine if engine.has_table(_table_name(file_path)) else None
+
+
+# -------------------------- 按月分区（快递单/轨迹）--------------------------
+# 可选：表按时间列拆分为 DATA_DIR/<表名>/<YYYY-MM>.csv，时间为空或无法解析的行进入 undated.csv
+# 分区目录文件 DATA_DIR/<表名>/partitions.meta 存在即表示该表已分区（格式同views.meta）
+# 读写接口不变：read_csv/iter_csv/write_csv 传入的仍是 DATA_DIR/<表名>.csv，由本节映射到分区文件；
+# 分区表的行号按分区顺序（undated在前，其后按月份）连续编号，索引行号与fetch_rows保持一致
+PARTITION_COLUMNS = {
+    'ExpressOrder': 'sendTime',
+    'ExpressTrack': 'operateTime'
+}
+UNDATED_PARTITION = 'undated'
+# 分区目录缓存：{规范化路径: (签名, [(月份, 分区文件路径, 行数)])}
+_partition_catalog_cache = {}
+
+
+def _partition_dir(file_path):
+    """分区文件所在目录（DATA_DIR/<表名>/）"""
+    return os.path.splitext(file_path)[0]
+
+
+def _partition_catalog_path(file_path):
+    return os.path.join(_partition_dir(file_path), 'partitions.meta')
+
+
+def _load_partitions(file_path):
+    """读取分区目录，返回 [(月份, 分区文件路径, 行数)]（undated在前，其余按月份升序）；表未分区返回None"""
+    if _table_name(file_path) not in PARTITION_COLUMNS:
+        return None
+    catalog_path = _partition_catalog_path(file_path)
+    signature = _file_signature(catalog_path)
+    if signature is None:
+        return None
+    key = _path_key(catalog_path)
+    cached = _partition_catalog_cache.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    partitions = []
+    with open(catalog_path, 'r', encoding='utf-8') as f:
+        next(f, None)  # 跳过表头
+        for line in f:
+            parts = line.strip().split('|')
+            if len(parts) >= 3:
+                partitions.append((parts[0], os.path.join(_partition_dir(file_path), parts[1]), int(parts[2])))
+    partitions.sort(key=lambda p: (p[0] != UNDATED_PARTITION, p[0]))
+    _partition_catalog_cache[key] = (signature, partitions)
+    return partitions
+
+
+def _save_partitions(file_path, counts):
+    """原子写入分区目录：counts为 {月份: 行数}"""
+    def write_rows(f):
+        f.write("month|fileName|rowCount\n")
+        for month in sorted(counts, key=lambda m: (m != UNDATED_PARTITION, m)):
+            f.write(f"{month}|{month}.csv|{counts[month]}\n")
+    _atomic_write(_partition_catalog_path(file_path), write_rows, 'utf-8')
+
+
+def _partition_key(record, column):
+    """记录所属分区：时间列的规范年月（YYYY-MM），时间无效时为undated"""
+    epoch = parse_time(record.get(column))
+    return format_time(epoch)[:7] if epoch is not None else UNDATED_PARTITION
+
+
+def _base_files(file_path):
+    """基础表对应的物理文件：未分区表为其本身，分区表为各分区文件（按行号顺序）"""
+    partitions = _load_partitions(file_path)
+    return [file_path] if partitions is None else [path for _, path, _ in partitions]
+
+
+def _prune_partitions(file_path, start, end):
+    """分区裁剪：返回与时间区间 [start, end)（epoch秒，None表示不限）重叠的分区月份集合；表未分区返回None"""
+    partitions = _load_partitions(file_path)
+    if partitions is None:
+        return None
+    months = set()
+    for month, _, _ in partitions:
+        if month == UNDATED_PARTITION:
+            continue  # 无有效时间的行不会落在任何时间区间内
+        month_start, month_end = period_range(month)
+        if (end is None or month_start < end) and (start is None or month_end > start):
+            months.add(month)
+    return months
+
+
+def _base_signature(file_path):
+    """基础表整体的(修改时间, 大小)：分区表取各分区与分区目录的最大修改时间和总大小；不存在时返回None"""
+    partitions = _load_partitions(file_path)
+    if partitions is None:
+        return _file_signature(file_path)
+    signatures = [_file_signature(path) for path in
+                  [_partition_catalog_path(file_path)] + [path for _, path, _ in partitions]]
+    if None in signatures:
+        return None
+    return (max(sig[0] for sig in signatures), sum(sig[1] for sig in signatures))
+
+
+def is_partitioned(table_name):
+    """表是否已按月分区"""
+    return _load_partitions(f"{DATA_DIR}/{table_name}.csv") is not None
+
+
+def partition_stats(table_name):
+    """返回分区概况 [{'month', 'fileName', 'rowCount'}]，表未分区返回空列表"""
+    partitions = _load_partitions(f"{DATA_DIR}/{table_name}.csv") or []
+    return [{'month': month, 'fileName': os.path.basename(path), 'rowCount': rows}
+            for month, path, rows in partitions]
+
+
+def _write_partitions(file_path, columns, records, mode, encoding):
+    """
+    分区表写入：按时间列把记录路由到各月分区，最后更新分区目录
+    追加模式只写涉及的分区（新分区带表头创建）；覆盖模式重写全部分区并删除不再有数据的分区
+    """
+    column = PARTITION_COLUMNS[_table_name(file_path)]
+    groups = {}
+    for record in records:
+        groups.setdefault(_partition_key(record, column), []).append(record)
+    old_partitions = _load_partitions(file_path) or []
+    if mode == 'w':
+        counts = {}
+        if not groups:
+            groups[UNDATED_PARTITION] = []  # 至少保留一个分区文件，用于保存列名
+    else:
+        counts = {month: rows for month, _, rows in old_partitions}
+
+    os.makedirs(_partition_dir(file_path), exist_ok=True)
+    for month, rows in groups.items():
+        path = os.path.join(_partition_dir(file_path), f"{month}.csv")
+        if mode == 'w' or month not in counts or not os.path.exists(path):
+            def write_rows(f, rows=rows):
+                writer = csv.DictWriter(f, fieldnames=columns)
+                writer.writeheader()
+                writer.writerows(rows)
+            _atomic_write(path, write_rows, encoding)
+            counts[month] = len(rows)
+        else:
+            with open(path, 'a', newline='', encoding=encoding) as f:
+                csv.DictWriter(f, fieldnames=columns).writerows(rows)
+                f.flush()
+                os.fsync(f.fileno())
+            counts[month] += len(rows)
+        _remember_encoding(path, encoding)
+    _save_partitions(file_path, counts)
+    # 分区目录更新后再删除已清空的旧分区
+    for month, path, _ in old_partitions:
+        if month not in counts and os.path.exists(path):
+            os.remove(path)
+
+
+def partition_table(table_name):
+    """
+    将表一次性迁移为按月分区存储（DATA_DIR/<表名>/<YYYY-MM>.csv + partitions.meta）
+    迁移后行顺序按分区重排，会重建该表已有的索引；可用 unpartition_table 还原
+    """
+    if table_name not in PARTITION_COLUMNS:
+        print(f"错误：表{table_name}不支持分区（支持：{', '.join(PARTITION_COLUMNS)}）")
+        return False
+    file_path = f"{DATA_DIR}/{table_name}.csv"
+    with _table_lock(file_path), _file_lock(file_path).exclusive():
+        if is_partitioned(table_name):
+            print(f"ℹ️ 表{table_name}已分区")
+            return True
+        columns, encoding = _read_fieldnames(file_path)
+        if columns is None:
+            print(f"错误：无法读取文件{file_path}的列名")
+            return False
+        records = read_csv(file_path, apply_log=False)
+        # 先写分区和分区目录再删除原表：中途失败时原表仍在，重新执行即可
+        _write_partitions(file_path, columns, records, 'w', encoding)
+        os.remove(file_path)
+        _invalidate_table_cache(file_path)
+    print(f"✅ 表{table_name}已按月分区：{len(partition_stats(table_name))}个分区，{len(records)}条数据")
+    rebuild_table_indexes(table_name)
+    return True
+
+
+def unpartition_table(table_name):
+    """将分区表合并回单个CSV文件（partition_table 的逆操作）"""
+    file_path = f"{DATA_DIR}/{table_name}.csv"
+    with _table_lock(file_path), _file_lock(file_path).exclusive():
+        partitions = _load_partitions(file_path)
+        if partitions is None:
+            print(f"ℹ️ 表{table_name}未分区")
+            return True
+        columns, encoding = _read_fieldnames(file_path)
+        if columns is None:
+            print(f"错误：无法读取表{table_name}的列名")
+            return False
+        records = read_csv(file_path, apply_log=False)
+
+        def write_rows(f):
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(records)
+        _atomic_write(file_path, write_rows, encoding)
+        _remember_encoding(file_path, encoding)
+        # 先删分区目录（此后表即视为未分区），再清理分区文件
+        os.remove(_partition_catalog_path(file_path))
+        for _, path, _ in partitions:
+            if os.path.exists(path):
+                os.remove(path)
+        try:
+            os.rmdir(_partition_dir(file_path))
+        except OSError:
+            pass  # 目录中还有其他文件时保留
+        _invalidate_table_cache(file_path)
+    print(f"✅ 表{table_name}已合并为单文件（{len(records)}条数据）")
+    rebuild_table_indexes(table_name)
+    return True
+
+
+# db_core.py 中修改 read_csv 函数
+def read_csv(file_path, apply_log=True):
+    """
+    通用读取CSV文件，返回字典列表（增加编码兼容，编码探测结果按文件版本缓存）
+    解析结果进入表缓存，文件未变化时直接由缓存生成新的字典列表（调用方可放心修改）
+    :param apply_log: 是否合并变更日志（索引构建需要基础表的物理行号，应传False）
+    """
+    engine = _routed_engine(file_path)
+    if engine is not None:
+        return list(engine.scan(_table_name(file_path)))
+    signature = _table_signature(file_path)
+    if signature is None:
+        print(f"错误：文件{file_path}不存在")
+        return []
+
+    key = _path_key(file_path)
+    cached = _table_cache.get(key)
+    if cached and cached[0] == signature:
+        _touch_cached_table(key)
+        fieldnames = cached[1]
+        records = [dict(zip(fieldnames, row)) for row in cached[2]]
+    else:
+        _table_cache_stats['misses'] += 1
+        records, fieldnames = [], None
+        # 共享锁：其他进程正在写入时等待，不会读到写了一半的表
+        with _file_lock(file_path).shared():
+            signature = _table_signature(file_path)
+            for path in _base_files(file_path):  # 分区表依次读取各分区
+                encoding = detect_encoding(path)
+                if encoding is None:
+                    # 所有编码都失败
+                    print(f"错误：文件{path}不支持常见编码（UTF-8/GBK/GB2312）")
+                    return []
+                try:
+                    with open(path, 'r', encoding=encoding, newline='') as f:
+                        reader = csv.DictReader(f)
+                        records.extend(reader)
+                        fieldnames = fieldnames or reader.fieldnames
+                except Exception as e:
+                    print(f"读取CSV失败（编码{encoding}）：{e}")
+                    return []
+        fieldnames = fieldnames or []
+
+        _cache_table(file_path, signature, tuple(fieldnames),
+                     [tuple(record.get(col) for col in fieldnames) for record in records])
+
+    if apply_log:
+        changes = _load_change_log(file_path)
+        if changes:
+            records = list(_merge_change_log(records, changes, PRIMARY_KEYS[_table_name(file_path)]))
+    return records
+
+
+def _iter_base_records(file_path, months=None):
+    """
+    逐行产出基础表（不含变更日志）的记录：表在缓存中时遍历缓存，否则边读文件边产出
+    :param months: 分区表只读取这些月份的分区（分区裁剪）；None表示全部
+    """
+    signature = _table_signature(file_path)
+    if signature is None:
+        print(f"错误：文件{file_path}不存在")
+        return
+
+    key = _path_key(file_path)
+    cached = _table_cache.get(key)
+    if months is None and cached and cached[0] == signature:
+        _touch_cached_table(key)
+        fieldnames = cached[1]
+        for row in cached[2]:
+            yield dict(zip(fieldnames, row))
+        return
+    _table_cache_stats['misses'] += 1
+
+    with _file_lock(file_path).shared():
+        partitions = _load_partitions(file_path)
+        if partitions is None:
+            paths = [file_path]
+        else:
+            paths = [path for month, path, _ in partitions if months is None or month in months]
+        for path in paths:
+            encoding = detect_encoding(path)
+            if encoding is None:
+                print(f"错误：文件{path}不支持常见编码（UTF-8/GBK/GB2312）")
+                return
+            with open(path, 'r', encoding=encoding, newline='') as f:
+                yield from csv.DictReader(f)
+
+
+def _iter_merged(file_path, start=None, end=None):
+    """
+    基础表记录流合并变更日志；给出时间区间 [start, end)（epoch秒）时，分区表只读取与区间重叠的分区
+    （区间外的行仍可能被产出，调用方需自行按时间过滤）
+    """
+    months = None
+    if start is not None or end is not None:
+        months = _prune_partitions(file_path, start, end)
+    records = _iter_base_records(file_path, months)
+    changes = _load_change_log(file_path)
+    if changes:
+        # 日志中的更新可能把行移入区间，未在已读分区中出现的upsert也会被产出
+        records = _merge_change_log(records, changes, PRIMARY_KEYS[_table_name(file_path)])
+    return records
+
+
+def iter_csv(file_path, predicate=None, columns=None):
+    """
+    流式读取CSV文件（生成器），逐行产出字典，内存占用与表大小无关
+    表已在缓存中且未变化时直接遍历缓存，否则边读文件边产出（不写入缓存）；变更日志在读取时合并
+    :param predicate: 行过滤函数（接收行字典，返回True保留），在读取过程中过滤
+    :param columns: 需要保留的列名列表（None表示全部列）
+    """
+    engine = _routed_engine(file_path)
+    if engine is not None:
+        yield from engine.scan(_table_name(file_path), predicate, columns)
+        return
+    yield from _filter_records(_iter_merged(file_path), predicate, columns)
+
+
+def _filter_records(records, predicate, columns):
+    """对行迭代器执行谓词过滤和列裁剪"""
+    for record in records:
+        if predicate is not None and not predicate(record):
             continue
-    
-    # 所有编码都失败
-    print(f"错误：文件{file_path}不支持常见编码（UTF-8/GBK/GB2312）")
-    return []
+        if columns is not None:
+            record = {col: record.get(col) for col in columns}
+        yield record
+
+
+def _condition_predicate(condition):
+    """将等值条件字典（如{"orderStatus": "3"}）转换为行过滤函数"""
+    items = list(condition.items())
+    return lambda record: all(record.get(k) == v for k, v in items)
+
+
+# 索引候选行数超过表行数的该比例时放弃索引：逐行按偏移读取不如顺序扫描
+INDEX_SCAN_RATIO = 0.25
+
+
+def _plan_index_rows(file_path, condition):
+    """
+    查询规划：条件含主键且主键上有散列索引时只用主键索引；否则条件涉及的散列索引按候选行数从少到多依次求交集，
+    再与条件涉及的位图索引（各列位图相与）求交；返回候选行号（升序）
+    没有可用索引、或候选行过多时返回None（顺序扫描）
+    """
+    table_name = _table_name(file_path)
+    if _path_key(file_path) != _path_key(f"{DATA_DIR}/{table_name}.csv"):
+        return None
+    hash_cols = [col for col in _hash_index_columns(table_name) if col in condition]
+    bitmap_cols = [col for col in _bitmap_index_columns(table_name) if col in condition]
+    if not hash_cols and not bitmap_cols:
+        return None
+    from index_core import get_hash_index, get_bitmap_index, rows_to_bitmap, bitmap_rows
+    if PRIMARY_KEYS.get(table_name) in hash_cols:
+        hash_cols, bitmap_cols = [PRIMARY_KEYS[table_name]], []
+    rows, table_rows = None, 0
+    if hash_cols:
+        indexes = [get_hash_index(table_name, col) for col in hash_cols]
+        candidates = sorted((index.lookup(condition[col]) for col, index in zip(hash_cols, indexes)), key=len)
+        rows = set(candidates[0])
+        for other in candidates[1:]:
+            if not rows:
+                break
+            rows.intersection_update(other)
+        # 表行数按主索引条目数加增量条数估计
+        table_rows = max(index.entry_count() for index in indexes)
+    if bitmap_cols:
+        indexes = [get_bitmap_index(table_name, col) for col in bitmap_cols]
+        mask = indexes[0].bitmap(condition[bitmap_cols[0]])
+        for col, index in zip(bitmap_cols[1:], indexes[1:]):
+            mask &= index.bitmap(condition[col])
+        if rows is not None:
+            mask &= rows_to_bitmap(rows)
+        table_rows = max(table_rows, indexes[0].row_count())
+        if mask.bit_count() > table_rows * INDEX_SCAN_RATIO:
+            return None
+        return list(bitmap_rows(mask))
+    if len(rows) > table_rows * INDEX_SCAN_RATIO:
+        return None
+    return sorted(rows)
+
+
+def _fetch_indexed(file_path, row_numbers):
+    """按索引候选行号读取基础表行并合并变更日志（只在日志中出现的行也一并产出，交由条件过滤）"""
+    table_name = _table_name(file_path)
+    records = fetch_rows(table_name, row_numbers)
+    changes = _load_change_log(file_path)
+    if not changes:
+        return records
+    return list(_merge_change_log(records, changes, PRIMARY_KEYS[table_name]))
+
+
+def _query_table(file_path, condition, unique_key):
+    """
+    按等值条件查询：条件涉及已登记的索引时由查询规划选用索引（见 _plan_index_rows），按行号直接读取；
+    否则流式扫描，条件包含唯一键时命中第一条即停止读取，包含分区时间列时只读取对应分区
+    """
+    if not condition:
+        return list(iter_csv(file_path))
+    engine = _routed_engine(file_path)
+    if engine is not None:
+        return engine.query(_table_name(file_path), condition)  # 由引擎走索引查询
+    row_numbers = _plan_index_rows(file_path, condition)
+    if row_numbers is not None:
+        match = _condition_predicate(condition)  # 同时排除索引中过期的项
+        return [record for record in _fetch_indexed(file_path, row_numbers) if match(record)]
+    records = None
+    column = PARTITION_COLUMNS.get(_table_name(file_path))
+    if column in condition:
+        epoch = parse_time(condition[column])
+        if epoch is not None:
+            records = _iter_merged(file_path, epoch, epoch + 1)
+    if records is None:
+        records = _iter_merged(file_path)
+    matches = _filter_records(records, _condition_predicate(condition), None)
+    if unique_key in condition:
+        first = next(matches, None)
+        matches.close()  # 提前结束读取，释放文件句柄
+        return [first] if first is not None else []
+    return list(matches)
+
+
+def _base_rows_by_key(table_name, keys):
+    """
+    主键 -> 基础表行号 {主键: 行号}（主键列的索引项始终指向基础表行，见 _index_changed）；
+    主键上没有散列索引时返回None
+    """
+    key_col = PRIMARY_KEYS[table_name]
+    if key_col not in _hash_index_columns(table_name):
+        return None
+    from index_core import get_hash_index
+    index = get_hash_index(table_name, key_col)
+    return {key: rows[0] for key in keys for rows in (index.lookup(key),) if rows}
+
+
+def _base_records_by_key(table_name, keys):
+    """
+    基础表中主键属于keys的行 {主键: 记录}（不合并变更日志，已删除的行同样返回其基础表版本）：
+    主键上有散列索引时按索引定位读取，否则流式扫描
+    """
+    key_col = PRIMARY_KEYS[table_name]
+    rows = _base_rows_by_key(table_name, keys)
+    if rows is not None:
+        records = fetch_rows(table_name, sorted(rows.values()))
+    else:
+        records = _iter_base_records(f"{DATA_DIR}/{table_name}.csv")
+    return {record[key_col]: record for record in records if record.get(key_col) in keys}
+
+
+def count_group_by(table_name, column, condition=None):
+    """
+    分组计数（SELECT column, COUNT(*) ... WHERE condition GROUP BY column），返回 {值: 行数}（已合并变更日志）
+    分组列和条件列上都有位图索引时，由条件位图相与后逐值popcount得出，不读取数据行，
+    只有变更日志涉及的行按主键读取其基础表版本修正计数；否则流式扫描计数
+    快递单表同时计入已归档的快递单（见 archive_core.archived_group_counts）
+    :param condition: 等值条件字典（可选）
+    """
+    counts = _count_hot_group_by(table_name, column, condition or {})
+    if table_name == 'ExpressOrder':
+        from archive_core import archived_group_counts
+        for value, count in archived_group_counts(column, condition).items():
+            counts[value] = counts.get(value, 0) + count
+    return counts
+
+
+def _count_hot_group_by(table_name, column, condition):
+    """数据表（不含归档）的分组计数，见 count_group_by"""
+    file_path = f"{DATA_DIR}/{table_name}.csv"
+    match = _condition_predicate(condition)
+    bitmap_cols = _bitmap_index_columns(table_name)
+    counts = {}
+    if column not in bitmap_cols or any(col not in bitmap_cols for col in condition):
+        for record in iter_csv(file_path, match if condition else None):
+            value = record.get(column) or ''
+            counts[value] = counts.get(value, 0) + 1
+        return counts
+
+    from index_core import get_bitmap_index
+    with _file_lock(file_path).shared():
+        mask = None
+        for col, value in condition.items():
+            bitmap = get_bitmap_index(table_name, col).bitmap(value)
+            mask = bitmap if mask is None else mask & bitmap
+        counts = get_bitmap_index(table_name, column).counts(mask)
+        changes = _load_change_log(file_path)
+        if changes:
+            base_records = _base_records_by_key(table_name, changes)
+            for key, change in changes.items():
+                base = base_records.get(key)
+                if base is not None and match(base):
+                    value = base.get(column) or ''
+                    counts[value] = counts.get(value, 0) - 1
+                if change is not None and match(change):
+                    value = change.get(column) or ''
+                    counts[value] = counts.get(value, 0) + 1
+    return {value: count for value, count in counts.items() if count}
+
+
+def text_search(table_name, column, query, limit=20):
+    """
+    文本子串查询（如 uaddress 含"朝阳区"、goodsName 含"茶叶"），按相关度排序返回记录（已合并变更日志）
+    由列上的文本索引求出候选并排序，不扫描数据表；只按行号读取返回的行
+    列上需先声明文本索引：create_index(table_name, column, kind='text')
+    :param limit: 最多返回的条数，None表示不限
+    """
+    file_path = f"{DATA_DIR}/{table_name}.csv"
+    if column not in _text_index_columns(table_name):
+        print(f"错误：{table_name}.{column}上未建立文本索引")
+        return []
+    from index_core import get_text_index
+    key_col = PRIMARY_KEYS[table_name]
+    with _file_lock(file_path).shared():
+        hits = get_text_index(table_name, column).search(query, limit)
+        changes = _load_change_log(file_path)
+        # 变更日志中的行取日志版本；其余按行号读取，行号未知时按主键读取
+        rows = [row_num for key, row_num in hits if key not in changes and row_num]
+        records = {record.get(key_col): record for record in fetch_rows(table_name, rows)}
+        missing = {key for key, _ in hits if key not in changes and key not in records}
+        if missing:
+            records.update(_base_records_by_key(table_name, missing))
+    results = []
+    for key, _ in hits:
+        record = changes[key] if key in changes else records.get(key)
+        if record is not None:
+            results.append(dict(record))
+    return results
+
+
+def _get_by_key(file_path, key_value):
+    """按主键查询单条记录（已合并变更日志），未找到返回None"""
+    engine = _routed_engine(file_path)
+    if engine is not None:
+        return engine.get(_table_name(file_path), key_value)
+    key_col = PRIMARY_KEYS[_table_name(file_path)]
+    matches = _query_table(file_path, {key_col: key_value}, key_col)
+    return matches[0] if matches else None
 """
 # 文件读写
 def read_csv(file_path):
@@ -61,74 +1072,849 @@ def read_csv(file_path):
 """
 def write_csv(file_path, records, mode='a'):
     """通用写入CSV文件（支持单条/批量写入，默认追加模式，自动检测编码）"""
-    import csv
     import time
-    encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1']
-    
+
     # 确保records是可迭代对象
     if not isinstance(records, list):
         records = [records]
-    
-    # 步骤1：尝试多种编码读取列名，并记录成功的编码
-    columns = None
-    file_encoding = None
-    f = None
-    for encoding in encodings:
-        try:
-            f = open(file_path, 'r', encoding=encoding)
-            columns = csv.DictReader(f).fieldnames
-            file_encoding = encoding  # 记录成功的编码
-            f.close()
-            f = None
-            break
-        except (UnicodeDecodeError, FileNotFoundError):
-            if f:
-                f.close()
-                f = None
-            continue
-        except Exception as e:
-            if f:
-                f.close()
-                f = None
-            print(f"读取列名失败（编码{encoding}）：{e}")
-            continue
-    
-    if columns is None or file_encoding is None:
-        print(f"错误：无法读取文件{file_path}的列名（所有编码都失败）")
+
+    engine = _routed_engine(file_path)
+    if engine is not None:
+        if mode == 'w':
+            return engine.bulk_load(_table_name(file_path), records)
+        return engine.insert(_table_name(file_path), records)
+
+    # 进程内表级锁 + 跨进程排他锁（读者持共享锁，写入期间等待）
+    with _table_lock(file_path), _file_lock(file_path).exclusive():
+        # 步骤1：探测文件编码（命中缓存时无需重新解码整个文件），只读取表头获取列名
+        columns, file_encoding = _read_fieldnames(file_path)
+        if columns is None or file_encoding is None:
+            print(f"错误：无法读取文件{file_path}的列名（所有编码都失败）")
+            return False
+
+        # 追加的主键在变更日志中有记录（如删除后重新插入）时，先合并日志，避免删除标记误删新行
+        if mode == 'a':
+            changes = _load_change_log(file_path)
+            key_col = PRIMARY_KEYS.get(_table_name(file_path))
+            if changes and any(record.get(key_col) in changes for record in records):
+                compact_table(file_path)
+
+        # 步骤2：补全缺失字段为NULL
+        full_records = []
+        for record in records:
+            full_record = {col: record.get(col, 'NULL') for col in columns}
+            full_records.append(full_record)
+
+        # 追加到数据表时记下新行的起始行号和基础表签名，写入后增量维护该表的索引（分区表追加会使行号后移，整体重建）
+        table_name = _table_name(file_path)
+        index_cols, text_cols, signed, first_row, before = [], [], [], None, None
+        if mode == 'a' and _path_key(file_path) == _path_key(f"{DATA_DIR}/{table_name}.csv"):
+            index_cols, text_cols = _hash_index_columns(table_name), _text_index_columns(table_name)
+            signed = _signed_indexes(table_name)
+            if (index_cols or text_cols or signed) and _load_partitions(file_path) is None and \
+                    _row_locator(table_name).sync():
+                first_row = _row_locator(table_name)._header[3] + 2
+                before = _base_signature(file_path)
+
+        def write_rows(f):
+            writer = csv.DictWriter(f, fieldnames=columns)
+            if mode == 'w':  # 覆盖模式需重新写入列名
+                writer.writeheader()
+            writer.writerows(full_records)  # 批量写入
+
+        # 步骤3：使用相同编码写入文件（添加重试机制）
+        # 覆盖模式写临时文件后原子重命名；追加模式写完后fsync落盘
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                if _load_partitions(file_path) is not None:
+                    _write_partitions(file_path, columns, full_records, mode, file_encoding)
+                elif mode == 'w':
+                    _atomic_write(file_path, write_rows, file_encoding)
+                else:
+                    with open(file_path, mode, newline='', encoding=file_encoding) as f:
+                        write_rows(f)
+                        f.flush()
+                        os.fsync(f.fileno())
+                _remember_encoding(file_path, file_encoding)
+                _invalidate_table_cache(file_path)
+                if index_cols or text_cols or signed:
+                    _index_appended(table_name, full_records, first_row, index_cols, text_cols, signed, before)
+                return True
+            except PermissionError as e:
+                if attempt < max_retries - 1:
+                    print(f"文件被占用，正在重试（{attempt + 1}/{max_retries}）...")
+                    time.sleep(0.5)  # 等待0.5秒后重试
+                else:
+                    print(f"写入CSV失败（权限被拒绝）：{e}")
+                    print("提示：请确保文件未被其他程序（如Excel）打开")
+                    return False
+            except Exception as e:
+                # 写入中途失败时文件可能已被部分修改，缓存同样需要失效
+                _invalidate_table_cache(file_path)
+                print(f"写入CSV失败（编码{file_encoding}）：{e}")
+                return False
         return False
-    
-    # 步骤2：补全缺失字段为NULL
-    full_records = []
-    for record in records:
-        full_record = {col: record.get(col, 'NULL') for col in columns}
-        full_records.append(full_record)
-    
-    # 步骤3：使用相同编码写入文件（添加重试机制）
-    max_retries = 3
-    for attempt in range(max_retries):
+
+
+# -------------------------- 行偏移定位（行号 -> 字节偏移）--------------------------
+class RowLocator:
+    """
+    CSV行定位表：记录基础表每个数据行的字节偏移（array('Q')格式持久化到 INDEX_DIR/<表名>.offsets，
+    通过mmap读取，加载与查找都是O(1)），索引命中的行号可直接seek读取，无需扫描整表
+    行号与索引一致：首行为列名，第一条数据为第2行（空行不计，与csv.DictReader相同）
+    基础表被追加时只扫描新增部分；被重写时整体重建
+    """
+    MAGIC = b'TS2ROWS1'
+    # 文件头：魔数、基础表大小、基础表修改时间、基础表尾部校验值、行数
+    HEADER = struct.Struct('<8sQQQQ')
+    TAIL_BYTES = 4096
+
+    def __init__(self, table_name, partition=None):
+        """
+        :param partition: 分区表的分区月份（偏移文件为 INDEX_DIR/<表名>@<月份>.offsets）；None表示未分区表
+        """
+        self.table_name = table_name
+        # 分区文件没有独立的锁，统一由逻辑表（DATA_DIR/<表名>.csv）的文件锁保护
+        self.lock_path = f"{DATA_DIR}/{table_name}.csv"
+        if partition is None:
+            self.table_path = self.lock_path
+            self.index_path = f"{INDEX_DIR}/{table_name}.offsets"
+        else:
+            self.table_path = os.path.join(_partition_dir(self.lock_path), f"{partition}.csv")
+            self.index_path = f"{INDEX_DIR}/{table_name}@{partition}.offsets"
+        self._mmap = None
+        self._offsets = None  # memoryview（'Q'），指向mmap中的偏移数组
+        self._header = None   # (基础表大小, 修改时间, 尾部校验值, 行数)
+
+    def _close(self):
+        """释放mmap（重写偏移文件前必须先释放）"""
+        if self._offsets is not None:
+            self._offsets.release()
+            self._offsets = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._header = None
+
+    def _open(self):
+        """映射偏移文件，文件不存在或格式不符时保持未加载状态"""
+        self._close()
         try:
-            with open(file_path, mode, newline='', encoding=file_encoding) as f:
-                writer = csv.DictWriter(f, fieldnames=columns)
-                if mode == 'w':  # 覆盖模式需重新写入列名
-                    writer.writeheader()
-                writer.writerows(full_records)  # 批量写入
+            with open(self.index_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return
+        if len(self._mmap) < self.HEADER.size:
+            self._close()
+            return
+        magic, size, mtime, tail_crc, count = self.HEADER.unpack_from(self._mmap)
+        if magic != self.MAGIC or len(self._mmap) < self.HEADER.size + count * 8:
+            self._close()
+            return
+        self._header = (size, mtime, tail_crc, count)
+        self._offsets = memoryview(self._mmap)[self.HEADER.size:self.HEADER.size + count * 8].cast('Q')
+
+    def _tail_crc(self, f, size):
+        """基础表前size字节末尾一段的校验值（用于判断文件是追加还是被重写）"""
+        start = max(0, size - self.TAIL_BYTES)
+        f.seek(start)
+        return zlib.crc32(f.read(size - start))
+
+    @staticmethod
+    def _scan(f, start):
+        """从字节偏移start开始扫描，返回各数据行的起始偏移（正确处理引号内的换行）"""
+        offsets = array('Q')
+        in_quote = False
+        pos = start
+        f.seek(start)
+        for line in f:
+            if not in_quote and line not in (b'\n', b'\r\n'):
+                offsets.append(pos)
+            if line.count(b'"') % 2:
+                in_quote = not in_quote
+            pos += len(line)
+        return offsets
+
+    def sync(self):
+        """使偏移表与基础表保持一致，返回是否可用"""
+        signature = _file_signature(self.table_path)
+        if signature is None:
+            return False
+        mtime, size = signature
+        if self._header is None:
+            self._open()
+        if self._header and self._header[:2] == (size, mtime):
             return True
-        except PermissionError as e:
-            if attempt < max_retries - 1:
-                print(f"文件被占用，正在重试（{attempt + 1}/{max_retries}）...")
-                time.sleep(0.5)  # 等待0.5秒后重试
+
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        with _file_lock(self.lock_path).shared(), open(self.table_path, 'rb') as f:
+            # 加锁后重新取签名，确保扫描的是完整写入后的文件
+            mtime, size = _file_signature(self.table_path)
+            if self._header and size > self._header[0] and \
+                    self._tail_crc(f, self._header[0]) == self._header[2]:
+                # 基础表只被追加：扫描新增部分并追加到偏移文件
+                old_size, _, _, count = self._header
+                new_offsets = self._scan(f, old_size)
+                tail_crc = self._tail_crc(f, size)
+                self._close()
+                with open(self.index_path, 'r+b') as out:
+                    out.seek(self.HEADER.size + count * 8)
+                    out.truncate()
+                    out.write(new_offsets.tobytes())
+                    out.seek(0)
+                    out.write(self.HEADER.pack(self.MAGIC, size, mtime, tail_crc,
+                                               count + len(new_offsets)))
             else:
-                print(f"写入CSV失败（权限被拒绝）：{e}")
-                print("提示：请确保文件未被其他程序（如Excel）打开")
-                return False
+                # 首次构建或基础表被重写：整体重建（上面的尾部校验可能已移动文件位置）
+                f.seek(0)
+                header_len = len(f.readline())
+                offsets = self._scan(f, header_len)
+                tail_crc = self._tail_crc(f, size)
+                self._close()
+                tmp_path = self.index_path + '.tmp'
+                with open(tmp_path, 'wb') as out:
+                    out.write(self.HEADER.pack(self.MAGIC, size, mtime, tail_crc, len(offsets)))
+                    out.write(offsets.tobytes())
+                os.replace(tmp_path, self.index_path)
+        self._open()
+        return self._header is not None
+
+    def fetch(self, row_numbers):
+        """按行号读取基础表中的行，返回与行号顺序一致的记录列表（越界行号跳过）"""
+        with _file_lock(self.lock_path).shared():
+            return self._fetch_locked(row_numbers)
+
+    def _fetch_locked(self, row_numbers):
+        if not self.sync():
+            return []
+        fieldnames, encoding = _read_fieldnames(self.table_path)
+        if fieldnames is None:
+            return []
+        size, _, _, count = self._header
+        results = []
+        with open(self.table_path, 'rb') as f:
+            for row_num in row_numbers:
+                i = row_num - 2
+                if not 0 <= i < count:
+                    continue
+                start = self._offsets[i]
+                end = self._offsets[i + 1] if i + 1 < count else size
+                f.seek(start)
+                text = f.read(end - start).decode(encoding)
+                values = next(csv.reader(io.StringIO(text, newline='')), [])
+                record = dict(zip(fieldnames, values))
+                for col in fieldnames[len(values):]:
+                    record[col] = None  # 与DictReader一致：缺失字段为None
+                results.append(record)
+        return results
+
+
+# 行定位表实例缓存：{表名: RowLocator}
+_row_locators = {}
+
+
+def _row_locator(table_name, partition=None):
+    key = (table_name, partition)
+    locator = _row_locators.get(key)
+    if locator is None:
+        locator = _row_locators[key] = RowLocator(table_name, partition)
+    return locator
+
+
+def fetch_rows(table_name, row_numbers):
+    """
+    按行号（索引返回的行号，从2开始）直接seek读取基础表中的行，只解析这些行
+    返回基础表中的原始记录（不合并变更日志），顺序与row_numbers一致，越界行号跳过
+    分区表的行号跨分区连续编号，先换算为(分区, 分区内行号)再读取
+    """
+    file_path = f"{DATA_DIR}/{table_name}.csv"
+    if _load_partitions(file_path) is None:
+        return _row_locator(table_name).fetch(row_numbers)
+
+    with _file_lock(file_path).shared():
+        locators, starts, total = [], [], 0
+        for month, _, _ in _load_partitions(file_path):
+            locator = _row_locator(table_name, month)
+            if not locator.sync():
+                continue
+            locators.append(locator)
+            starts.append(total)
+            total += locator._header[3]
+        # 按分区分组读取，再按输入顺序放回
+        wanted = {}
+        for pos, row_num in enumerate(row_numbers):
+            i = row_num - 2
+            if 0 <= i < total:
+                k = bisect_right(starts, i) - 1
+                wanted.setdefault(k, []).append((pos, i - starts[k] + 2))
+        slots = [None] * len(row_numbers)
+        for k, items in wanted.items():
+            rows = locators[k]._fetch_locked([local for _, local in items])
+            for (pos, _), record in zip(items, rows):
+                slots[pos] = record
+    return [record for record in slots if record is not None]
+
+
+def query_by_time(table_name, column, start=None, end=None, condition=None):
+    """
+    时间范围查询：通过时间索引二分定位 [start, end) 内的行，按行号直接读取，不扫描整表
+    两种时间格式（2024/12/10 8:30 与 2024-12-10 08:30:00）统一按epoch秒比较
+    :param table_name: 表名（如 "ExpressOrder"、"ExpressTrack"）
+    :param column: 时间列（如 "sendTime"、"operateTime"）
+    :param start: 起始时间（含），时间字符串或epoch秒，None表示不限
+    :param end: 结束时间（不含），时间字符串或epoch秒，None表示不限
+    :param condition: 其他等值条件字典（可选）
+    :return: 按时间升序排列的记录列表（已合并变更日志）
+    """
+    from index_core import get_time_index
+    bounds = [parse_time(t) if isinstance(t, str) else t for t in (start, end)]
+    if any(t is None and raw is not None for t, raw in zip(bounds, (start, end))):
+        print(f"错误：无法解析时间范围 {start} ~ {end}")
+        return []
+    start, end = bounds
+
+    file_path = f"{DATA_DIR}/{table_name}.csv"
+    if _routed_engine(file_path) is not None:
+        records = iter_csv(file_path)  # 非CSV存储引擎：由引擎扫描后按时间过滤
+    elif PARTITION_COLUMNS.get(table_name) == column and _load_partitions(file_path) is not None:
+        # 分区表按分区列查询：只读取与区间重叠的月份分区
+        records = _iter_merged(file_path, start, end)
+    else:
+        with _file_lock(file_path).shared():
+            row_numbers = get_time_index(table_name, column).search_range(start, end)
+            records = fetch_rows(table_name, row_numbers)
+        # 变更日志中的更新可能改变时间列：合并后按时间重新校验（日志中新落入区间的行也会被带出）
+        changes = _load_change_log(file_path)
+        if changes:
+            records = _merge_change_log(records, changes, PRIMARY_KEYS[table_name])
+
+    match = _condition_predicate(condition) if condition else None
+    results = []
+    for record in records:
+        epoch = parse_time(record.get(column))
+        if epoch is None or (start is not None and epoch < start) or (end is not None and epoch >= end):
+            continue
+        if match is None or match(record):
+            results.append((epoch, record))
+    results.sort(key=lambda item: item[0])
+    return [record for _, record in results]
+
+
+# -------------------------- 变更日志（追加写+后台合并）--------------------------
+# 单行更新/删除不再重写整表，而是向 LOG_DIR/<表名>.log 追加一条记录：
+#   U = upsert（整行新值），D = 删除标记（tombstone）
+# 读取时按主键在线合并；日志超过阈值后由后台线程合并回基础CSV
+LOG_DIR = "database/log"
+LOG_COMPACT_MAX_BYTES = 4 * 1024 * 1024  # 日志超过该大小必定合并
+LOG_COMPACT_MIN_BYTES = 64 * 1024        # 日志小于该大小不按比例合并（避免小表频繁重写）
+LOG_COMPACT_RATIO = 0.2                  # 日志大小达到基础表的该比例时合并
+
+# 日志解析缓存：{规范化路径: (签名, {主键: 行字典或None})}
+_change_log_cache = {}
+# 表级写锁（同一进程内串行化追加、日志写入与合并）
+_table_locks = {}
+_table_locks_guard = threading.Lock()
+_compacting = set()
+
+
+def _table_lock(file_path):
+    """获取表级可重入写锁"""
+    key = _path_key(file_path)
+    with _table_locks_guard:
+        if key not in _table_locks:
+            _table_locks[key] = threading.RLock()
+        return _table_locks[key]
+
+
+def _change_log_path(file_path):
+    """基础表对应的变更日志路径"""
+    return os.path.join(LOG_DIR, f"{_table_name(file_path)}.log")
+
+
+def _read_fieldnames(file_path):
+    """读取表头，返回(列名列表, 编码)，失败返回(None, None)；分区表读取第一个分区的表头"""
+    file_path = _base_files(file_path)[0]
+    encoding = detect_encoding(file_path)
+    if encoding is None:
+        return None, None
+    try:
+        with open(file_path, 'r', encoding=encoding, newline='') as f:
+            return csv.DictReader(f).fieldnames, encoding
+    except Exception as e:
+        print(f"读取列名失败（编码{encoding}）：{e}")
+        return None, None
+
+
+def _load_change_log(file_path):
+    """解析变更日志，返回 {主键: 最新行字典（删除为None）}；非日志表或无日志时返回空字典"""
+    table = _table_name(file_path)
+    if table not in PRIMARY_KEYS:
+        return {}
+    log_path = _change_log_path(file_path)
+    signature = _file_signature(log_path)
+    if signature is None:
+        return {}
+    key = _path_key(log_path)
+    cached = _change_log_cache.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    key_col = PRIMARY_KEYS[table]
+    changes = {}
+    encoding = detect_encoding(log_path) or 'utf-8'
+    with _file_lock(log_path).shared():
+        signature = _file_signature(log_path)
+        if signature is None:
+            return {}  # 加锁期间日志已被合并删除
+        with open(log_path, 'r', encoding=encoding, newline='') as f:
+            for record in csv.DictReader(f):
+                op = record.pop('_op', 'U')
+                changes[record.get(key_col)] = None if op == 'D' else record
+    _change_log_cache[key] = (signature, changes)
+    return changes
+
+
+def _merge_change_log(records, changes, key_col):
+    """将变更日志合并到基础表记录流：更新原位替换，删除跳过"""
+    seen = set()
+    for record in records:
+        key = record.get(key_col)
+        if key in changes:
+            seen.add(key)
+            change = changes[key]
+            if change is None:
+                continue
+            record = dict(change)
+        yield record
+    # 基础表中不存在的upsert（如合并过程中被重写的行）追加到末尾
+    for key, change in changes.items():
+        if change is not None and key not in seen:
+            yield dict(change)
+
+
+def append_change_log(file_path, op, records, previous=None):
+    """
+    向表的变更日志追加记录（单条或批量，一次写入，O(变更行数) I/O），必要时触发后台合并
+    :param op: 'U'（整行更新）或 'D'（删除，记录只需包含主键）
+    :param records: 单条记录字典或记录列表
+    :param previous: 可选，变更前的行（与records一一对应），用于增量维护非主键列上的散列索引
+    """
+    if not isinstance(records, list):
+        records = [records]
+    if previous is not None and not isinstance(previous, list):
+        previous = [previous]
+    table = _table_name(file_path)
+    if table not in PRIMARY_KEYS:
+        print(f"错误：表{table}不支持变更日志（未定义主键）")
+        return False
+    engine = _routed_engine(file_path)
+    if engine is not None:
+        # 由存储引擎直接按主键更新/删除，无需变更日志
+        if op == 'D':
+            return engine.delete(table, [record[PRIMARY_KEYS[table]] for record in records])
+        return engine.update(table, records)
+    columns, encoding = _read_fieldnames(file_path)
+    if columns is None:
+        print(f"错误：无法读取文件{file_path}的列名")
+        return False
+
+    log_path = _change_log_path(file_path)
+    with _table_lock(file_path), _file_lock(log_path).exclusive():
+        try:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            log_encoding = detect_encoding(log_path) or encoding
+            new_log = not os.path.exists(log_path)
+            with open(log_path, 'a', newline='', encoding=log_encoding) as f:
+                writer = csv.writer(f)
+                if new_log:
+                    writer.writerow(['_op'] + columns)
+                writer.writerows([op] + [record.get(col, 'NULL') for col in columns] for record in records)
+                f.flush()
+                os.fsync(f.fileno())
+            _remember_encoding(log_path, log_encoding)
         except Exception as e:
-            print(f"写入CSV失败（编码{file_encoding}）：{e}")
+            print(f"写入变更日志失败：{e}")
+            return False
+    _index_changed(file_path, op, records, previous)
+    _maybe_compact(file_path)
+    return True
+
+
+def _maybe_compact(file_path):
+    """日志超过阈值时启动后台线程合并（同一张表同时只有一个合并任务）"""
+    log_signature = _file_signature(_change_log_path(file_path))
+    base_signature = _base_signature(file_path)
+    if log_signature is None or base_signature is None:
+        return
+    log_size, base_size = log_signature[1], base_signature[1]
+    if not (log_size >= LOG_COMPACT_MAX_BYTES or
+            (log_size >= LOG_COMPACT_MIN_BYTES and log_size >= base_size * LOG_COMPACT_RATIO)):
+        return
+    key = _path_key(file_path)
+    with _table_locks_guard:
+        if key in _compacting:
+            return
+        _compacting.add(key)
+
+    def run():
+        try:
+            compact_table(file_path)
+        finally:
+            with _table_locks_guard:
+                _compacting.discard(key)
+
+    # 守护线程：不阻止进程退出；基础表为原子替换写入、日志在其后删除，中断时留待下次合并
+    threading.Thread(target=run, name=f"compact-{_table_name(file_path)}", daemon=True).start()
+
+
+def compact_table(file_path, keep=None):
+    """
+    将变更日志合并回基础CSV（整表重写一次），删除日志并重建该表的索引
+    :param keep: 可选的行过滤函数，返回False的行在合并时从基础表移除（归档使用）；
+                 指定时即使没有变更日志也会重写基础表
+    """
+    log_path = _change_log_path(file_path)
+    # 合并期间同时锁住基础表和日志：其他进程既不能追加日志，也不会读到中间状态
+    with _table_lock(file_path), _file_lock(file_path).exclusive(), _file_lock(log_path).exclusive():
+        if keep is None and not os.path.exists(log_path):
+            return True
+        records = read_csv(file_path)
+        if keep is not None:
+            records = [record for record in records if keep(record)]
+        if not write_csv(file_path, records, mode='w'):
             return False
-    return False
+        # 先写基础表再删日志：中途崩溃时日志会被重复合并，而upsert/删除都是幂等的
+        if os.path.exists(log_path):
+            os.remove(log_path)
+        _change_log_cache.pop(_path_key(log_path), None)
+    print(f"✅ 变更日志已合并：{_table_name(file_path)}（{len(records)}条数据）")
+    rebuild_table_indexes(_table_name(file_path))
+    return True
+
+
+# INDEX_DIR的文件列表缓存：(目录签名, 文件名列表)；目录中增删文件（含其他进程）会改变目录的修改时间，
+# 签名不变时不重新列目录；create_index/drop_index 后主动失效（修改时间精度不足时也能立即看到变化）
+_index_listing = None
+
+
+def _index_files():
+    """INDEX_DIR中的文件名列表（目录不存在时为空）"""
+    global _index_listing
+    signature = _file_signature(INDEX_DIR)
+    if signature is None:
+        return []
+    listing = _index_listing
+    if listing is None or listing[0] != signature:
+        listing = _index_listing = (signature, os.listdir(INDEX_DIR))
+    return listing[1]
+
+
+def _invalidate_index_files():
+    global _index_listing
+    _index_listing = None
+
+
+def _registered_index_columns(table_name, suffix):
+    """表上已登记（索引文件 <表名>_<列名><suffix> 存在）的索引列；行号索引只适用于CSV存储"""
+    if _routed_engine(f"{DATA_DIR}/{table_name}.csv") is not None:
+        return []
+    return [file_name[len(table_name) + 1:-len(suffix)] for file_name in _index_files()
+            if file_name.startswith(f"{table_name}_") and file_name.endswith(suffix)]
+
+
+def _hash_index_columns(table_name):
+    """表上已登记的散列索引列"""
+    return _registered_index_columns(table_name, "_hash.idx")
+
+
+def _bitmap_index_columns(table_name):
+    """表上已登记的位图索引列"""
+    return _registered_index_columns(table_name, "_bitmap.idx")
+
+
+def _text_index_columns(table_name):
+    """表上已登记的文本索引列"""
+    return _registered_index_columns(table_name, "_text.idx")
+
+
+def _time_index_columns(table_name):
+    """表上已建立的时间索引列"""
+    return _registered_index_columns(table_name, "_time.idx")
+
+
+_composite_columns = {}  # 组合有序索引文件名 -> 文件中登记的 (前缀列元组, 时间列)
+
+
+def _composite_index_columns(table_name):
+    """
+    表上已建立的组合有序索引 [(前缀列元组, 时间列)]：列名取自索引文件中登记的列（列名可含下划线，不从文件名拆分），
+    无法读取的旧格式文件跳过（查询时按签名重建）
+    """
+    from index_core import CompositeIndex
+    suffix = "_composite.idx"
+    found = []
+    for name in _registered_index_columns(table_name, suffix):
+        file_name = f"{table_name}_{name}{suffix}"
+        if file_name not in _composite_columns:  # 文件名由列名决定，同一文件登记的列不变
+            columns = CompositeIndex.read_columns(os.path.join(INDEX_DIR, file_name))
+            if columns is None:
+                continue
+            _composite_columns[file_name] = columns
+        found.append(_composite_columns[file_name])
+    return found
+
+
+def _signed_indexes(table_name):
+    """
+    表上已建立的按基础表签名校验的索引（有序、时间、组合与位图索引）：追加写入后由写路径记入其增量
+    （见 index_core._AppendDelta），基础表被整表重写后按签名在下次查询时自动重建
+    """
+    from index_core import get_ordered_index, get_time_index, get_composite_index, get_bitmap_index
+    return [get_ordered_index(table_name, col) for col in _registered_index_columns(table_name, ".keys")] + \
+        [get_time_index(table_name, col) for col in _time_index_columns(table_name)] + \
+        [get_composite_index(table_name, prefix_cols, time_col)
+         for prefix_cols, time_col in _composite_index_columns(table_name)] + \
+        [get_bitmap_index(table_name, col) for col in _bitmap_index_columns(table_name)]
+
+
+def rebuild_table_indexes(table_name):
+    """重建某张表已存在的全部散列索引与文本索引（基础表被整表重写后调用；追加与按主键变更由写路径增量维护）"""
+    from index_core import get_hash_index, get_text_index
+    for index_col in _hash_index_columns(table_name):
+        get_hash_index(table_name, index_col).build()
+    for index_col in _text_index_columns(table_name):
+        get_text_index(table_name, index_col).build()
+
+
+# 推迟的整体重建：{表名}，None表示未推迟（线程内有效，见 deferred_index_rebuild）
+_deferred_rebuilds = threading.local()
+
+
+@contextmanager
+def deferred_index_rebuild():
+    """上下文内需要整体重建的散列索引推迟到退出时，每张表只重建一次（分批写入分区表时使用）"""
+    if getattr(_deferred_rebuilds, 'tables', None) is not None:
+        yield  # 嵌套使用时由最外层统一重建
+        return
+    _deferred_rebuilds.tables = set()
+    try:
+        yield
+    finally:
+        tables, _deferred_rebuilds.tables = _deferred_rebuilds.tables, None
+        for table_name in tables:
+            rebuild_table_indexes(table_name)
+
+
+# 可声明的二级索引类型：散列索引（任意列，写路径增量维护）、位图索引（低基数列，追加时记入增量）、
+# 文本索引（文本列的子串查询，见 text_search，写路径增量维护）
+INDEX_KINDS = ('hash', 'bitmap', 'text')
+
+
+def _secondary_index(table_name, column, kind):
+    from index_core import get_hash_index, get_bitmap_index, get_text_index
+    return {'hash': get_hash_index, 'bitmap': get_bitmap_index, 'text': get_text_index}[kind](table_name, column)
+
+
+def create_index(table_name, column, kind='hash'):
+    """
+    在任意表的任意列上声明二级索引（索引文件存在即视为已登记）
+    声明后由 query_express_order / query_user / query_courier 的查询规划自动选用
+    由存储引擎接管的表在引擎中建索引
+    :param kind: 'hash'（散列索引）、'bitmap'（位图索引，适用于orderStatus、网点ID等低基数列）
+                 或 'text'（文本索引，适用于uname、uaddress、goodsName等需要子串查询的列，不参与查询规划）
+    """
+    if kind not in INDEX_KINDS:
+        print(f"错误：不支持的索引类型{kind}（支持：{', '.join(INDEX_KINDS)}）")
+        return False
+    file_path = f"{DATA_DIR}/{table_name}.csv"
+    engine = _routed_engine(file_path)
+    if engine is not None:
+        return engine.create_index(table_name, column)
+    columns, _ = _read_fieldnames(file_path)
+    if columns is None:
+        print(f"错误：无法读取文件{file_path}的列名")
+        return False
+    if column not in columns:
+        print(f"错误：表{table_name}中不存在字段{column}")
+        return False
+    key_col = PRIMARY_KEYS.get(table_name)
+    if kind == 'hash' and key_col and column != key_col and key_col not in _hash_index_columns(table_name):
+        # 按主键变更时由主键索引定位基础表行来维护该索引（见 _index_changed），一并建立
+        _secondary_index(table_name, key_col, 'hash').build()
+    success = _secondary_index(table_name, column, kind).build()
+    _invalidate_index_files()
+    return success
+
+
+def drop_index(table_name, column, kind='hash'):
+    """删除已声明的二级索引"""
+    file_path = f"{DATA_DIR}/{table_name}.csv"
+    engine = _routed_engine(file_path)
+    if engine is not None:
+        return engine.drop_index(table_name, column)
+    if kind not in INDEX_KINDS or column not in list_indexes(table_name, kind):
+        print(f"错误：索引{table_name}_{column}不存在")
+        return False
+    index = _secondary_index(table_name, column, kind)
+    with _file_lock(index.delta_path).exclusive():
+        if kind == 'hash':
+            index._close()
+        for path in (index.index_path, index.delta_path):
+            if os.path.exists(path):
+                os.remove(path)
+    _invalidate_index_files()
+    print(f"✅ 索引已删除：{table_name}_{column}")
+    return True
+
+
+def list_indexes(table_name, kind='hash'):
+    """返回表上已声明的某类二级索引的列名列表"""
+    engine = _routed_engine(f"{DATA_DIR}/{table_name}.csv")
+    if engine is not None:
+        return engine.list_indexes(table_name)
+    if kind == 'text':
+        return _text_index_columns(table_name)
+    return _bitmap_index_columns(table_name) if kind == 'bitmap' else _hash_index_columns(table_name)
+
+
+def _index_appended(table_name, records, first_row, index_cols, text_cols=(), signed=(), before=None):
+    """
+    追加写入后增量维护散列索引、文本索引与按基础表签名校验的索引（signed，追加前的签名为before）：
+    新行行号从first_row起顺延；无法确定行号时散列/文本索引整体重建，signed中的索引按签名在下次查询时重建
+    """
+    from index_core import get_hash_index, get_text_index
+    if first_row is None:
+        deferred = getattr(_deferred_rebuilds, 'tables', None)
+        if deferred is not None:
+            deferred.add(table_name)
+        else:
+            rebuild_table_indexes(table_name)
+        return
+    for index_col in index_cols:
+        get_hash_index(table_name, index_col).insert_many(
+            [(record.get(index_col), first_row + i) for i, record in enumerate(records)])
+    key_col = PRIMARY_KEYS.get(table_name)
+    for index_col in text_cols:
+        get_text_index(table_name, index_col).insert_many(
+            [(first_row + i, record.get(key_col), record.get(index_col)) for i, record in enumerate(records)])
+    if signed:
+        after = _base_signature(f"{DATA_DIR}/{table_name}.csv")
+        for index in signed:
+            index.append(records, first_row, before, after)
+
+
+def _index_changed(file_path, op, records, previous):
+    """
+    按主键更新/删除后增量维护散列索引：由主键索引直接取得该主键所在的基础表行（一次查找，与旧值的重复行数无关），
+    把索引项从旧值移到新值（删除时移除）；行号不变，读取时再合并变更日志
+    主键上没有散列索引时（create_index 会一并建立）退回在旧值的候选行中核对主键
+    主键列上的索引不随变更维护：主键不可修改，删除时也保留指向基础表行的索引项（读取时由变更日志过滤），
+    使其始终是 主键 -> 基础表行 的映射（按主键取基础表版本时使用，见 _base_records_by_key）
+    未提供变更前的行时只能维护主键列上的索引，即无需处理
+    """
+    table_name = _table_name(file_path)
+    if _path_key(file_path) != _path_key(f"{DATA_DIR}/{table_name}.csv"):
+        return
+    _text_index_changed(table_name, op, records, previous)
+    key_col = PRIMARY_KEYS[table_name]
+    index_cols = [col for col in _hash_index_columns(table_name) if col != key_col]
+    if not index_cols or not previous:
+        return
+    from index_core import get_hash_index
+    base_rows = _base_rows_by_key(table_name, {record.get(key_col) for record in records})
+    for i, record in enumerate(records):
+        key = record.get(key_col)
+        old = previous[i]
+        for index_col in index_cols:
+            old_val = old.get(index_col)
+            new_val = None if op == 'D' else record.get(index_col)
+            if old_val is None or old_val == new_val:
+                continue
+            index = get_hash_index(table_name, index_col)
+            if base_rows is not None:
+                row_num = base_rows.get(key)
+            else:
+                # 没有主键索引：索引值相同的候选行逐行核对主键
+                row_num = next((row for row in index.lookup(old_val)
+                                if any(r.get(key_col) == key for r in fetch_rows(table_name, [row]))), None)
+            if row_num is None:
+                continue
+            if op == 'D':
+                index.delete(old_val, row_num)
+            else:
+                index.update(old_val, new_val, row_num)
+
+
+def _text_index_changed(table_name, op, records, previous):
+    """按主键更新/删除后增量维护文本索引（更新前后原文相同的列跳过）"""
+    text_cols = _text_index_columns(table_name)
+    if not text_cols:
+        return
+    from index_core import get_text_index
+    key_col = PRIMARY_KEYS[table_name]
+    for index_col in text_cols:
+        index = get_text_index(table_name, index_col)
+        for i, record in enumerate(records):
+            if op == 'D':
+                index.delete(record.get(key_col))
+            elif not previous or previous[i].get(index_col) != record.get(index_col):
+                index.update(record.get(key_col), record.get(index_col))
+
+
+def _phone_tries():
+    """已建立的手机号前缀/尾号索引（未建立的跳过，首次build时会包含全部数据）"""
+    from trie_index import get_phone_trie, get_phone_suffix_index
+    return [trie for trie in (get_phone_trie(), get_phone_suffix_index()) if os.path.exists(trie.index_path)]
 
 
+def _order_phones(order, uid_to_phone=None):
+    """快递单寄件人、收件人的手机号（可传入 uid -> 手机号 映射避免逐个查询用户表）"""
+    phones = []
+    for col in ('senderId', 'receiverId'):
+        uid = order.get(col)
+        if uid_to_phone is not None:
+            phones.append(uid_to_phone.get(uid))
+        else:
+            user = _get_by_key(f"{DATA_DIR}/User.csv", uid)
+            phones.append(user.get('uphone') if user else None)
+    return phones
+
 
 # ----------快递单号----------
+# 合法状态流转（0->1->2->3->4，0/1/2/3->5）
+ORDER_STATUS_TRANSITIONS = {
+    '0': ['1', '5'],    # 待收件 -> 已收件/异常
+    '1': ['2', '5'],    # 已收件 -> 中转中/异常
+    '2': ['3', '5'],    # 中转中 -> 派送中/异常
+    '3': ['4', '5'],    # 派送中 -> 已签收/异常
+    '4': [],            # 已签收不能变更
+    '5': []             # 异常不能变更
+}
+
+ORDER_REQUIRED_FIELDS = ['orderId', 'senderId', 'receiverId', 'goodsName', 'goodsWeight', 'sendBranchId',
+                         'targetBranchId']
+
+
+def _batch_result(row, key, error=None):
+    """批量接口的单行处理结果"""
+    return {'row': row, 'key': key, 'accepted': error is None, 'error': error or ''}
+
+
+def _finish_batch(file_path, accepted, results):
+    """批量写入已通过校验的行（一次writerows，索引由write_csv增量维护）"""
+    table_name = _table_name(file_path)
+    if accepted:
+        if not write_csv(file_path, accepted):
+            for result in results:
+                if result['accepted']:
+                    result['accepted'] = False
+                    result['error'] = "写入失败"
+    ok = sum(1 for result in results if result['accepted'])
+    print(f"批量写入{table_name}：成功{ok}条，拒绝{len(results) - ok}条")
+    return results
+
+
 # db_core.py 续
 # db_core.py（修改insert_express_order）
 def insert_express_order(order_data):
@@ -137,120 +1923,168 @@ def insert_express_order(order_data):
     order_data.setdefault('sendTime', datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
     order_data.setdefault('orderStatus', '0')  # 0=待收件
     # 验证必填字段（senderId和receiverId对应User表的uid）
-    required_fields = ['orderId', 'senderId', 'receiverId', 'goodsName', 'goodsWeight', 'sendBranchId',
-                       'targetBranchId']
-    if not all(field in order_data for field in required_fields):
+    if not all(field in order_data for field in ORDER_REQUIRED_FIELDS):
         print("错误：缺少必填字段（senderId/receiverId对应User表的uid）")
         return False
 
     # 额外验证：寄件人/收件人是否存在（关联User表）
-    users = read_csv(f"{DATA_DIR}/User.csv")
-    user_ids = [user['uid'] for user in users]
-    if order_data['senderId'] not in user_ids or order_data['receiverId'] not in user_ids:
+    users = {user['uid']: user for user in read_csv(f"{DATA_DIR}/User.csv")}
+    if order_data['senderId'] not in users or order_data['receiverId'] not in users:
         print("错误：寄件人或收件人不存在（uid未在User表中）")
         return False
-    success = write_csv(file_path, order_data)
+    # 验证单号唯一：先按主键查热表（走orderId索引），再查归档（单号在归档中同样必须唯一）
+    if _get_by_key(file_path, order_data['orderId']) is not None:
+        print("错误：快递单号已存在")
+        return False
+    from archive_core import is_archived
+    if is_archived(order_data['orderId']):
+        print("错误：快递单号已存在（已归档）")
+        return False
+    success = write_csv(file_path, order_data)  # orderId索引由write_csv增量维护
     if success:
-        # 新增：重建orderId索引
-        from index_core import HashIndex
-        order_index = HashIndex("ExpressOrder", "orderId")  # 表名+字段名
-        order_index.rebuild()  # 强制同步新数据到索引
+        phones = [users[order_data[col]].get('uphone') for col in ('senderId', 'receiverId')]
+        for trie in _phone_tries():
+            trie.add_order(order_data['orderId'], phones)
         print("快递单添加成功，索引已更新")
     return success
 
+def insert_express_orders(rows):
+    """
+    批量插入快递单：整批在内存键集合上一次校验（寄件人/收件人uid、网点ID、单号唯一），
+    一次writerows写入，索引增量维护
+    :param rows: 快递单字典列表（字段同insert_express_order）
+    :return: 每行处理结果 [{'row': 序号, 'key': 快递单号, 'accepted': 是否写入, 'error': 拒绝原因}]
+    """
+    file_path = f"{DATA_DIR}/ExpressOrder.csv"
+    user_phones = {user['uid']: user['uphone'] for user in iter_csv(f"{DATA_DIR}/User.csv", columns=['uid', 'uphone'])}
+    branch_ids = {b['branchId'] for b in iter_csv(f"{DATA_DIR}/ExpressBranch.csv", columns=['branchId'])}
+    from archive_core import archived_order_ids
+    order_ids = {order['orderId'] for order in iter_csv(file_path, columns=['orderId'])}
+    order_ids |= archived_order_ids()  # 单号在归档中同样必须唯一
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    accepted, results = [], []
+    for row, order_data in enumerate(rows):
+        order = dict(order_data)
+        order.setdefault('sendTime', now)
+        order.setdefault('orderStatus', '0')  # 0=待收件
+        error = None
+        if not all(field in order for field in ORDER_REQUIRED_FIELDS):
+            error = "缺少必填字段"
+        elif order['senderId'] not in user_phones or order['receiverId'] not in user_phones:
+            error = "寄件人或收件人不存在（uid未在User表中）"
+        elif order['sendBranchId'] not in branch_ids or order['targetBranchId'] not in branch_ids:
+            error = "寄件网点或目标网点不存在（branchId未在ExpressBranch表中）"
+        elif order['orderId'] in order_ids:
+            error = "快递单号已存在"
+        results.append(_batch_result(row, order.get('orderId'), error))
+        if error is None:
+            order_ids.add(order['orderId'])
+            accepted.append(order)
+    results = _finish_batch(file_path, accepted, results)
+    if any(result['accepted'] for result in results):
+        added = [(order['orderId'], _order_phones(order, user_phones)) for order in accepted]
+        for trie in _phone_tries():
+            trie.add_orders(added)
+    return results
+
 def query_express_order(condition=None, use_index=False):
-    """查询快递单，支持条件过滤和索引查询"""
+    """
+    查询快递单，支持条件过滤（条件涉及已登记索引的列时自动走索引，按字节偏移直接读取命中的行；
+    无可用索引时边读边过滤，按单号查询命中即停止）
+    按单号查询在热表未命中时回落到冷数据归档（已签收/异常的快递单）
+    :param use_index: 已不再需要（由查询规划自动选择索引），保留以兼容旧调用
+    """
     file_path = f"{DATA_DIR}/ExpressOrder.csv"
-    orders = read_csv(file_path)
-    if not orders:
-        return []
+    results = _query_table(file_path, condition, PRIMARY_KEYS['ExpressOrder'])
 
-    # 索引查询优先（若启用且条件包含orderId）
-    if use_index and condition and 'orderId' in condition:
-        # 修复：使用HashIndex类查询，而非search_order_index
-        from index_core import HashIndex
-        # 初始化orderId索引
-        order_index = HashIndex(table_name="ExpressOrder", index_col="orderId")
-        # 查询索引，获取匹配的行号（行号从2开始）
-        match_rows = order_index.search(condition['orderId'])
-        # 映射到列表索引（行号-2 = 列表索引，因为orders[0]对应行号2）
-        index_matched = [
-            row_num - 2
-            for row_num in match_rows
-            if 0 <= row_num - 2 < len(orders)  # 确保索引有效
-        ]
-        # 过滤出匹配的快递单
-        orders = [orders[i] for i in index_matched]
-        print(f"索引查询到{len(orders)}条匹配的快递单")
-
-    # 条件过滤（处理其他条件，如状态、网点等）
-    if condition:
-        # 排除已通过索引查询的orderId条件
-        filter_cond = {k: v for k, v in condition.items() if k != 'orderId'}
-        if filter_cond:
-            orders = [
-                order for order in orders
-                if all(order.get(k) == v for k, v in filter_cond.items())
-            ]
-
-    return orders
+    if not results and condition and 'orderId' in condition:
+        from archive_core import get_archived_order
+        archived = get_archived_order(condition['orderId'])
+        if archived is not None and _condition_predicate(condition)(archived):
+            results = [archived]
+    return results
 
 def update_express_order(order_id, update_data):
-    """更新快递单信息（增强状态变更校验）"""
+    """更新快递单信息（增强状态变更校验；只追加一条变更日志，不重写整表）"""
     file_path = f"{DATA_DIR}/ExpressOrder.csv"
-    orders = read_csv(file_path)
-    if not orders:
-        return False
-
-    # 定义合法状态流转（0->1->2->3->4，0/1/2/3->5）
-    valid_transitions = {
-        '0': ['1', '5'],    # 待收件 -> 已收件/异常
-        '1': ['2', '5'],    # 已收件 -> 中转中/异常
-        '2': ['3', '5'],    # 中转中 -> 派送中/异常
-        '3': ['4', '5'],    # 派送中 -> 已签收/异常
-        '4': [],            # 已签收不能变更
-        '5': []             # 异常不能变更
-    }
-
-    # 查找目标快递单并校验状态
-    updated = False
-    for order in orders:
-        if order['orderId'] == order_id:
-            # 状态变更校验
-            if 'orderStatus' in update_data:
-                current_status = order['orderStatus']
-                new_status = update_data['orderStatus']
-                if new_status not in valid_transitions[current_status]:
-                    print(f"错误：状态从{current_status}到{new_status}的流转不合法")
-                    return False
-            # 执行更新
-            for key, value in update_data.items():
-                if key in order:
-                    order[key] = value
-            updated = True
-            break
-
-    if updated:
-        return write_csv(file_path, orders, mode='w')
-    else:
+    order = _get_by_key(file_path, order_id)
+    if order is None:
         print("未找到目标快递单")
         return False
 
-def delete_express_order(order_id):
-    """删除快递单"""
+    # 状态变更校验
+    if 'orderStatus' in update_data:
+        current_status = order['orderStatus']
+        new_status = update_data['orderStatus']
+        if new_status not in ORDER_STATUS_TRANSITIONS.get(current_status, []):
+            print(f"错误：状态从{current_status}到{new_status}的流转不合法")
+            return False
+    # 执行更新（主键不可修改）
+    previous = dict(order)
+    for key, value in update_data.items():
+        if key in order and key != 'orderId':
+            order[key] = value
+
+    return append_change_log(file_path, 'U', order, previous=previous)
+
+def update_express_orders_status(status_updates):
+    """
+    批量变更快递单状态（扫描枪批量上报场景）：一次扫描快递单表校验全部状态流转，
+    合法的变更一次性写入变更日志；N条变更只需一次表扫描和一次写入
+    :param status_updates: {快递单号: 新状态}
+    :return: 每单处理结果 [{'row': 序号, 'key': 快递单号, 'accepted': 是否变更, 'error': 拒绝原因}]
+    """
     file_path = f"{DATA_DIR}/ExpressOrder.csv"
-    orders = read_csv(file_path)
-    if not orders:
-        return False
+    pending = dict(status_updates)
+
+    # 一次扫描取出全部目标快递单，全部找到后提前结束
+    current = {}
+    if pending:
+        rows = iter_csv(file_path, predicate=lambda order: order['orderId'] in pending)
+        for order in rows:
+            current[order['orderId']] = order
+            if len(current) == len(pending):
+                break
+        rows.close()
+
+    updated, previous, results = [], [], []
+    for row, (order_id, new_status) in enumerate(pending.items()):
+        order = current.get(order_id)
+        error = None
+        if order is None:
+            error = "未找到目标快递单"
+        elif new_status not in ORDER_STATUS_TRANSITIONS.get(order['orderStatus'], []):
+            error = f"状态从{order['orderStatus']}到{new_status}的流转不合法"
+        results.append(_batch_result(row, order_id, error))
+        if error is None:
+            previous.append(dict(order))
+            order['orderStatus'] = new_status
+            updated.append(order)
 
-    # 过滤掉待删除记录
-    remaining_orders = [order for order in orders if order['orderId'] != order_id]
-    if len(remaining_orders) == len(orders):
+    if updated and not append_change_log(file_path, 'U', updated, previous=previous):
+        for result in results:
+            if result['accepted']:
+                result['accepted'] = False
+                result['error'] = "写入失败"
+    ok = sum(1 for result in results if result['accepted'])
+    print(f"批量状态变更：成功{ok}单，拒绝{len(results) - ok}单")
+    return results
+
+def delete_express_order(order_id):
+    """删除快递单（追加删除标记，不重写整表）"""
+    file_path = f"{DATA_DIR}/ExpressOrder.csv"
+    order = _get_by_key(file_path, order_id)
+    if order is None:
         print("未找到目标快递单")
         return False
 
-    # 批量写入优化
-    return write_csv(file_path, remaining_orders, mode='w')
+    success = append_change_log(file_path, 'D', {'orderId': order_id}, previous=order)
+    if success:
+        phones = _order_phones(order)
+        for trie in _phone_tries():
+            trie.remove_order(order_id, phones)
+    return success
 
 
 # ----------------------快递轨迹--------------------------
@@ -260,24 +2094,27 @@ def delete_express_order(order_id):
 # ------------------用户---------------------------------
 
 # db_core.py（新增用户表操作函数）
-def insert_user(user_data):
-    """插入用户（寄件人/收件人）"""
-    file_path = f"{DATA_DIR}/User.csv"
-    # 验证必填字段
+def _user_error(user_data):
+    """校验用户必填字段及格式，返回错误信息（合法时返回None）"""
     required_fields = ['uid', 'uname', 'utype', 'uphone', 'uprovince', 'ucity', 'uaddress']
     if not all(field in user_data for field in required_fields):
-        print("错误：缺少必填字段（uid/姓名/手机号/地址等）")
-        return False
-
-    # 格式验证（用户自定义完整性约束）
+        return "缺少必填字段（uid/姓名/手机号/地址等）"
     if not user_data['uphone'].isdigit() or len(user_data['uphone']) != 11:
-        print("错误：手机号必须是11位数字")
-        return False
+        return "手机号必须是11位数字"
     if user_data['utype'] not in ['普通用户', '商家用户']:
-        print("错误：用户类型只能是「普通用户」「商家用户」（快递员请使用insert_courier函数）")
-        return False
+        return "用户类型只能是「普通用户」「商家用户」（快递员请使用insert_courier函数）"
     if user_data.get('uidcard') and (len(user_data['uidcard']) != 18 or not user_data['uidcard'][:-1].isdigit()):
-        print("错误：身份证号格式错误（18位，最后一位可为X）")
+        return "身份证号格式错误（18位，最后一位可为X）"
+    return None
+
+
+def insert_user(user_data):
+    """插入用户（寄件人/收件人）"""
+    file_path = f"{DATA_DIR}/User.csv"
+    # 验证必填字段及格式（用户自定义完整性约束）
+    error = _user_error(user_data)
+    if error:
+        print(f"错误：{error}")
         return False
 
     # 验证uid唯一
@@ -286,105 +2123,128 @@ def insert_user(user_data):
         print("错误：uid已存在（用户ID必须唯一）")
         return False
 
-    success = write_csv(file_path, user_data)
+    success = write_csv(file_path, user_data)  # uphone索引由write_csv增量维护
     if success:
-        # 数据添加成功后，重建uphone索引
-        from index_core import HashIndex
-        user_phone_index = HashIndex("User", "uphone")  # 表名+索引字段
-        user_phone_index.build()  # 重建索引（自动读取最新数据）
         print("用户添加成功，索引已同步更新")
     return success
 
 
-def query_user(condition=None):
-    """查询用户（支持按手机号、省份、城市等条件）"""
+def insert_users(rows):
+    """
+    批量插入用户：整批一次校验（格式、uid唯一），一次writerows写入，索引增量维护
+    :return: 每行处理结果 [{'row': 序号, 'key': uid, 'accepted': 是否写入, 'error': 拒绝原因}]
+    """
     file_path = f"{DATA_DIR}/User.csv"
-    users = read_csv(file_path)
-    if not users or not condition:
-        return users
+    uids = {user['uid'] for user in iter_csv(file_path, columns=['uid'])}
+
+    accepted, results = [], []
+    for row, user_data in enumerate(rows):
+        error = _user_error(user_data)
+        if error is None and user_data['uid'] in uids:
+            error = "uid已存在（用户ID必须唯一）"
+        results.append(_batch_result(row, user_data.get('uid'), error))
+        if error is None:
+            uids.add(user_data['uid'])
+            accepted.append(user_data)
+    return _finish_batch(file_path, accepted, results)
+
 
+def query_user(condition=None):
+    """查询用户（支持按手机号、省份、城市等条件，边读边过滤，按uid查询命中即停止）"""
+    file_path = f"{DATA_DIR}/User.csv"
     # 条件过滤（如{"uphone": "13800138000", "ucity": "北京市"}）
-    results = []
-    for user in users:
-        match = True
-        for key, value in condition.items():
-            if user[key] != value:
-                match = False
-                break
-        if match:
-            results.append(user)
-    return results
+    return _query_table(file_path, condition, PRIMARY_KEYS['User'])
 
 def update_user(uid, update_data):
-    """更新用户信息"""
+    """更新用户信息（只追加一条变更日志，不重写整表）"""
     file_path = f"{DATA_DIR}/User.csv"
-    users = read_csv(file_path)
-    if not users:
+    user = _get_by_key(file_path, uid)
+    if user is None:
+        print("未找到目标用户")
         return False
 
+    # 验证更新字段（如手机号格式）
+    if 'uphone' in update_data:
+        phone = update_data['uphone']
+        if not (phone.isdigit() and len(phone) == 11):
+            print("错误：手机号必须是11位数字")
+            return False
+    # 执行更新（主键不可修改）
+    previous = dict(user)
+    for key, value in update_data.items():
+        if key in user and key != 'uid':
+            user[key] = value
 
-    # 查找目标用户
-    updated = False
-    for user in users:
-        if user['uid'] == uid:
-            # 验证更新字段（如手机号格式）
-            if 'uphone' in update_data:
-                phone = update_data['uphone']
-                if not (phone.isdigit() and len(phone) == 11):
-                    print("错误：手机号必须是11位数字")
-                    return False
-            # 执行更新
-            for key, value in update_data.items():
-                if key in user:
-                    user[key] = value
-            updated = True
-            break
-
-    if updated:
-        return write_csv(file_path, users, mode='w')
-    else:
-        print("未找到目标用户")
-        return False
+    success = append_change_log(file_path, 'U', user, previous=previous)
+    if success and user.get('uphone') != previous.get('uphone'):
+        tries = _phone_tries()
+        moved = _user_order_phones(uid, previous.get('uphone')) if tries else []
+        for trie in tries:
+            trie.update_order_phones(moved)
+    return success
+
+
+def _user_order_phones(uid, old_phone):
+    """
+    用户修改手机号（已写入变更日志）后，其作为寄件人/收件人的快递单（含已归档）新旧两组手机号
+    :return: [(单号, 旧手机号列表, 新手机号列表)]，手机号按寄件人、收件人顺序
+    """
+    from archive_core import iter_archived_orders
+    uid_to_phone = {user['uid']: user['uphone'] for user in iter_csv(f"{DATA_DIR}/User.csv", columns=['uid', 'uphone'])}
+    hot_orders = iter_csv(f"{DATA_DIR}/ExpressOrder.csv", columns=['orderId', 'senderId', 'receiverId'])
+    moved = []
+    for orders in (hot_orders, iter_archived_orders()):
+        for order in orders:
+            if uid not in (order.get('senderId'), order.get('receiverId')):
+                continue
+            new_phones = _order_phones(order, uid_to_phone)
+            old_phones = [old_phone if order.get(col) == uid else phone
+                          for col, phone in zip(('senderId', 'receiverId'), new_phones)]
+            moved.append((order['orderId'], old_phones, new_phones))
+    return moved
 
 
 def delete_user(uid):
-    """删除用户"""
+    """删除用户（追加删除标记，不重写整表）"""
     file_path = f"{DATA_DIR}/User.csv"
-    users = read_csv(file_path)
-    if not users:
-        return False
-
-    # 过滤掉待删除用户
-    remaining_users = [user for user in users if user['uid'] != uid]
-    if len(remaining_users) == len(users):
+    user = _get_by_key(file_path, uid)
+    if user is None:
         print("未找到目标用户")
         return False
 
-    # 检查用户是否有关联快递单（外键约束简化版）
-    orders = read_csv(f"{DATA_DIR}/ExpressOrder.csv")
-    if any(order['senderId'] == uid or order['receiverId'] == uid for order in orders):
+    # 检查用户是否有关联快递单（外键约束简化版，命中一条即停止读取）
+    related = iter_csv(f"{DATA_DIR}/ExpressOrder.csv",
+                       predicate=lambda order: order['senderId'] == uid or order['receiverId'] == uid)
+    has_orders = next(related, None) is not None
+    related.close()
+    if has_orders:
         print("错误：用户存在关联快递单，无法删除")
         return False
 
-    return write_csv(file_path, remaining_users, mode='w')
+    return append_change_log(file_path, 'D', {'uid': uid}, previous=user)
 
 
 
 # ------------------快递员管理---------------------------------
 
+def _courier_error(courier_data):
+    """校验快递员必填字段及手机号格式，返回错误信息（合法时返回None）"""
+    required_fields = ['courierId', 'courierName', 'courierPhone', 'branchId']
+    if not all(field in courier_data for field in required_fields):
+        return "缺少必填字段（courierId/courierName/courierPhone/branchId）"
+    if not courier_data['courierPhone'].isdigit() or len(courier_data['courierPhone']) != 11:
+        return "手机号必须是11位数字"
+    return None
+
+
 def insert_courier(courier_data):
     """插入快递员"""
     file_path = f"{DATA_DIR}/Courier.csv"
     
-    # 验证必填字段
-    required_fields = ['courierId', 'courierName', 'courierPhone', 'branchId']
-    if not all(field in courier_data for field in required_fields):
-        print("错误：缺少必填字段（courierId/courierName/courierPhone/branchId）")
-        return False
-    
-    # 格式验证：手机号
-    if not courier_data['courierPhone'].isdigit() or len(courier_data['courierPhone']) != 11:
-        print("错误：手机号必须是11位数字")
+    # 验证必填字段及手机号格式
+    error = _courier_error(courier_data)
+    if error:
+        print(f"错误：{error}")
         return False
     
     # 验证courierId唯一性
@@ -405,112 +2265,153 @@ def insert_courier(courier_data):
     return success
 
 
+def insert_couriers(rows):
+    """
+    批量插入快递员：整批一次校验（格式、courierId唯一、网点存在），一次writerows写入
+    :return: 每行处理结果 [{'row': 序号, 'key': courierId, 'accepted': 是否写入, 'error': 拒绝原因}]
+    """
+    file_path = f"{DATA_DIR}/Courier.csv"
+    courier_ids = {c['courierId'] for c in iter_csv(file_path, columns=['courierId'])}
+    branch_ids = {b['branchId'] for b in iter_csv(f"{DATA_DIR}/ExpressBranch.csv", columns=['branchId'])}
+
+    accepted, results = [], []
+    for row, courier_data in enumerate(rows):
+        error = _courier_error(courier_data)
+        if error is None and courier_data['courierId'] in courier_ids:
+            error = "courierId已存在（快递员ID必须唯一）"
+        elif error is None and courier_data['branchId'] not in branch_ids:
+            error = "所属网点不存在（branchId未在ExpressBranch表中）"
+        results.append(_batch_result(row, courier_data.get('courierId'), error))
+        if error is None:
+            courier_ids.add(courier_data['courierId'])
+            accepted.append(courier_data)
+    return _finish_batch(file_path, accepted, results)
+
+
 def query_courier(condition=None):
-    """查询快递员（支持按ID、姓名、手机号、网点等条件）"""
+    """查询快递员（支持按ID、姓名、手机号、网点等条件，边读边过滤，按ID查询命中即停止）"""
     file_path = f"{DATA_DIR}/Courier.csv"
-    couriers = read_csv(file_path)
-    if not couriers or not condition:
-        return couriers
-    
-    # 条件过滤
-    results = []
-    for courier in couriers:
-        match = True
-        for key, value in condition.items():
-            if courier.get(key) != value:
-                match = False
-                break
-        if match:
-            results.append(courier)
-    return results
+    return _query_table(file_path, condition, PRIMARY_KEYS['Courier'])
 
 
 def update_courier(courier_id, update_data):
-    """更新快递员信息"""
+    """更新快递员信息（只追加一条变更日志，不重写整表）"""
     file_path = f"{DATA_DIR}/Courier.csv"
-    couriers = read_csv(file_path)
-    if not couriers:
-        return False
-    
-    # 查找目标快递员
-    updated = False
-    for courier in couriers:
-        if courier['courierId'] == courier_id:
-            # 验证更新字段（如手机号格式）
-            if 'courierPhone' in update_data:
-                phone = update_data['courierPhone']
-                if not (phone.isdigit() and len(phone) == 11):
-                    print("错误：手机号必须是11位数字")
-                    return False
-            # 验证网点是否存在
-            if 'branchId' in update_data:
-                branches = read_csv(f"{DATA_DIR}/ExpressBranch.csv")
-                if not any(b['branchId'] == update_data['branchId'] for b in branches):
-                    print("错误：所属网点不存在")
-                    return False
-            # 执行更新
-            for key, value in update_data.items():
-                if key in courier:
-                    courier[key] = value
-            updated = True
-            break
-    
-    if updated:
-        return write_csv(file_path, couriers, mode='w')
-    else:
+    courier = _get_by_key(file_path, courier_id)
+    if courier is None:
         print("未找到目标快递员")
         return False
 
+    # 验证更新字段（如手机号格式）
+    if 'courierPhone' in update_data:
+        phone = update_data['courierPhone']
+        if not (phone.isdigit() and len(phone) == 11):
+            print("错误：手机号必须是11位数字")
+            return False
+    # 验证网点是否存在
+    if 'branchId' in update_data:
+        branches = read_csv(f"{DATA_DIR}/ExpressBranch.csv")
+        if not any(b['branchId'] == update_data['branchId'] for b in branches):
+            print("错误：所属网点不存在")
+            return False
+    # 执行更新（主键不可修改）
+    previous = dict(courier)
+    for key, value in update_data.items():
+        if key in courier and key != 'courierId':
+            courier[key] = value
+
+    return append_change_log(file_path, 'U', courier, previous=previous)
+
 
 def delete_courier(courier_id):
-    """删除快递员"""
+    """删除快递员（追加删除标记，不重写整表）"""
     file_path = f"{DATA_DIR}/Courier.csv"
-    couriers = read_csv(file_path)
-    if not couriers:
-        return False
-    
-    # 过滤掉待删除快递员
-    remaining_couriers = [c for c in couriers if c['courierId'] != courier_id]
-    if len(remaining_couriers) == len(couriers):
+    courier = _get_by_key(file_path, courier_id)
+    if courier is None:
         print("未找到目标快递员")
         return False
-    
-    return write_csv(file_path, remaining_couriers, mode='w')
+
+    return append_change_log(file_path, 'D', {'courierId': courier_id}, previous=courier)
 
 
 # db_core.py 续
+# 快递员派送统计：派送中/已签收的快递单，由 (目标网点, 状态, 寄件时间) 组合索引定位
+DELIVERY_STATUSES = ('3', '4')
+DELIVERY_INDEX_PREFIX = ('targetBranchId', 'orderStatus')
+
+
+def _delivery_orders(branch_ids, period=None, statuses=DELIVERY_STATUSES):
+    """
+    查询目标网点在branch_ids中、状态在statuses中、寄件时间落在period内的快递单（已合并变更日志，按寄件时间升序）
+    组合索引按 (网点, 状态) 定位到组，再在组内二分寄件时间区间，只读取命中的行
+    :param period: (start, end) epoch秒区间，None表示不限
+    """
+    file_path = f"{DATA_DIR}/ExpressOrder.csv"
+    start, end = period or (None, None)
+    branch_ids = set(branch_ids)
+    if _routed_engine(file_path) is not None:
+        records = iter_csv(file_path)  # 非CSV存储引擎：由引擎扫描后过滤
+    else:
+        from index_core import get_composite_index
+        index = get_composite_index("ExpressOrder", DELIVERY_INDEX_PREFIX, 'sendTime')
+        with _file_lock(file_path).shared():
+            row_numbers = sorted(row_num for branch_id in branch_ids for status in statuses
+                                 for row_num in index.search((branch_id, status), start, end))
+            records = fetch_rows("ExpressOrder", row_numbers)
+        # 变更日志中的状态流转（如中转中 -> 派送中）不在基础表中：合并后按条件重新校验
+        changes = _load_change_log(file_path)
+        if changes:
+            records = _merge_change_log(records, changes, 'orderId')
+
+    results = []
+    for record in records:
+        epoch = parse_time(record.get('sendTime'))
+        if epoch is None or (start is not None and epoch < start) or (end is not None and epoch >= end):
+            continue
+        if record.get('targetBranchId') in branch_ids and record.get('orderStatus') in statuses:
+            results.append((epoch, record))
+    results.sort(key=lambda item: item[0])
+    return [record for _, record in results]
+
+
 def join_courier_orders(courier_id, date):
-    """多表连接：查询快递员今日派送的快递（Courier + ExpressOrder + User）"""
-    # 读取三张表数据
-    courier_path = f"{DATA_DIR}/Courier.csv"
-    order_path = f"{DATA_DIR}/ExpressOrder.csv"
-    user_path = f"{DATA_DIR}/User.csv"
-    couriers = read_csv(courier_path )
-    orders = read_csv(order_path)
-    users = read_csv(user_path)
+    """
+    多表连接：查询快递员某日派送的快递（Courier + ExpressOrder + User）
+    :param date: 日期（'2024-12-10' 或 '2024/12/10'，也可传月份 '2024-12'），
+                 与数据中的时间格式无关，通过寄件时间索引定位当天的快递单
+    """
+    day = period_range(date)
+    if day is None:
+        print(f"错误：无法解析日期 {date}")
+        return []
+    courier = _get_by_key(f"{DATA_DIR}/Courier.csv", courier_id)
+    if courier is None:
+        return []
 
+    # 组合索引定位快递员所在网点当天派送中/已签收的快递单；已签收的可能已归档，由段汇总定位到相关的段读取
+    from archive_core import archived_delivery_orders
+    orders = _delivery_orders([courier['branchId']], day) + \
+        archived_delivery_orders([courier['branchId']], DELIVERY_STATUSES, day)
+    if not orders:
+        return []
+    orders.sort(key=lambda order: parse_time(order.get('sendTime')))
+    # 匹配收件人信息（哈希连接）
+    receiver_ids = {order['receiverId'] for order in orders}
+    users = {user['uid']: user for user in iter_csv(f"{DATA_DIR}/User.csv",
+                                                     predicate=lambda u: u['uid'] in receiver_ids)}
     results = []
-    # 嵌套循环连接（简化版，适合小数据量）
-    for courier in couriers:
-        if courier['courierId'] != courier_id:
+    for order in orders:
+        user = users.get(order['receiverId'])
+        if user is None:
             continue
-        # 匹配快递员所属网点的快递
-        for order in orders:
-            if (order['targetBranchId'] != courier['branchId'] or
-                    order['orderStatus'] not in ['3', '4'] or  # 派送中/已签收
-                    not order['sendTime'].startswith(date)):
-                continue
-            # 匹配收件人信息
-            for user in users:
-                if user['uid'] == order['receiverId']:
-                    results.append({
-                        '快递单号': order['orderId'],
-                        '收件人姓名': user['uname'],
-                        '收件人电话': user['uphone'],
-                        '物品名称': order['goodsName'],
-                        '状态': ORDER_STATUS_MAP[order['orderStatus']],
-                        '寄件时间': order['sendTime']
-                    })
+        results.append({
+            '快递单号': order['orderId'],
+            '收件人姓名': user['uname'],
+            '收件人电话': user['uphone'],
+            '物品名称': order['goodsName'],
+            '状态': ORDER_STATUS_MAP[order['orderStatus']],
+            '寄件时间': order['sendTime']
+        })
     return results
 
 
@@ -531,6 +2432,29 @@ def create_view(view_name, define_sql, creator_id):
     return True
 
 
+def _view_orders(condition, period_key):
+    """视图的快递单数据源：条件中指定了月份/日期时按寄件时间裁剪分区，只读取相关月份"""
+    file_path = f"{DATA_DIR}/ExpressOrder.csv"
+    period = period_range(condition.get(period_key)) if condition and condition.get(period_key) else None
+    if period is None or _routed_engine(file_path) is not None:
+        return read_csv(file_path)
+    return list(_iter_merged(file_path, *period))
+
+
+def _normalize_period(condition, period_key):
+    """
+    把条件中的日期/月份规范为视图结果中的格式（'2024/12/10' -> '2024-12-10'，'2024/12' -> '2024-12'），
+    无法解析时保持原值
+    """
+    if not condition or not condition.get(period_key):
+        return condition
+    period = period_range(condition[period_key])
+    if period is None:
+        return condition
+    width = 10 if len(condition[period_key].strip().replace('/', '-').split('-')) == 3 else 7
+    return dict(condition, **{period_key: format_time(period[0])[:width]})
+
+
 def query_view(view_name, condition=None):
     """查询视图：解析SQL并执行基础表查询"""
     meta_path = VIEWS_META_PATH
@@ -559,18 +2483,20 @@ def query_view(view_name, condition=None):
 
     # 简化SQL解析（实际可扩展为完整解析器）
     if "BranchMonthlySend" in view_name:
-        # 网点月度寄件量统计视图
-        orders = read_csv(f"{DATA_DIR}/ExpressOrder.csv")
-        if not orders:
-            print("警告：快递单表为空")
+        # 网点月度寄件量统计视图（按月份查询时只读取该月分区；已归档的快递单由段汇总计入）
+        from archive_core import archived_send_counts
+        condition = _normalize_period(condition, 'month')
+        orders = _view_orders(condition, 'month')
+        stats = archived_send_counts()
+        if not orders and not stats:
+            print("警告：快递单表为空（或指定月份无数据）")
             return []
         
-        stats = {}
         for order in orders:
-            # 确保sendTime字段存在且有效
-            send_time = order.get('sendTime', '')
-            if len(send_time) >= 7:  # 至少包含 "YYYY-MM"
-                key = (order['sendBranchId'], send_time[:7])  # 网点ID+年月
+            # 寄件时间统一解析后取规范年月（兼容 2024/12/10 8:30 等格式），无效时间跳过
+            send_time = format_time(parse_time(order.get('sendTime')))
+            if send_time:
+                key = (order['sendBranchId'], send_time[:7])  # 网点ID+年月（YYYY-MM）
                 stats[key] = stats.get(key, 0) + 1
         
         # 转换为结果集并过滤条件
@@ -585,23 +2511,31 @@ def query_view(view_name, condition=None):
         return results
     
     elif "CourierDailyStats" in view_name:
-        # 快递员每日派送统计视图
-        from datetime import datetime
+        # 快递员每日派送统计视图（条件指定快递员/日期时只查询其网点/当天，由组合索引定位）
+        condition = _normalize_period(condition, 'date')
         couriers = read_csv(f"{DATA_DIR}/Courier.csv")
-        orders = read_csv(f"{DATA_DIR}/ExpressOrder.csv")
-        
+        if condition and condition.get('courierId'):
+            couriers = [courier for courier in couriers if courier['courierId'] == condition['courierId']]
+        period = period_range(condition['date']) if condition and condition.get('date') else None
+        branch_couriers = {}
+        for courier in couriers:
+            branch_couriers.setdefault(courier.get('branchId'), []).append(courier['courierId'])
+
         stats = {}
-        for order in orders:
-            # 统计派送中和已签收的快递
-            if order.get('orderStatus') in ['3', '4']:
-                send_date = order.get('sendTime', '')[:10]  # 取日期部分
-                target_branch = order.get('targetBranchId', '')
-                
-                # 找到该网点的快递员
-                for courier in couriers:
-                    if courier.get('branchId') == target_branch:
-                        key = (courier['courierId'], send_date)
-                        stats[key] = stats.get(key, 0) + 1
+        # 统计派送中和已签收的快递
+        for order in _delivery_orders(branch_couriers, period):
+            send_date = format_time(parse_time(order.get('sendTime')))[:10]  # 规范日期 YYYY-MM-DD
+            # 该网点的快递员
+            for courier_id in branch_couriers[order['targetBranchId']]:
+                key = (courier_id, send_date)
+                stats[key] = stats.get(key, 0) + 1
+        # 已归档（已签收）的快递由段汇总计入，不解压归档段
+        from archive_core import archived_delivery_counts
+        for (branch_id, send_date), count in archived_delivery_counts(branch_couriers, DELIVERY_STATUSES,
+                                                                      period).items():
+            for courier_id in branch_couriers[branch_id]:
+                key = (courier_id, send_date)
+                stats[key] = stats.get(key, 0) + count
         
         results = []
         for (courier_id, date), count in stats.items():
@@ -613,13 +2547,8 @@ def query_view(view_name, condition=None):
         return results
     
     elif "OrderStatusStats" in view_name:
-        # 快递状态分布统计视图
-        orders = read_csv(f"{DATA_DIR}/ExpressOrder.csv")
-        stats = {}
-        for order in orders:
-            status = order.get('orderStatus', '')
-            status_name = ORDER_STATUS_MAP.get(status, '未知')
-            stats[status] = stats.get(status, 0) + 1
+        # 快递状态分布统计视图（orderStatus上有位图索引时直接由popcount计数，不读取数据行）
+        stats = count_group_by("ExpressOrder", "orderStatus")
         
         results = []
         for status, count in stats.items():
@@ -639,3 +2568,22 @@ def query_view(view_name, condition=None):
         return []
 
 
+if __name__ == "__main__":
+    # 命令行工具：
+    #   python db_core.py migrate-encoding        数据表统一转码为UTF-8
+    #   python db_core.py compact [表名 ...]       将变更日志合并回基础表（默认全部）
+    #   python db_core.py partition 表名 ...       表按月分区（ExpressOrder/ExpressTrack）
+    #   python db_core.py unpartition 表名 ...     分区表合并回单个CSV
+    if len(sys.argv) >= 2 and sys.argv[1] == 'migrate-encoding':
+        migrate_csv_encoding()
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'compact':
+        for table in sys.argv[2:] or list(PRIMARY_KEYS):
+            compact_table(f"{DATA_DIR}/{table}.csv")
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'partition':
+        for table in sys.argv[2:]:
+            partition_table(table)
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'unpartition':
+        for table in sys.argv[2:]:
+            unpartition_table(table)
+    else:
+        print("用法：python db_core.py migrate-encoding | compact [表名 ...] | partition 表名 ... | unpartition 表名 ...")
@@ -1,123 +1,642 @@
 # index_core.py
-import csv
-import pickle
+import mmap
 import os
+import struct
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from hashlib import blake2b
+from heapq import merge
 from db_core import read_csv, DATA_DIR, INDEX_DIR  # 导入核心模块和路径常量
+from db_core import (parse_time, _iter_base_records, _file_lock, _file_signature, _base_signature,
+                     _read_fieldnames, PRIMARY_KEYS)
+
+
+# -------------------------- 按基础表签名校验的索引的追加增量 --------------------------
+# 有序、时间、组合与位图索引的行号直接对应基础表行，按基础表签名（修改时间、大小）校验是否与基础表一致。
+# 追加写入（write_csv）不使其失效：新行的条目追加到 <索引文件>.delta，每次追加为若干条目行加一行追加后的签名：
+#   +<SEP>行号<SEP>值...        新行的索引条目
+#   =<SEP>修改时间<SEP>大小       此前的条目并入后索引对应的基础表签名
+# 加载时在主索引文件上重放增量（只处理到最后一个签名行），最后的签名与当前基础表一致即可用；
+# 整表重写、合并变更日志等其他写入不记增量，签名对不上时与之前一样整体重建。
+# 按主键更新/删除只追加变更日志、不改变基础表，查询时合并变更日志即可（见 query_by_time、_delivery_orders）
+# 增量条目数达到主索引条目数的一定比例时合并重写主索引文件
+SIGNED_DELTA_MIN_ENTRIES = 1024   # 增量少于该条目数时不合并
+SIGNED_DELTA_RATIO = 0.2          # 增量条目数达到索引条目数的该比例时合并
+SIGNED_DELTA_SEP = '\x1f'
+
+
+class _AppendDelta:
+    """
+    追加增量的公共部分；子类提供 table_path、delta_path、_main_path（被重写时需重新读取的主索引文件）、
+    _state（首项为索引对应的基础表签名），并实现：
+    _load_file()：读取主索引文件（签名取自文件头），格式不符时返回False
+    _write_file()：把内存中的索引写出为主索引文件
+    _entry(record)：新行的索引值（字符串元组），不进索引的行返回None
+    _extend(entries, signature)：把 [(行号, 索引值元组)] 并入内存中的索引，签名更新为signature
+    _size()：索引条目数
+    """
+
+    def _reset_delta(self):
+        self._main_signature = None   # 已读取的主索引文件签名（重建或合并增量后变化）
+        self._delta_pos = 0           # 已重放的增量文件字节数
+        self._delta_count = 0         # 增量文件中已重放的条目数
+
+    def _saved(self):
+        """主索引文件写出后调用（持有增量文件排他锁）：删除已并入的增量文件，记下主索引文件签名"""
+        if os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
+        self._main_signature = _file_signature(self._main_path)
+        self._delta_pos = self._delta_count = 0
+
+    def _refresh(self):
+        """
+        从文件同步内存中的索引（调用方持有增量文件的锁）：主索引文件变化时重新读取，再重放增量文件的新增部分
+        返回同步后索引对应的基础表签名，文件不存在或格式不符时返回None
+        """
+        signature = _file_signature(self._main_path)
+        if signature is None:
+            return None
+        if signature != self._main_signature:
+            if not self._load_file():
+                return None
+            self._main_signature = signature
+            self._delta_pos = self._delta_count = 0
+        self._replay_delta()
+        return self._state[0]
+
+    def _replay_delta(self):
+        """重放增量文件中尚未应用的条目（只处理到最后一个完整的签名行，一次并入）"""
+        try:
+            with open(self.delta_path, 'rb') as f:
+                f.seek(self._delta_pos)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        entries, pending, signature, pos, consumed = [], [], None, 0, 0
+        for line in data.split(b'\n')[:-1]:
+            pos += len(line) + 1
+            fields = line.decode('utf-8').split(SIGNED_DELTA_SEP)
+            if fields[0] == '=':
+                entries += pending
+                pending, signature, consumed = [], (int(fields[1]), int(fields[2])), pos
+            else:
+                pending.append((int(fields[1]), tuple(fields[2:])))
+        if signature is not None:
+            self._extend(entries, signature)
+            self._delta_count += len(entries)
+            self._delta_pos += consumed
+
+    def load(self):
+        """确保索引与基础表一致：由主索引文件与增量恢复（未变化时不重复读取），仍不一致时整体重建；返回是否可用"""
+        signature = _base_signature(self.table_path)
+        if signature is None:
+            return False
+        if signature == self._state[0]:
+            return True
+        with _file_lock(self.delta_path).shared():
+            if self._refresh() == signature:
+                return True
+        return self.build()
+
+    def append(self, records, first_row, before, after):
+        """
+        追加写入后调用（调用方持有基础表排他锁）：索引与追加前的基础表一致时，把新行的条目记入增量并应用到内存，
+        增量足够多时合并重写主索引文件；否则不做处理，下次加载时整体重建
+        :param records: 追加的行（字典）
+        :param first_row: 第一条新行的行号
+        :param before: 追加前的基础表签名
+        :param after: 追加后的基础表签名
+        """
+        with _file_lock(self.delta_path).exclusive():
+            if self._state[0] != before and self._refresh() != before:
+                return False
+            entries = []
+            for i, record in enumerate(records):
+                fields = self._entry(record)
+                if fields is not None:
+                    entries.append((first_row + i, fields))
+            sep = SIGNED_DELTA_SEP
+            with open(self.delta_path, 'a', encoding='utf-8', newline='') as f:
+                f.writelines(sep.join(('+', str(row_num)) + fields) + '\n' for row_num, fields in entries)
+                f.write(f"={sep}{after[0]}{sep}{after[1]}\n")
+            self._extend(entries, after)
+            self._delta_pos = os.path.getsize(self.delta_path)
+            self._delta_count += len(entries)
+            if self._delta_count >= max(SIGNED_DELTA_MIN_ENTRIES, self._size() * SIGNED_DELTA_RATIO):
+                self._write_file()
+                self._saved()
+        return True
 
 
 # -------------------------- 有序索引（快递单号）--------------------------
+# 磁盘格式（按键的UTF-8字节升序；UTF-8字节序与字符序一致）：
+#   INDEX_DIR/<表名>_<列名>.keys：文件头 + 定长键（右补\0至键宽度，键中不含\0）
+#   INDEX_DIR/<表名>_<列名>.rows：文件头 + 与键一一对应的行号（uint32）
+# 两个文件通过mmap读取（加载为O(1)），等值、区间与前缀查询为在键数组上的二分查找，名次即数组下标；
+# 两个文件头中的签名、条目数须一致；与时间索引一样追加写入的新行记入增量，基础表被整表重写后自动重建
+class _FixedKeys:
+    """定长键文件的只读序列视图（供bisect按下标比较）"""
+
+    def __init__(self, mm, offset, width, count):
+        self._mm, self._offset, self._width, self._count = mm, offset, width, count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        start = self._offset + i * self._width
+        return self._mm[start:start + self._width]
+
+
+class OrderedIndex(_AppendDelta):
+    """
+    列上的持久化有序索引（定长键文件 + 行号文件），用于快递单号的等值、区间、前缀与名次查询
+    追加写入的新行记入增量（见 _AppendDelta），在内存中保存为按键有序的附加条目，查询时与键数组归并；
+    合并增量时重写两个文件
+    """
+    KEYS_MAGIC = b'TS2ORDK1'
+    ROWS_MAGIC = b'TS2ORDR1'
+    HEADER = struct.Struct('<8sQQQI')  # 魔数、基础表修改时间、基础表大小、条目数、键宽度
+    ROW = struct.Struct('<I')
+
+    def __init__(self, table_name, index_col):
+        self.table_name = table_name
+        self.index_col = index_col
+        self.table_path = f"{DATA_DIR}/{table_name}.csv"
+        self.keys_path = f"{INDEX_DIR}/{table_name}_{index_col}.keys"
+        self.rows_path = f"{INDEX_DIR}/{table_name}_{index_col}.rows"
+        self.delta_path = f"{INDEX_DIR}/{table_name}_{index_col}.delta"
+        self.legacy_path = f"{INDEX_DIR}/{table_name}_{index_col}.idx"  # 旧的文本格式（每行"单号,行号"）
+        self._main_path = self.keys_path  # 两个文件中后被替换的一个
+        # (基础表签名, 键mmap, 行号mmap, 键数组视图, 键宽度, 增量中的附加条目[(键字节, 行号)]（有序）)，
+        # 重新映射时整体替换；附加条目列表在追加时原地插入（不复制整个列表）
+        self._state = (None, None, None, _FixedKeys(b'', 0, 1, 0), 1, [])
+        self._reset_delta()
+
+    def _close(self):
+        """释放mmap（替换索引文件前先释放）"""
+        _, keys_mm, rows_mm, _, _, _ = self._state
+        self._state = (None, None, None, _FixedKeys(b'', 0, 1, 0), 1, [])
+        for mm in (keys_mm, rows_mm):
+            if mm is not None:
+                mm.close()
+
+    def _load_file(self):
+        """映射索引文件；文件不存在、格式不符或两个文件不匹配时返回False"""
+        self._close()
+        maps = []
+        try:
+            for path in (self.keys_path, self.rows_path):
+                with open(path, 'rb') as f:
+                    maps.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            keys_mm, rows_mm = maps
+            magic, mtime, size, count, width = self.HEADER.unpack_from(keys_mm)
+            header = self.HEADER.unpack_from(rows_mm)
+        except (OSError, ValueError, struct.error):
+            for mm in maps:
+                mm.close()
+            return False
+        if magic != self.KEYS_MAGIC or header != (self.ROWS_MAGIC, mtime, size, count, width) or \
+                len(keys_mm) < self.HEADER.size + count * width or len(rows_mm) < self.HEADER.size + count * 4:
+            keys_mm.close()
+            rows_mm.close()
+            return False
+        self._state = ((mtime, size), keys_mm, rows_mm, _FixedKeys(keys_mm, self.HEADER.size, width, count), width, [])
+        return True
+
+    def _entries(self):
+        """按序产出当前索引中的 (键字节, 行号)（键数组与附加条目归并）"""
+        _, _, rows_mm, keys, _, extra = self._state
+        base = ((keys[i].rstrip(b'\0'), self.ROW.unpack_from(rows_mm, self.HEADER.size + i * 4)[0])
+                for i in range(len(keys)))
+        return merge(base, extra)
+
+    def _write(self, signature, entries):
+        """把按键字节升序的 (键字节, 行号) 写入两个索引文件（先写临时文件再替换）并重新映射"""
+        width = max((len(key) for key, _ in entries), default=1) or 1
+        header = (signature[0], signature[1], len(entries), width)
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        with open(self.keys_path + '.tmp', 'wb') as f:
+            f.write(self.HEADER.pack(self.KEYS_MAGIC, *header))
+            f.write(b''.join(key.ljust(width, b'\0') for key, _ in entries))
+        with open(self.rows_path + '.tmp', 'wb') as f:
+            f.write(self.HEADER.pack(self.ROWS_MAGIC, *header))
+            array('I', (row for _, row in entries)).tofile(f)
+        self._close()
+        os.replace(self.rows_path + '.tmp', self.rows_path)
+        os.replace(self.keys_path + '.tmp', self.keys_path)
+        if os.path.exists(self.legacy_path):
+            os.remove(self.legacy_path)
+        self._load_file()
+        self._saved()
+
+    def build(self):
+        """扫描基础表构建索引并保存（行号从2开始，与fetch_rows一致）"""
+        with _file_lock(self.table_path).shared(), _file_lock(self.delta_path).exclusive():
+            signature = _base_signature(self.table_path)
+            if signature is None:
+                print(f"错误：文件{self.table_path}不存在")
+                return False
+            entries = [((record.get(self.index_col) or '').encode('utf-8'), row_num)
+                       for row_num, record in enumerate(_iter_base_records(self.table_path), start=2)]
+            entries.sort()
+            self._write(signature, entries)
+        print(f"✅ 有序索引构建完成：{self.table_name}_{self.index_col}（{len(entries)}条数据）")
+        return True
+
+    def _write_file(self):
+        """把附加条目并入键数组，重写两个索引文件"""
+        self._write(self._state[0], list(self._entries()))
+
+    def _entry(self, record):
+        return (record.get(self.index_col) or '',)
+
+    def _extend(self, entries, signature):
+        """并入新行的 (行号, (键,))：逐条insort到附加条目中，保持按 (键字节, 行号) 有序"""
+        extra = self._state[5]
+        for row_num, (key,) in entries:
+            insort(extra, (key.encode('utf-8'), row_num))
+        self._state = (signature,) + self._state[1:]
+
+    def _size(self):
+        return len(self._state[3]) + len(self._state[5])
+
+    def _bound(self, key, upper):
+        """
+        键在有序数组中的边界下标：upper为False时为第一个不小于key的位置，否则为第一个大于key的位置
+        key长于键宽度时，按其截断后的前缀比较（截断前缀之后的任何键都大于等于它）
+        """
+        keys, width = self._state[3], self._state[4]
+        if len(key) > width:
+            return bisect_right(keys, key[:width])
+        padded = key.ljust(width, b'\0')
+        return bisect_right(keys, padded) if upper else bisect_left(keys, padded)
+
+    def _extra_bound(self, key, upper):
+        """键在附加条目中的边界下标（含义同 _bound）"""
+        extra = self._state[5]
+        return bisect_left(extra, (key, 1 << 32)) if upper else bisect_left(extra, (key,))
+
+    def _slice(self, lo, hi, extra_lo, extra_hi, limit=None):
+        """键数组下标区间 [lo, hi) 与附加条目区间 [extra_lo, extra_hi) 归并后的 (键, 行号) 列表（至多limit条）"""
+        _, _, rows_mm, keys, _, extra = self._state
+        if limit is not None:
+            hi, extra_hi = min(hi, lo + limit), min(extra_hi, extra_lo + limit)
+        rows = array('I', rows_mm[self.HEADER.size + lo * 4:self.HEADER.size + hi * 4]) if hi > lo else []
+        base = [(keys[i].rstrip(b'\0'), row) for i, row in zip(range(lo, hi), rows)]
+        merged = list(merge(base, extra[extra_lo:extra_hi])) if extra_hi > extra_lo else base
+        return [(key.decode('utf-8'), row) for key, row in merged[:limit]]
+
+    def _scan(self, low, high, limit=None):
+        """键落在 [low, high) 内的 (键, 行号)（low/high为字节串，None表示不限）"""
+        lo = 0 if low is None else self._bound(low, False)
+        hi = len(self._state[3]) if high is None else self._bound(high, False)
+        extra_lo = 0 if low is None else self._extra_bound(low, False)
+        extra_hi = len(self._state[5]) if high is None else self._extra_bound(high, False)
+        return self._slice(lo, max(lo, hi), extra_lo, max(extra_lo, extra_hi), limit)
+
+    def search(self, key):
+        """等值查询，返回行号列表（升序）"""
+        if not self.load():
+            return []
+        key = key.encode('utf-8')
+        return [row for _, row in self._slice(self._bound(key, False), self._bound(key, True),
+                                              self._extra_bound(key, False), self._extra_bound(key, True))]
+
+    def range_scan(self, low=None, high=None, limit=None):
+        """区间查询：键落在 [low, high] 内的 (键, 行号) 列表（按键升序，None表示不限）"""
+        if not self.load():
+            return []
+        low = None if low is None else low.encode('utf-8')
+        if high is None:
+            return self._scan(low, None, limit)
+        high = high.encode('utf-8')
+        lo = 0 if low is None else self._bound(low, False)
+        extra_lo = 0 if low is None else self._extra_bound(low, False)
+        return self._slice(lo, max(lo, self._bound(high, True)),
+                           extra_lo, max(extra_lo, self._extra_bound(high, True)), limit)
+
+    def prefix_scan(self, prefix, limit=None):
+        """前缀查询：以prefix开头的 (键, 行号) 列表（按键升序）"""
+        if not self.load():
+            return []
+        prefix = prefix.encode('utf-8')
+        # UTF-8中不会出现0xFF字节：prefix + 0xFF 大于所有以prefix开头的键
+        return self._scan(prefix, prefix + b'\xff', limit)
+
+    def rank(self, key):
+        """键小于key的条目数"""
+        if not self.load():
+            return 0
+        key = key.encode('utf-8')
+        return self._bound(key, False) + self._extra_bound(key, False)
+
+    def select(self, k):
+        """按键升序的第k条（从0开始）(键, 行号)，越界返回None"""
+        if not self.load() or not 0 <= k < self._size():
+            return None
+        extra = self._state[5]
+        # 附加条目j在归并序列中的位置为 键数组中排在它之前的条目数 + j（行号相同的键，附加条目在后）
+        lo, hi = 0, len(extra)
+        while lo < hi:  # 第一个归并位置不小于k的附加条目
+            mid = (lo + hi) // 2
+            if self._bound(extra[mid][0], True) + mid < k:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(extra) and self._bound(extra[lo][0], True) + lo == k:
+            key, row = extra[lo]
+            return key.decode('utf-8'), row
+        i = k - lo  # 键数组中的下标
+        return self._slice(i, i + 1, 0, 0)[0]
+
+    def __len__(self):
+        return self._size() if self.load() else 0
+
+
+_ordered_indexes = {}
+
+
+def get_ordered_index(table_name="ExpressOrder", index_col="orderId"):
+    """获取（进程内共享的）有序索引实例"""
+    key = (table_name, index_col)
+    if key not in _ordered_indexes:
+        _ordered_indexes[key] = OrderedIndex(table_name, index_col)
+    return _ordered_indexes[key]
+
+
 def build_order_index():
-    """构建快递单号有序索引（基于B+树简化）"""
-    file_path = "database/data/ExpressOrder.csv"
-    index_path = "database/index/ExpressOrder_orderId.idx"
-    orders = read_csv(file_path)
-
-    # 生成索引：{快递单号: [行号1, 行号2,...]}（行号从2开始，首行为列名）
-    index_dict = {}
-    for row_num, order in enumerate(orders, start=2):
-        order_id = order['orderId']
-        if order_id not in index_dict:
-            index_dict[order_id] = []
-        index_dict[order_id].append(row_num)
-
-    # 保存索引到文件（文本格式，便于查看）
-    with open(index_path, 'w', encoding='utf-8') as f:
-        for order_id, row_nums in index_dict.items():
-            f.write(f"{order_id},{','.join(map(str, row_nums))}\n")
-    print("快递单号有序索引构建完成")
+    """构建快递单号有序索引"""
+    return get_ordered_index().build()
 
 
 def search_order_index(order_id):
-    """查询快递单号有序索引，返回匹配行号"""
-    index_path = "database/index/ExpressOrder_orderId.idx"
-    try:
-        with open(index_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                parts = line.strip().split(',')
-                if parts[0] == order_id:
-                    return list(map(int, parts[1:]))
-        return []
-    except FileNotFoundError:
-        print("索引文件不存在，请先构建索引")
-        build_order_index()
-        return search_order_index(order_id)
+    """查询快递单号有序索引，返回匹配行号（索引不存在或已过期时自动重建）"""
+    return get_ordered_index().search(order_id)
 
 
 # -------------------------- 散列索引（用户手机号）--------------------------
+# 磁盘格式（INDEX_DIR/<表名>_<列名>_hash.idx，通过mmap读取，加载为O(1)，无需在启动时重建）：
+#   文件头 | 槽数组（容量为2的幂，开放定址、线性探测）| 索引值字节区
+#   每个槽为 (64位哈希, 索引值偏移, 索引值长度, 行号)，行号为0表示空槽；同一索引值的多行各占一个槽
+# 哈希为blake2b取64位：与内置hash()不同，不随进程加盐，重启后槽位置不变
+# 容量按负载因子（不超过HASH_MAX_LOAD）确定，合并增量时随条目数翻倍扩容或缩小
+# 增量维护：写路径的插入/删除先追加到增量文件 INDEX_DIR/<表名>_<列名>_hash.delta（每行"操作,行号,索引值"），
+# 在内存中叠加到槽数组之上，单次写入的索引开销为O(1)；增量条目数达到索引条目数的一定比例时合并重写主索引文件（均摊O(1)）
+HASH_DELTA_MIN_ENTRIES = 1024   # 增量少于该条目数时不合并
+HASH_DELTA_RATIO = 0.2          # 增量条目数达到索引条目数的该比例时合并
+HASH_MAX_LOAD = 0.7             # 槽数组的最大负载因子
+HASH_MIN_CAPACITY = 8
+
+
+def _stable_hash(key):
+    """索引值（utf-8字节）的64位稳定哈希"""
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), 'little')
 
 
 class HashIndex:
-    def __init__(self, table_name, index_col, bucket_count=200):
+    MAGIC = b'TS2HASH1'
+    HEADER = struct.Struct('<8sQQ')   # 魔数、容量（槽数）、条目数
+    SLOT = struct.Struct('<QQII')     # 哈希、索引值偏移、索引值长度、行号（0为空槽）
+
+    def __init__(self, table_name, index_col):
         """
         初始化哈希索引
         :param table_name: 表名（如"User"、"ExpressOrder"）
         :param index_col: 索引字段（如"uphone"、"orderId"）
-        :param bucket_count: 哈希桶数量（默认200，可根据数据量调整）
         """
         self.table_name = table_name
         self.index_col = index_col
-        self.bucket_count = bucket_count
-        self.buckets = [[] for _ in range(bucket_count)]  # 链地址法存储 (索引值, 行号)
         self.loaded = False  # 标记索引是否已加载
+        self.table_path = f"{DATA_DIR}/{table_name}.csv"
+        self.index_path = f"{INDEX_DIR}/{table_name}_{index_col}_hash.idx"
+        self.delta_path = f"{INDEX_DIR}/{table_name}_{index_col}_hash.delta"
+        self.capacity = 0        # 槽数
+        self.size = 0            # 主索引文件中的条目数
+        self._mmap = None
+        self._overlay = {}       # 增量叠加层：{索引值: {行号: 是否存在}}
+        self._signature = None   # 已加载的主索引文件签名（重建或合并增量后变化）
+        self._delta_pos = 0      # 已重放的增量文件字节数
+        self._delta_count = 0    # 增量文件中的条目数
 
-    def build(self):
-        """从数据表构建索引（核心方法）"""
-        # 1. 读取数据表
-        table_path = f"{DATA_DIR}/{self.table_name}.csv"
-        data = read_csv(table_path)
-        if not data:
-            print(f"警告：{self.table_name}.csv 无数据，索引构建为空")
-            return False
+    # ---- 主索引文件 ----
+    def _close(self):
+        """释放mmap（替换索引文件前先释放）"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self.loaded = False
 
-        # 2. 校验索引字段是否存在
-        if self.index_col not in data[0]:
-            print(f"错误：表{self.table_name}中不存在字段{self.index_col}，索引构建失败")
+    def _open(self):
+        """映射主索引文件并校验文件头，格式不符时返回False"""
+        self._close()
+        try:
+            with open(self.index_path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
             return False
+        if len(mm) >= self.HEADER.size:
+            magic, capacity, size = self.HEADER.unpack_from(mm)
+            if magic == self.MAGIC and capacity and not capacity & (capacity - 1) and \
+                    len(mm) >= self.HEADER.size + capacity * self.SLOT.size:
+                self._mmap, self.capacity, self.size = mm, capacity, size
+                self.loaded = True
+                return True
+        mm.close()
+        return False
 
-        # 3. 构建哈希索引（链地址法处理冲突）
-        self.buckets = [[] for _ in range(self.bucket_count)]  # 重置桶
-        for row_num, record in enumerate(data, start=2):  # 行号从2开始（首行为列名）
-            index_val = record[self.index_col]
-            # 计算哈希值并取模（确保桶索引在有效范围）
-            bucket_idx = hash(index_val) % self.bucket_count
-            self.buckets[bucket_idx].append((index_val, row_num))
+    def _probe(self, key):
+        """在槽数组中查找索引值（utf-8字节）对应的全部行号"""
+        mm, mask = self._mmap, self.capacity - 1
+        h = _stable_hash(key)
+        i = h & mask
+        rows = []
+        while True:
+            slot_hash, offset, length, row_num = self.SLOT.unpack_from(mm, self.HEADER.size + i * self.SLOT.size)
+            if not row_num:
+                return rows
+            if slot_hash == h and mm[offset:offset + length] == key:
+                rows.append(row_num)
+            i = (i + 1) & mask
 
-        # 4. 保存索引到文件
-        self.save()
-        self.loaded = True  # 标记为已加载
+    def _iter_file(self):
+        """遍历主索引文件中的全部 (索引值, 行号)"""
+        mm = self._mmap
+        for i in range(self.capacity):
+            _, offset, length, row_num = self.SLOT.unpack_from(mm, self.HEADER.size + i * self.SLOT.size)
+            if row_num:
+                yield mm[offset:offset + length].decode('utf-8'), row_num
+
+    def _write_file(self, entries):
+        """
+        由条目 [(索引值, 行号)] 写出新的主索引文件（容量按负载因子取2的幂），并清空增量
+        调用方持有增量文件排他锁
+        """
+        capacity = HASH_MIN_CAPACITY
+        while len(entries) > capacity * HASH_MAX_LOAD:
+            capacity *= 2
+        mask = capacity - 1
+        slots = bytearray(capacity * self.SLOT.size)
+        used = bytearray(capacity)
+        heap = bytearray()
+        heap_start = self.HEADER.size + len(slots)
+        offsets = {}  # 同一索引值只在字节区存一份
+        for index_val, row_num in entries:
+            key = index_val.encode('utf-8')
+            offset = offsets.get(key)
+            if offset is None:
+                offset = offsets[key] = heap_start + len(heap)
+                heap += key
+            h = _stable_hash(key)
+            i = h & mask
+            while used[i]:
+                i = (i + 1) & mask
+            used[i] = 1
+            self.SLOT.pack_into(slots, i * self.SLOT.size, h, offset, len(key), row_num)
+
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, capacity, len(entries)))
+            f.write(slots)
+            f.write(heap)
+        self._close()
+        os.replace(tmp_path, self.index_path)
+        if os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
+        self._overlay = {}
+        self._delta_pos = self._delta_count = 0
+        self._open()
+        self._signature = _file_signature(self.index_path)
+
+    def build(self):
+        """从数据表构建索引（核心方法）"""
+        # 先锁数据表再锁增量文件（与写路径的加锁顺序一致）：构建期间写入的新行不会在保存时随增量一起丢失
+        with _file_lock(self.table_path).shared(), _file_lock(self.delta_path).exclusive():
+            # 1. 读取数据表
+            data = read_csv(self.table_path, apply_log=False)  # 行号对应基础表物理行，不合并变更日志
+
+            # 2. 校验索引字段是否存在（空表按列名校验，构建空索引：之后追加的行由写路径增量维护）
+            columns = list(data[0]) if data else _read_fieldnames(self.table_path)[0]
+            if columns is None:
+                print(f"错误：文件{self.table_path}不存在")
+                return False
+            if self.index_col not in columns:
+                print(f"错误：表{self.table_name}中不存在字段{self.index_col}，索引构建失败")
+                return False
+            if not data:
+                print(f"警告：{self.table_name}.csv 无数据，索引构建为空")
+
+            # 3. 构建并保存（行号从2开始，首行为列名）
+            self._write_file([(record[self.index_col] or '', row_num)
+                              for row_num, record in enumerate(data, start=2)])
         print(f"✅ 索引构建完成：{self.table_name}_{self.index_col}（{len(data)}条数据）")
         return True
 
     def save(self):
-        """将索引保存到文件（二进制格式，高效读写）"""
-        # 确保索引目录存在
-        os.makedirs(INDEX_DIR, exist_ok=True)
-        index_path = f"{INDEX_DIR}/{self.table_name}_{self.index_col}_hash.idx"
-
-        # 保存桶数量和桶数据（便于加载时恢复）
-        with open(index_path, 'wb') as f:
-            pickle.dump((self.bucket_count, self.buckets), f)
+        """把增量合并进主索引文件（按当前条目数重新确定容量），已并入的增量文件随之删除"""
+        with _file_lock(self.delta_path).exclusive():
+            if not self._refresh():
+                return False
+            overlay = self._overlay
+            entries = [(index_val, row_num) for index_val, row_num in self._iter_file()
+                       if overlay.get(index_val, {}).get(row_num, True)]
+            for index_val, rows in overlay.items():
+                existing = set(self._probe(index_val.encode('utf-8')))
+                entries.extend((index_val, row_num) for row_num, present in rows.items()
+                               if present and row_num not in existing)
+            self._write_file(entries)
+        return True
 
-    def load(self):
-        """加载已保存的索引文件（若不存在则自动构建）"""
-        if self.loaded:
-            return True  # 已加载，直接返回
+    # ---- 加载与增量 ----
+    def _refresh(self):
+        """
+        使内存中的索引与文件一致：主索引文件变化（被重建或合并）时重新映射，否则只重放增量文件的新增部分
+        文件不存在或格式不符时返回False（不自动构建）
+        """
+        with _file_lock(self.delta_path).shared():
+            signature = _file_signature(self.index_path)
+            if signature is None:
+                return False
+            if not self.loaded or signature != self._signature:
+                first_load = self._signature is None
+                if not self._open():
+                    print(f"❌ 索引加载失败：{self.index_path}格式不符")
+                    return False
+                self._overlay = {}
+                self._signature = signature
+                self._delta_pos = self._delta_count = 0
+                if first_load:
+                    print(f"✅ 索引加载成功：{self.table_name}_{self.index_col}")
+            self._replay_delta()
+        return True
 
-        index_path = f"{INDEX_DIR}/{self.table_name}_{self.index_col}_hash.idx"
+    def _replay_delta(self):
+        """重放增量文件中尚未应用的条目（只处理完整的行）"""
         try:
-            # 读取索引文件
-            with open(index_path, 'rb') as f:
-                self.bucket_count, self.buckets = pickle.load(f)
-            self.loaded = True
-            print(f"✅ 索引加载成功：{self.table_name}_{self.index_col}")
-            return True
+            with open(self.delta_path, 'rb') as f:
+                f.seek(self._delta_pos)
+                data = f.read()
         except FileNotFoundError:
+            return
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].decode('utf-8').splitlines():
+            op, row_num, index_val = line.split(',', 2)
+            self._apply(op, index_val, int(row_num))
+            self._delta_count += 1
+        self._delta_pos += end
+
+    def _apply(self, op, index_val, row_num):
+        """在叠加层中应用一条增量：'I'新增，'D'删除（后到的覆盖先到的，重放是幂等的）"""
+        self._overlay.setdefault(index_val, {})[row_num] = op == 'I'
+
+    def _append_delta(self, entries):
+        """
+        追加一批增量 [(操作, 索引值, 行号)] 并应用到内存，增量足够多时合并回主索引文件
+        索引文件不存在时不做任何事（表上未登记该索引）
+        """
+        if not entries:
+            return True
+        with _file_lock(self.delta_path).exclusive():
+            if not self._refresh():  # 先补齐其他进程追加的增量
+                return False
+            with open(self.delta_path, 'a', encoding='utf-8', newline='') as f:
+                f.writelines(f"{op},{row_num},{index_val}\n" for op, index_val, row_num in entries)
+            for op, index_val, row_num in entries:
+                self._apply(op, index_val, row_num)
+            self._delta_pos = os.path.getsize(self.delta_path)
+            self._delta_count += len(entries)
+            if self._delta_count >= max(HASH_DELTA_MIN_ENTRIES, self.size * HASH_DELTA_RATIO):
+                self.save()
+        return True
+
+    def load(self):
+        """映射已保存的索引文件并重放增量（不存在或格式不符时自动构建）"""
+        if self._refresh():
+            return True
+        if os.path.exists(self.index_path):
+            print("尝试重新构建...")
+        else:
             # 索引文件不存在，自动构建
             print(f"⚠️ 索引文件不存在，自动构建...")
-            return self.build()
-        except Exception as e:
-            print(f"❌ 索引加载失败：{e}，尝试重新构建...")
-            return self.build()
+        return self.build()
+
+    def lookup(self, index_val):
+        """返回索引值对应的行号列表（升序，不打印；查询规划使用）"""
+        if not self.load():
+            return []
+        rows = set(self._probe((index_val or '').encode('utf-8')))
+        for row_num, present in self._overlay.get(index_val, {}).items():
+            if present:
+                rows.add(row_num)
+            else:
+                rows.discard(row_num)
+        return sorted(rows)
+
+    def entry_count(self):
+        """索引条目数的估计（主索引文件中的条目数加增量条数；查询规划据此估计表行数）"""
+        return self.size + self._delta_count
 
     def search(self, index_val):
         """
@@ -125,43 +644,844 @@ class HashIndex:
         :param index_val: 要查询的索引值（如手机号"13800138000"）
         :return: 匹配的行号列表（行号对应数据表中的实际行）
         """
-        # 确保索引已加载
-        if not self.load():
-            return []
-
-        # 计算目标桶索引
-        bucket_idx = hash(index_val) % self.bucket_count
-        # 从桶中筛选匹配的行号
-        match_rows = [row_num for (val, row_num) in self.buckets[bucket_idx] if val == index_val]
+        match_rows = self.lookup(index_val)
         print(f"🔍 索引查询结果：{self.index_col}={index_val} 匹配{len(match_rows)}条记录")
         return match_rows
 
+    def insert(self, index_val, row_num):
+        """
+        新增一条索引项（基础表追加行后调用）
+        :param index_val: 新行的索引字段值
+        :param row_num: 新行的行号
+        """
+        return self._append_delta([('I', index_val, row_num)])
+
+    def insert_many(self, entries):
+        """批量新增索引项 [(索引值, 行号)]（一次追加写入）"""
+        return self._append_delta([('I', index_val, row_num) for index_val, row_num in entries])
+
+    def delete(self, index_val, row_num=None):
+        """
+        删除索引项
+        :param row_num: 只删除指向该行的项；None表示删除该索引值的全部项
+        """
+        rows = [row_num] if row_num is not None else self.lookup(index_val)
+        return self._append_delta([('D', index_val, row) for row in rows])
+
+    def update(self, old_val, new_val, row_num):
+        """行的索引字段值由old_val改为new_val（行号不变）"""
+        if old_val == new_val:
+            return True
+        return self._append_delta([('D', old_val, row_num), ('I', new_val, row_num)])
+
     def rebuild(self):
+        """从数据表全量重建索引（基础表被整表重写后调用；追加和按主键变更由写路径增量维护，无需重建）"""
+        return self.build()
+
+
+_hash_indexes = {}
+
+
+def get_hash_index(table_name, index_col):
+    """获取（进程内共享的）散列索引实例，其他进程的增量在下次访问时自动补齐"""
+    key = (table_name, index_col)
+    if key not in _hash_indexes:
+        _hash_indexes[key] = HashIndex(table_name, index_col)
+    return _hash_indexes[key]
+
+# -------------------------- 时间范围索引（sendTime / operateTime）--------------------------
+class TimeIndex(_AppendDelta):
+    """
+    时间列有序索引：按epoch秒排序的 (时间, 行号) 两个并列数组，区间查询为二分查找
+    数据中时间格式不统一（2024/12/10 8:30 与 2024-12-10 08:30:00 并存），
+    建索引时统一由 parse_time 解析，无法解析的空值不进索引
+    持久化为 INDEX_DIR/<表名>_<列名>_time.idx（文件头 + array('q') + array('I')），
+    追加写入的新行记入增量（见 _AppendDelta），在内存中保存为按 (时间, 行号) 有序的附加条目，查询时与两个数组归并；
+    合并增量时重写索引文件；基础表被整表重写（签名对不上）时自动重建
+    """
+    MAGIC = b'TS2TIME1'
+    HEADER = struct.Struct('<8sQQQ')  # 魔数、基础表修改时间、基础表大小、条目数
+
+    def __init__(self, table_name, index_col):
+        self.table_name = table_name
+        self.index_col = index_col
+        self.table_path = f"{DATA_DIR}/{table_name}.csv"
+        self.index_path = f"{INDEX_DIR}/{table_name}_{index_col}_time.idx"
+        self.delta_path = f"{INDEX_DIR}/{table_name}_{index_col}_time.delta"
+        self._main_path = self.index_path
+        # (基础表签名, 时间数组, 行号数组, 增量中的附加条目[(epoch秒, 行号)]（有序）)，
+        # 重新加载时整体替换；附加条目列表在追加时原地插入（不复制两个数组）
+        self._state = (None, array('q'), array('I'), [])
+        self._reset_delta()
+
+    def _load_file(self):
+        """从索引文件加载，格式不符时返回False"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                magic, mtime, size, count = self.HEADER.unpack(f.read(self.HEADER.size))
+                if magic != self.MAGIC:
+                    return False
+                times, rows = array('q'), array('I')
+                times.fromfile(f, count)
+                rows.fromfile(f, count)
+        except (OSError, EOFError, struct.error):
+            return False
+        self._state = ((mtime, size), times, rows, [])
+        return True
+
+    def build(self):
+        """扫描基础表构建索引并保存（行号从2开始，与fetch_rows一致）"""
+        with _file_lock(self.table_path).shared(), _file_lock(self.delta_path).exclusive():
+            signature = _base_signature(self.table_path)
+            if signature is None:
+                print(f"错误：文件{self.table_path}不存在")
+                return False
+            entries = []
+            for row_num, record in enumerate(_iter_base_records(self.table_path), start=2):
+                epoch = parse_time(record.get(self.index_col))
+                if epoch is not None:
+                    entries.append((epoch, row_num))
+            entries.sort()
+            self._state = (signature, array('q', (epoch for epoch, _ in entries)),
+                           array('I', (row_num for _, row_num in entries)), [])
+            self._write_file()
+            self._saved()
+        return True
+
+    def _write_file(self):
+        """把附加条目并入两个数组，写入索引文件（先写临时文件再替换）"""
+        signature, times, rows, extra = self._state
+        if extra:
+            merged = list(merge(zip(times, rows), extra))
+            times, rows = array('q', (epoch for epoch, _ in merged)), array('I', (row for _, row in merged))
+            self._state = (signature, times, rows, [])
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, signature[0], signature[1], len(times)))
+            times.tofile(f)
+            rows.tofile(f)
+        os.replace(tmp_path, self.index_path)
+
+    def _entry(self, record):
+        epoch = parse_time(record.get(self.index_col))
+        return None if epoch is None else (str(epoch),)
+
+    def _extend(self, entries, signature):
+        """并入新行的 (行号, (epoch秒,))：逐条insort到附加条目中（新行行号大于已有各行，归并时排在相同时间的条目之后）"""
+        extra = self._state[3]
+        for row_num, (epoch,) in entries:
+            insort(extra, (int(epoch), row_num))
+        self._state = (signature,) + self._state[1:]
+
+    def _size(self):
+        return len(self._state[1]) + len(self._state[3])
+
+    def search_range(self, start, end):
+        """
+        查询时间落在 [start, end) 内的行号（按时间升序）
+        :param start: 起始epoch秒（含），None表示不限
+        :param end: 结束epoch秒（不含），None表示不限
+        """
+        if not self.load():
+            return []
+        _, times, rows, extra = self._state
+        lo = 0 if start is None else bisect_left(times, start)
+        hi = len(times) if end is None else bisect_left(times, end)
+        extra_lo = 0 if start is None else bisect_left(extra, (start,))
+        extra_hi = len(extra) if end is None else bisect_left(extra, (end,))
+        if extra_hi <= extra_lo:
+            return rows[lo:hi].tolist()
+        return [row for _, row in merge(zip(times[lo:hi], rows[lo:hi]), extra[extra_lo:extra_hi])]
+
+
+_time_indexes = {}
+
+
+def get_time_index(table_name, index_col):
+    """获取（进程内共享的）时间索引实例"""
+    key = (table_name, index_col)
+    if key not in _time_indexes:
+        _time_indexes[key] = TimeIndex(table_name, index_col)
+    return _time_indexes[key]
+
+
+# -------------------------- 组合有序索引（等值前缀 + 时间区间）--------------------------
+class CompositeIndex(_AppendDelta):
+    """
+    组合有序索引：条目按 (前缀列..., 时间列) 排序，如快递单的 (targetBranchId, orderStatus, sendTime)
+    相同前缀值的条目组成连续的一组（组内按epoch秒升序），"网点B、状态S、某日D的快递单"
+    先按前缀定位到组，再在组内二分时间区间；只给出部分前缀（如只有网点）时覆盖所有以其开头的组
+    持久化为 INDEX_DIR/<表名>_<列1>_..._<时间列>_composite.idx（文件头 + 列名 + 组目录 + array('q') + array('I')），
+    列名登记在文件中（列名本身可含下划线，不从文件名拆分），
+    与时间索引一样追加写入的新行记入增量（内存中为有序的附加条目，查询时归并），基础表被整表重写后自动重建；
+    时间无法解析的行不进索引
+    """
+    MAGIC = b'TS2COMP2'
+    HEADER = struct.Struct('<8sQQQQI')  # 魔数、基础表修改时间、基础表大小、条目数、组目录字节数、列名字节数
+    SEP = '\x1f'  # 列名之间、组目录中前缀值之间的分隔符
+
+    def __init__(self, table_name, prefix_cols, time_col):
+        self.table_name = table_name
+        self.prefix_cols = tuple(prefix_cols)
+        self.time_col = time_col
+        self.table_path = f"{DATA_DIR}/{table_name}.csv"
+        name = f"{table_name}_{'_'.join(self.prefix_cols)}_{time_col}_composite"
+        self.index_path = f"{INDEX_DIR}/{name}.idx"
+        self.delta_path = f"{INDEX_DIR}/{name}.delta"
+        self._main_path = self.index_path
+        # (基础表签名, 有序的组前缀列表, 各组起始位置, 时间数组, 行号数组,
+        #  增量中的附加条目[(前缀值元组, epoch秒, 行号)]（有序）)，重新加载时整体替换；附加条目列表在追加时原地插入
+        self._state = (None, [], [], array('q'), array('I'), [])
+        self._reset_delta()
+
+    @classmethod
+    def read_columns(cls, index_path):
+        """读取索引文件中登记的 (前缀列元组, 时间列)，文件不存在或格式不符时返回None"""
+        try:
+            with open(index_path, 'rb') as f:
+                header = cls.HEADER.unpack(f.read(cls.HEADER.size))
+                names = f.read(header[5]).decode('utf-8')
+        except (OSError, ValueError, struct.error):
+            return None
+        cols = names.split(cls.SEP)
+        if header[0] != cls.MAGIC or len(cols) < 2:
+            return None
+        return tuple(cols[:-1]), cols[-1]
+
+    def _load_file(self):
+        """从索引文件加载，格式不符（或登记的列与本索引不一致）时返回False"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                magic, mtime, size, count, dir_size, names_size = self.HEADER.unpack(f.read(self.HEADER.size))
+                if magic != self.MAGIC or f.read(names_size).decode('utf-8') != self._names():
+                    return False
+                keys, starts = [], []
+                for line in f.read(dir_size).decode('utf-8').splitlines():
+                    *key, start = line.split(self.SEP)
+                    keys.append(tuple(key))
+                    starts.append(int(start))
+                times, rows = array('q'), array('I')
+                times.fromfile(f, count)
+                rows.fromfile(f, count)
+        except (OSError, EOFError, ValueError, struct.error):
+            return False
+        self._state = ((mtime, size), keys, starts, times, rows, [])
+        return True
+
+    def _names(self):
+        """文件中登记的列名（前缀列..., 时间列）"""
+        return self.SEP.join(self.prefix_cols + (self.time_col,))
+
+    def _set_entries(self, signature, entries):
+        """以有序的 (前缀值元组, epoch秒, 行号) 条目替换内存中的索引"""
+        keys, starts = [], []
+        for i, (key, _, _) in enumerate(entries):
+            if not keys or keys[-1] != key:
+                keys.append(key)
+                starts.append(i)
+        times = array('q', (epoch for _, epoch, _ in entries))
+        rows = array('I', (row_num for _, _, row_num in entries))
+        self._state = (signature, keys, starts, times, rows, [])
+
+    def _entries(self):
+        """按序产出组目录与两个数组中的 (前缀值元组, epoch秒, 行号)（不含附加条目）"""
+        _, keys, starts, times, rows, _ = self._state
+        for i, key in enumerate(keys):
+            hi = starts[i + 1] if i + 1 < len(starts) else len(times)
+            for j in range(starts[i], hi):
+                yield key, times[j], rows[j]
+
+    def build(self):
+        """扫描基础表构建索引并保存（行号从2开始，与fetch_rows一致）"""
+        with _file_lock(self.table_path).shared(), _file_lock(self.delta_path).exclusive():
+            signature = _base_signature(self.table_path)
+            if signature is None:
+                print(f"错误：文件{self.table_path}不存在")
+                return False
+            entries = []
+            for row_num, record in enumerate(_iter_base_records(self.table_path), start=2):
+                epoch = parse_time(record.get(self.time_col))
+                if epoch is not None:
+                    entries.append((tuple(record.get(col) or '' for col in self.prefix_cols), epoch, row_num))
+            entries.sort()
+            self._set_entries(signature, entries)
+            self._write_file()
+            self._saved()
+        return True
+
+    def _write_file(self):
+        """把附加条目并入组目录与两个数组，写入索引文件（先写临时文件再替换）"""
+        if self._state[5]:
+            self._set_entries(self._state[0], list(merge(self._entries(), self._state[5])))
+        signature, keys, starts, times, rows, _ = self._state
+        directory = ''.join(self.SEP.join(key + (str(start),)) + '\n'
+                            for key, start in zip(keys, starts)).encode('utf-8')
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        names = self._names().encode('utf-8')
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, signature[0], signature[1], len(times), len(directory), len(names)))
+            f.write(names)
+            f.write(directory)
+            times.tofile(f)
+            rows.tofile(f)
+        os.replace(tmp_path, self.index_path)
+
+    def _entry(self, record):
+        epoch = parse_time(record.get(self.time_col))
+        if epoch is None:
+            return None
+        return tuple(record.get(col) or '' for col in self.prefix_cols) + (str(epoch),)
+
+    def _extend(self, entries, signature):
+        """并入新行的 (行号, (前缀值..., epoch秒))：逐条insort到附加条目中（新行行号大于已有各行，归并时排在组内相同时间的条目之后）"""
+        extra = self._state[5]
+        for row_num, fields in entries:
+            insort(extra, (tuple(fields[:-1]), int(fields[-1]), row_num))
+        self._state = (signature,) + self._state[1:]
+
+    def _size(self):
+        return len(self._state[3]) + len(self._state[5])
+
+    def search(self, prefix, start=None, end=None):
+        """
+        查询前缀列等于prefix、时间落在 [start, end) 内的行号（同一组内按时间升序）
+        :param prefix: 前缀列的值元组（可只给前几列，如 ("B001",) 或 ("B001", "3")）
+        :param start: 起始epoch秒（含），None表示不限
+        :param end: 结束epoch秒（不含），None表示不限
+        """
+        if not self.load():
+            return []
+        _, keys, starts, times, rows, extra = self._state
+        prefix = tuple(prefix)
+        # 附加条目中以prefix开头的条目连续排列
+        added = []
+        j = bisect_left(extra, (prefix,))
+        while j < len(extra) and extra[j][0][:len(prefix)] == prefix:
+            _, epoch, _ = entry = extra[j]
+            if (start is None or epoch >= start) and (end is None or epoch < end):
+                added.append(entry)
+            j += 1
+        result = []
+        i = bisect_left(keys, prefix)
+        while i < len(keys) and keys[i][:len(prefix)] == prefix:
+            lo, hi = starts[i], starts[i + 1] if i + 1 < len(starts) else len(times)
+            if start is not None:
+                lo = bisect_left(times, start, lo, hi)
+            if end is not None:
+                hi = bisect_left(times, end, lo, hi)
+            if added:
+                result.extend((keys[i], times[k], rows[k]) for k in range(lo, hi))
+            else:
+                result.extend(rows[lo:hi])
+            i += 1
+        if added:
+            return [row_num for _, _, row_num in merge(result, added)]
+        return result
+
+
+_composite_indexes = {}
+
+
+def get_composite_index(table_name, prefix_cols, time_col):
+    """获取（进程内共享的）组合有序索引实例"""
+    key = (table_name, tuple(prefix_cols), time_col)
+    if key not in _composite_indexes:
+        _composite_indexes[key] = CompositeIndex(table_name, prefix_cols, time_col)
+    return _composite_indexes[key]
+
+
+# -------------------------- 位图索引（低基数列：orderStatus、网点ID、utype）--------------------------
+# 每个不同的值一张位图（Python int，第n位为1表示基础表第n行取该值，行号从2开始），
+# 多个条件的过滤为位图的与/或/非运算，按值计数为popcount（int.bit_count），无需读取数据行
+# 持久化为 INDEX_DIR/<表名>_<列名>_bitmap.idx：文件头 + 每个值的 (值长度, 压缩位图长度, 值, zlib压缩的位图字节)，
+# 稀疏或成段的位图压缩后很小；与时间索引一样追加写入的新行记入增量，基础表被整表重写后自动重建
+# 压缩方式：没有采用游程/Roaring式的分块容器，而是以zlib压缩磁盘上的位图字节（其中的游程编码覆盖了成段与稀疏的情形），
+# 内存中为未压缩的Python int——与/或/非与popcount由int在C层整字运算完成，比纯Python实现的容器运算快；
+# 加载时各值的位图保持压缩字节，首次用到时才解压（只按一两个值过滤时不解压其余值），未用到的值合并时原样写回
+def rows_to_bitmap(row_numbers):
+    """行号集合转为位图"""
+    row_numbers = list(row_numbers)
+    if not row_numbers:
+        return 0
+    bits = bytearray(max(row_numbers) // 8 + 1)
+    for row_num in row_numbers:
+        bits[row_num >> 3] |= 1 << (row_num & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def bitmap_rows(bitmap):
+    """按升序产出位图中为1的行号（逐字节跳过全0的部分）"""
+    for i, byte in enumerate(bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')):
+        while byte:
+            low = byte & -byte
+            yield i * 8 + low.bit_length() - 1
+            byte ^= low
+
+
+class BitmapIndex(_AppendDelta):
+    """低基数列上的位图索引"""
+    MAGIC = b'TS2BMAP1'
+    HEADER = struct.Struct('<8sQQQI')  # 魔数、基础表修改时间、基础表大小、行号上界、不同值个数
+    ENTRY = struct.Struct('<II')       # 值的字节长度、压缩位图的字节长度
+
+    def __init__(self, table_name, index_col):
+        self.table_name = table_name
+        self.index_col = index_col
+        self.table_path = f"{DATA_DIR}/{table_name}.csv"
+        self.index_path = f"{INDEX_DIR}/{table_name}_{index_col}_bitmap.idx"
+        self.delta_path = f"{INDEX_DIR}/{table_name}_{index_col}_bitmap.delta"
+        self._main_path = self.index_path
+        # (基础表签名, 行号上界（不含）, {值: 位图（int），尚未用到的为zlib压缩字节}），整体替换保证线程安全
+        self._state = (None, 2, {})
+        self._reset_delta()
+
+    def _load_file(self):
+        """从索引文件加载，格式不符时返回False"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+            magic, mtime, size, row_limit, count = self.HEADER.unpack_from(data)
+            if magic != self.MAGIC:
+                return False
+            bitmaps, pos = {}, self.HEADER.size
+            for _ in range(count):
+                key_len, blob_len = self.ENTRY.unpack_from(data, pos)
+                pos += self.ENTRY.size
+                value = data[pos:pos + key_len].decode('utf-8')
+                bitmaps[value] = data[pos + key_len:pos + key_len + blob_len]  # 首次用到时解压（见 _bitmap）
+                pos += key_len + blob_len
+        except (OSError, ValueError, struct.error, zlib.error):
+            return False
+        self._state = ((mtime, size), row_limit, bitmaps)
+        return True
+
+    def build(self):
+        """扫描基础表构建索引并保存（行号从2开始，与fetch_rows一致）"""
+        with _file_lock(self.table_path).shared(), _file_lock(self.delta_path).exclusive():
+            signature = _base_signature(self.table_path)
+            if signature is None:
+                print(f"错误：文件{self.table_path}不存在")
+                return False
+            value_rows = {}
+            row_limit = 2  # 行号上界（不含）
+            for row_num, record in enumerate(_iter_base_records(self.table_path), start=2):
+                value_rows.setdefault(record.get(self.index_col) or '', []).append(row_num)
+                row_limit = row_num + 1
+            bitmaps = {value: rows_to_bitmap(rows) for value, rows in value_rows.items()}
+            self._state = (signature, row_limit, bitmaps)
+            self._write_file()
+            self._saved()
+        print(f"✅ 位图索引构建完成：{self.table_name}_{self.index_col}（{len(bitmaps)}个不同值）")
+        return True
+
+    def _write_file(self):
+        """把内存中的索引写入索引文件（先写临时文件再替换）"""
+        signature, row_limit, bitmaps = self._state
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        n_bytes = (row_limit + 7) // 8
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, signature[0], signature[1], row_limit, len(bitmaps)))
+            for value, bitmap in bitmaps.items():
+                key = value.encode('utf-8')
+                blob = bitmap if isinstance(bitmap, bytes) else zlib.compress(bitmap.to_bytes(n_bytes, 'little'))
+                f.write(self.ENTRY.pack(len(key), len(blob)))
+                f.write(key)
+                f.write(blob)
+        os.replace(tmp_path, self.index_path)
+
+    def _entry(self, record):
+        return (record.get(self.index_col) or '',)
+
+    def _extend(self, entries, signature):
+        """并入新行的 (行号, (值,))：置位该值位图中的新行，行号上界随之扩大"""
+        _, row_limit, bitmaps = self._state
+        value_rows = {}
+        for row_num, (value,) in entries:
+            value_rows.setdefault(value, []).append(row_num)
+            row_limit = max(row_limit, row_num + 1)
+        bitmaps = dict(bitmaps)
+        for value, rows in value_rows.items():
+            bitmaps[value] = self._bitmap(value) | rows_to_bitmap(rows)
+        self._state = (signature, row_limit, bitmaps)
+
+    def _bitmap(self, value):
+        """该值的位图（不存在的值为空位图）；仍为压缩字节时解压并留在内存中"""
+        bitmap = self._state[2].get(value, 0)
+        if isinstance(bitmap, bytes):
+            bitmap = self._state[2][value] = int.from_bytes(zlib.decompress(bitmap), 'little')
+        return bitmap
+
+    def _size(self):
+        return self._state[1] - 2
+
+    @property
+    def universe(self):
+        """全部数据行的位图（取反运算的全集）"""
+        return ((1 << self._state[1]) - 1) & ~3
+
+    def row_count(self):
+        """基础表行数"""
+        return self._state[1] - 2 if self.load() else 0
+
+    def bitmap(self, value):
+        """取该值的行的位图（不存在的值为空位图）"""
+        return self._bitmap(value) if self.load() else 0
+
+    def any_of(self, values):
+        """取值属于values的行的位图（各值位图的或）"""
+        result = 0
+        for value in values:
+            result |= self.bitmap(value)
+        return result
+
+    def negate(self, bitmap):
+        """位图取反（限于全部数据行）"""
+        return self.universe & ~bitmap if self.load() else 0
+
+    def counts(self, mask=None):
+        """按值计数 {值: 行数}；mask为其他条件的位图时只统计其中的行"""
+        if not self.load():
+            return {}
+        bitmaps = {value: self._bitmap(value) for value in list(self._state[2])}
+        if mask is None:
+            return {value: bitmap.bit_count() for value, bitmap in bitmaps.items()}
+        return {value: (bitmap & mask).bit_count() for value, bitmap in bitmaps.items()}
+
+
+_bitmap_indexes = {}
+
+
+def get_bitmap_index(table_name, index_col):
+    """获取（进程内共享的）位图索引实例"""
+    key = (table_name, index_col)
+    if key not in _bitmap_indexes:
+        _bitmap_indexes[key] = BitmapIndex(table_name, index_col)
+    return _bitmap_indexes[key]
+
+
+
+# -------------------------- 文本索引（uname、uaddress、goodsName 子串查询）--------------------------
+# 字符n-gram倒排：每行文本的全部单字与相邻二字（如"朝阳区" -> 朝、阳、区、朝阳、阳区）各有一个倒排列表，
+# 子串查询取查询串各二字倒排的交集（单字查询取单字倒排）得到候选，再用索引中存放的原文核对子串、按相关度排序，
+# 不读取数据表；只有最终返回的行按行号从基础表读取
+# 磁盘格式（INDEX_DIR/<表名>_<列名>_text.idx）：文件头 + 文档行号数组 + 文档偏移数组 + 词项偏移数组 + 倒排偏移数组
+#   + 文档字节区（每个文档为"主键\0原文"）+ 词项字节区（按UTF-8字节升序，二分查找）+ 倒排字节区
+#   倒排为升序文档号的差值变长编码（每字节7位），常见词项的长倒排压缩为约每项1字节
+# 增量维护：与散列索引相同，写路径的插入/更新/删除追加到 <表名>_<列名>_text.delta（每行"操作,行号,主键,原文"），
+# 在内存中按主键叠加到主索引之上；增量条目数达到文档数的一定比例时合并重写主索引文件
+TEXT_DELTA_MIN_ENTRIES = 1024   # 增量少于该条目数时不合并
+TEXT_DELTA_RATIO = 0.2          # 增量条目数达到文档数的该比例时合并
+
+
+def _text_grams(text):
+    """文本的全部单字与相邻二字（去重）"""
+    return set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _query_grams(query):
+    """查询串用于求交的词项：单字查询为该字，否则为全部相邻二字"""
+    return {query} if len(query) == 1 else {query[i:i + 2] for i in range(len(query) - 1)}
+
+
+def _encode_gaps(doc_ids):
+    """升序文档号 -> 差值变长编码"""
+    out, prev = bytearray(), -1
+    for doc_id in doc_ids:
+        gap, prev = doc_id - prev, doc_id
+        while gap >= 0x80:
+            out.append(gap & 0x7F | 0x80)
+            gap >>= 7
+        out.append(gap)
+    return out
+
+
+def _decode_gaps(data):
+    """差值变长编码 -> 升序文档号列表"""
+    doc_ids, current, value, shift = [], -1, 0, 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            current += value
+            doc_ids.append(current)
+            value = shift = 0
+    return doc_ids
+
+
+class _BlobList:
+    """偏移数组 + 字节区的只读序列视图（供bisect二分查找词项）"""
+
+    def __init__(self, offsets, blob):
+        self.offsets, self.blob = offsets, blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+
+class TextIndex:
+    """文本列上的字符n-gram倒排索引（按主键叠加增量，支持子串查询与排序）"""
+    MAGIC = b'TS2TEXT1'
+    HEADER = struct.Struct('<8sIIIII')  # 魔数、文档数、词项数、文档字节数、词项字节数、倒排字节数
+
+    def __init__(self, table_name, index_col):
+        self.table_name = table_name
+        self.index_col = index_col
+        self.table_path = f"{DATA_DIR}/{table_name}.csv"
+        self.index_path = f"{INDEX_DIR}/{table_name}_{index_col}_text.idx"
+        self.delta_path = f"{INDEX_DIR}/{table_name}_{index_col}_text.delta"
+        self._set_docs([])
+        self._overlay = {}       # 增量叠加层：{主键: (行号, 原文)}，原文为None表示已删除；行号0表示未知
+        self._signature = None   # 已加载的主索引文件签名
+        self._delta_pos = 0      # 已重放的增量文件字节数
+        self._delta_count = 0    # 增量文件中的条目数
+
+    # ---- 主索引 ----
+    def _set_docs(self, docs):
+        """由文档列表 [(行号, 主键, 原文)] 构建倒排（文档号即列表下标）"""
+        postings = {}
+        for doc_id, (_, _, text) in enumerate(docs):
+            for gram in _text_grams(text):
+                postings.setdefault(gram, []).append(doc_id)
+        self.doc_rows = array('I', (row_num for row_num, _, _ in docs))
+        self.doc_offsets, self.doc_blob = array('I', [0]), bytearray()
+        for _, key, text in docs:
+            self.doc_blob += f"{key}\0{text}".encode('utf-8')
+            self.doc_offsets.append(len(self.doc_blob))
+        self.gram_offsets, self.gram_blob = array('I', [0]), bytearray()
+        self.post_offsets, self.post_blob = array('I', [0]), bytearray()
+        for gram in sorted(postings, key=lambda g: g.encode('utf-8')):
+            self.gram_blob += gram.encode('utf-8')
+            self.gram_offsets.append(len(self.gram_blob))
+            self.post_blob += _encode_gaps(postings[gram])
+            self.post_offsets.append(len(self.post_blob))
+
+    def _doc(self, doc_id):
+        """文档号 -> (行号, 主键, 原文)"""
+        key, _, text = bytes(self.doc_blob[self.doc_offsets[doc_id]:self.doc_offsets[doc_id + 1]]) \
+            .decode('utf-8').partition('\0')
+        return self.doc_rows[doc_id], key, text
+
+    def _docs(self):
+        return [self._doc(doc_id) for doc_id in range(len(self.doc_rows))]
+
+    def _postings(self, gram):
+        """词项的倒排（升序文档号），不存在时为空"""
+        grams = _BlobList(self.gram_offsets, self.gram_blob)
+        key = gram.encode('utf-8')
+        i = bisect_left(grams, key)
+        if i == len(grams) or grams[i] != key:
+            return []
+        return _decode_gaps(self.post_blob[self.post_offsets[i]:self.post_offsets[i + 1]])
+
+    def build(self):
+        """扫描基础表构建索引（行号从2开始，与fetch_rows一致），并清空增量"""
+        key_col = PRIMARY_KEYS.get(self.table_name)
+        if key_col is None:
+            print(f"错误：表{self.table_name}未定义主键，不支持文本索引")
+            return False
+        # 先锁数据表再锁增量文件（与写路径的加锁顺序一致）
+        with _file_lock(self.table_path).shared(), _file_lock(self.delta_path).exclusive():
+            columns = _read_fieldnames(self.table_path)[0]
+            if columns is None:
+                print(f"错误：文件{self.table_path}不存在")
+                return False
+            if self.index_col not in columns:
+                print(f"错误：表{self.table_name}中不存在字段{self.index_col}，索引构建失败")
+                return False
+            self._set_docs([(row_num, record.get(key_col) or '', record.get(self.index_col) or '')
+                            for row_num, record in enumerate(_iter_base_records(self.table_path), start=2)])
+            self.save()
+        print(f"✅ 文本索引构建完成：{self.table_name}_{self.index_col}（{len(self.doc_rows)}条数据）")
+        return True
+
+    def save(self):
+        """写出主索引文件（先写临时文件再替换），已并入的增量文件随之删除；调用方需持有增量文件的排他锁"""
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, len(self.doc_rows), len(self.gram_offsets) - 1,
+                                     len(self.doc_blob), len(self.gram_blob), len(self.post_blob)))
+            for values in (self.doc_rows, self.doc_offsets, self.gram_offsets, self.post_offsets):
+                values.tofile(f)
+            for blob in (self.doc_blob, self.gram_blob, self.post_blob):
+                f.write(blob)
+        os.replace(tmp_path, self.index_path)
+        if os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
+        self._overlay = {}
+        self._signature = _file_signature(self.index_path)
+        self._delta_pos = self._delta_count = 0
+
+    def _load_file(self):
+        """读取主索引文件（数组为文件内容上的只读视图），格式不符时返回False"""
         try:
-            # 使用全局配置的绝对路径
-            file_path = os.path.join(DATA_DIR, f"{self.table_name}.csv")
-            # 统一编码为gbk，添加newline=''
-            with open(file_path, 'r', encoding='gbk', errors='ignore', newline='') as f:
-                reader = csv.DictReader(f)
-                self.index.clear()
-                # 记录行号（注意：csv.DictReader 自动跳过表头，行号从2开始（表头=1））
-                line_num = 2  # 表头是第1行，第一条数据是第2行
-                for row in reader:
-                    # 统一数据处理：去空格、转字符串
-                    field_value = str(row.get(self.field_name, "")).strip()
-                    if field_value:
-                        if field_value not in self.index:
-                            self.index[field_value] = []
-                        # 存储「行号」（用于后续定位），同时保存原始数据校验
-                        self.index[field_value].append({
-                            "line_num": line_num,
-                            "raw_data": row
-                        })
-                    line_num += 1
-            print(f"✅ 索引构建完成：{self.table_name}_{self.field_name}（{len(self.index)}条数据）")
-        except Exception as e:
-            print(f"❌ 索引构建失败：{e}")
-            self.index = {}
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+            magic, docs, grams, doc_bytes, gram_bytes, post_bytes = self.HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return False
+        item = array('I').itemsize
+        sizes = (docs, docs + 1, grams + 1, grams + 1)
+        if magic != self.MAGIC or \
+                len(data) != self.HEADER.size + sum(sizes) * item + doc_bytes + gram_bytes + post_bytes:
+            return False
+        view, pos = memoryview(data), self.HEADER.size
+        arrays = []
+        for count in sizes:
+            arrays.append(view[pos:pos + count * item].cast('I'))
+            pos += count * item
+        self.doc_rows, self.doc_offsets, self.gram_offsets, self.post_offsets = arrays
+        blobs = []
+        for size in (doc_bytes, gram_bytes, post_bytes):
+            blobs.append(view[pos:pos + size])
+            pos += size
+        self.doc_blob, self.gram_blob, self.post_blob = blobs
+        return True
+
+    # ---- 加载与增量 ----
+    def _refresh(self):
+        """
+        使内存中的索引与文件一致：主索引文件变化时重新读取，否则只重放增量文件的新增部分
+        文件不存在或格式不符时返回False（不自动构建）
+        """
+        with _file_lock(self.delta_path).shared():
+            signature = _file_signature(self.index_path)
+            if signature is None:
+                return False
+            if signature != self._signature:
+                if not self._load_file():
+                    print(f"❌ 索引加载失败：{self.index_path}格式不符")
+                    return False
+                self._overlay = {}
+                self._signature = signature
+                self._delta_pos = self._delta_count = 0
+            self._replay_delta()
+        return True
+
+    def _replay_delta(self):
+        """重放增量文件中尚未应用的条目（只处理完整的行）"""
+        try:
+            with open(self.delta_path, 'rb') as f:
+                f.seek(self._delta_pos)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].decode('utf-8').splitlines():
+            op, row_num, key, text = line.split(',', 3)
+            self._apply(op, int(row_num), key, text)
+            self._delta_count += 1
+        self._delta_pos += end
+
+    def _apply(self, op, row_num, key, text):
+        """在叠加层中应用一条增量：'I'新增/更新（行号0表示沿用已知行号），'D'删除"""
+        if op == 'D':
+            self._overlay[key] = (0, None)
+        else:
+            self._overlay[key] = (row_num or self._overlay.get(key, (0, None))[0], text)
+
+    def _append_delta(self, entries):
+        """
+        追加一批增量 [(操作, 行号, 主键, 原文)] 并应用到内存，增量足够多时合并回主索引文件
+        索引文件不存在时不做任何事（表上未登记该索引）
+        """
+        if not entries:
+            return True
+        with _file_lock(self.delta_path).exclusive():
+            if not self._refresh():  # 先补齐其他进程追加的增量
+                return False
+            with open(self.delta_path, 'a', encoding='utf-8', newline='') as f:
+                f.writelines(f"{op},{row_num},{key},{' '.join((text or '').splitlines())}\n"
+                             for op, row_num, key, text in entries)
+            for op, row_num, key, text in entries:
+                self._apply(op, row_num, key, ' '.join((text or '').splitlines()))
+            self._delta_pos = os.path.getsize(self.delta_path)
+            self._delta_count += len(entries)
+            if self._delta_count >= max(TEXT_DELTA_MIN_ENTRIES, len(self.doc_rows) * TEXT_DELTA_RATIO):
+                self._merge()
+        return True
+
+    def _merge(self):
+        """把叠加层并入主索引：更新过的文档沿用其基础表行号，按行号重排后重写（调用方持有增量文件排他锁）"""
+        overlay = self._overlay
+        docs = self._docs()
+        base_rows = {key: row_num for row_num, key, _ in docs if key in overlay}
+        docs = [doc for doc in docs if doc[1] not in overlay]
+        docs += [(row_num or base_rows.get(key, 0), key, text)
+                 for key, (row_num, text) in overlay.items() if text is not None]
+        docs.sort(key=lambda doc: doc[0])
+        self._set_docs(docs)
+        self.save()
+
+    def load(self):
+        """读取已保存的索引文件并重放增量（不存在或格式不符时自动构建）"""
+        if self._refresh():
+            return True
+        return self.build()
+
+    def insert_many(self, entries):
+        """基础表追加行后调用：entries 为 [(行号, 主键, 原文)]"""
+        return self._append_delta([('I', row_num, key, text) for row_num, key, text in entries])
+
+    def update(self, key, text):
+        """按主键更新后调用（行号不变）"""
+        return self._append_delta([('I', 0, key, text)])
+
+    def delete(self, key):
+        """按主键删除后调用"""
+        return self._append_delta([('D', 0, key, None)])
+
+    def rebuild(self):
+        """从数据表全量重建索引（基础表被整表重写后调用）"""
+        return self.build()
+
+    # ---- 查询 ----
+    def search(self, query, limit=None):
+        """
+        子串查询，按相关度返回 [(主键, 行号)]（行号0表示未知，需按主键读取）
+        相关度为查询串在原文中的出现次数 × 查询串长度 / 原文长度（原文与查询串相同时最高），相同时按行号
+        :param limit: 最多返回的条数，None表示不限
+        """
+        query = (query or '').strip()
+        if not query or not self.load():
+            return []
+        # 各词项倒排按长度从短到长求交，交集为空时提前结束
+        candidates = None
+        for postings in sorted((self._postings(gram) for gram in _query_grams(query)), key=len):
+            candidates = set(postings) if candidates is None else candidates.intersection(postings)
+            if not candidates:
+                break
+        overlay = self._overlay
+        docs = [self._doc(doc_id) for doc_id in sorted(candidates or ())]
+        docs = [doc for doc in docs if doc[1] not in overlay]
+        docs += [(row_num, key, text) for key, (row_num, text) in overlay.items() if text is not None]
+
+        scored = []
+        for row_num, key, text in docs:
+            hits = text.count(query)
+            if hits:
+                scored.append((-hits * len(query) / len(text), row_num, key))
+        scored.sort()
+        return [(key, row_num) for _, row_num, key in scored[:limit]]
+
+
+_text_indexes = {}
+
+
+def get_text_index(table_name, index_col):
+    """获取（进程内共享的）文本索引实例，其他进程的增量在下次访问时自动补齐"""
+    key = (table_name, index_col)
+    if key not in _text_indexes:
+        _text_indexes[key] = TextIndex(table_name, index_col)
+    return _text_indexes[key]
+
 # 使用示例（后续在main.py或GUI中调用）
 if __name__ == "__main__":
     # 构建快递单号有序索引
@@ -3,8 +3,8 @@ from tkinter import messagebox
 import os
 import sys
 from GUI import ExpressGUI
-from index_core import HashIndex  # 导入索引类
-from db_core import DATA_DIR, INDEX_DIR, VIEWS_META_PATH  # 导入路径常量
+from index_core import get_hash_index, get_bitmap_index, get_text_index  # 导入索引
+from db_core import DATA_DIR, INDEX_DIR, VIEWS_META_PATH, is_partitioned  # 导入路径常量
 
 
 def init_directories():
@@ -73,21 +73,30 @@ def init_views_meta():
 
 
 def init_indexes():
-    """初始化索引：为已有数据的表自动构建索引"""
+    """初始化索引：映射已有的索引文件（O(1)，不在启动时重建），索引文件不存在时才基于已有数据构建"""
     try:
         # 需要初始化索引的表和字段（可根据实际需求扩展）
         tables = [
-            ("User", "uphone"),  # 用户表-手机号索引
-            ("ExpressOrder", "orderId")  # 快递单表-单号索引
+            ("User", "uphone", get_hash_index),  # 用户表-手机号索引
+            ("User", "uid", get_hash_index),  # 用户表-主键索引（按主键变更时定位行以维护手机号索引）
+            ("ExpressOrder", "orderId", get_hash_index),  # 快递单表-单号索引
+            # 低基数列的位图索引（状态统计、按状态/网点过滤）
+            ("ExpressOrder", "orderStatus", get_bitmap_index),
+            ("ExpressOrder", "sendBranchId", get_bitmap_index),
+            ("ExpressOrder", "targetBranchId", get_bitmap_index),
+            ("User", "utype", get_bitmap_index),
+            # 文本列的n-gram倒排索引（text_search子串查询）
+            ("User", "uname", get_text_index),
+            ("User", "uaddress", get_text_index),
+            ("ExpressOrder", "goodsName", get_text_index)
         ]
 
-        for table_name, index_col in tables:
+        for table_name, index_col, get_index in tables:
             csv_path = os.path.join(DATA_DIR, f"{table_name}.csv")
             # 检查CSV文件是否存在且非空
-            if os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
-                print(f"ℹ️ 检测到{table_name}.csv，开始构建{index_col}索引...")
-                index = HashIndex(table_name, index_col)
-                index.build()  # 基于已有数据构建索引
+            if is_partitioned(table_name) or (os.path.exists(csv_path) and os.path.getsize(csv_path) > 0):
+                print(f"ℹ️ 检测到{table_name}.csv，加载{index_col}索引...")
+                get_index(table_name, index_col).load()  # 索引文件不存在或格式不符时自动构建
             else:
                 print(f"ℹ️ {table_name}.csv为空或不存在，暂不构建索引")
         return True
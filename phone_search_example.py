@@ -1,57 +1,68 @@
 # phone_search_example.py
-# 手机号前缀查询功能示例
+# 手机号前缀/尾号查询功能示例
 
-from trie_index import PhoneTrieIndex
-from db_core import read_csv, DATA_DIR
+from trie_index import get_phone_trie, get_phone_suffix_index
+from db_core import _get_by_key, DATA_DIR
+from archive_core import get_archived_order
 
-def search_orders_by_phone_prefix(phone_prefix):
+def search_orders_by_phone_prefix(phone_prefix, limit=None, suffix=False):
     """
-    根据手机号前缀查询相关快递单
+    根据手机号前缀（或尾号）查询相关快递单
     
     参数:
-        phone_prefix: 手机号前缀（如 "138", "13800138001"）
+        phone_prefix: 手机号前缀（如 "138", "13800138001"）；suffix=True 时为尾号（如后4位 "8001"）
+        limit: 最多返回的快递单数（短前缀匹配的快递单很多时建议设置），None表示不限
+        suffix: 是否按尾号查询
     
     返回:
         匹配的快递单详情列表
     """
-    # 1. 加载或构建Trie索引
-    trie_index = PhoneTrieIndex()
-    if not trie_index.load():
-        print("索引不存在，正在构建...")
-        trie_index.build()
+    # 1. 选择Trie索引（查询时按需加载，索引不存在时自动构建）
+    trie_index = get_phone_suffix_index() if suffix else get_phone_trie()
     
-    # 2. 查询前缀对应的快递单ID
-    order_ids = trie_index.search_prefix(phone_prefix)
+    # 2. 查询前缀/尾号对应的快递单ID
+    if suffix:
+        order_ids = trie_index.search_suffix(phone_prefix, limit=limit)
+    else:
+        order_ids = trie_index.search_prefix(phone_prefix, limit=limit)
     
     if not order_ids:
-        print(f"未找到手机号前缀为 '{phone_prefix}' 的快递单")
+        print(f"未找到手机号{'尾号' if suffix else '前缀'}为 '{phone_prefix}' 的快递单")
         return []
     
     print(f"找到 {len(order_ids)} 个相关快递单: {', '.join(order_ids)}")
     
-    # 3. 读取快递单详情
-    orders = read_csv(f"{DATA_DIR}/ExpressOrder.csv")
-    users = read_csv(f"{DATA_DIR}/User.csv")
-    
-    # 4. 构建结果集（包含寄件人和收件人信息）
+    # 3. 按单号读取快递单详情（走单号索引，热表未命中时读取归档），寄件人和收件人按uid读取，不读取整表
+    order_path = f"{DATA_DIR}/ExpressOrder.csv"
+    user_path = f"{DATA_DIR}/User.csv"
+    users = {}
+
+    def get_user(uid):
+        if uid not in users:
+            users[uid] = _get_by_key(user_path, uid)
+        return users[uid]
+
+    # 4. 构建结果集（包含寄件人和收件人信息，按索引返回的顺序）
     results = []
-    for order in orders:
-        if order['orderId'] in order_ids:
-            # 查找寄件人和收件人信息
-            sender = next((u for u in users if u['uid'] == order['senderId']), None)
-            receiver = next((u for u in users if u['uid'] == order['receiverId']), None)
-            
-            results.append({
-                '快递单号': order['orderId'],
-                '寄件人': sender['uname'] if sender else '未知',
-                '寄件人电话': sender['uphone'] if sender else '未知',
-                '收件人': receiver['uname'] if receiver else '未知',
-                '收件人电话': receiver['uphone'] if receiver else '未知',
-                '物品名称': order['goodsName'],
-                '物品重量': order['goodsWeight'],
-                '寄件时间': order['sendTime'],
-                '快递状态': order['orderStatus']
-            })
+    for order_id in order_ids:
+        order = _get_by_key(order_path, order_id) or get_archived_order(order_id)
+        if order is None:
+            continue
+        # 查找寄件人和收件人信息
+        sender = get_user(order['senderId'])
+        receiver = get_user(order['receiverId'])
+
+        results.append({
+            '快递单号': order['orderId'],
+            '寄件人': sender['uname'] if sender else '未知',
+            '寄件人电话': sender['uphone'] if sender else '未知',
+            '收件人': receiver['uname'] if receiver else '未知',
+            '收件人电话': receiver['uphone'] if receiver else '未知',
+            '物品名称': order['goodsName'],
+            '物品重量': order['goodsWeight'],
+            '寄件时间': order['sendTime'],
+            '快递状态': order['orderStatus']
+        })
     
     return results
 
@@ -96,8 +107,13 @@ if __name__ == "__main__":
     results = search_orders_by_phone_prefix("999")
     print_search_results(results)
     
-    # 示例4: 重建索引（数据更新后调用）
-    print("\n【示例4】重建索引")
-    trie_index = PhoneTrieIndex()
-    trie_index.rebuild()
+    # 示例4: 按尾号查询（前台、快递员常用的后4位）
+    print("\n【示例4】查询手机号尾号为 '8001' 的快递")
+    results = search_orders_by_phone_prefix("8001", suffix=True)
+    print_search_results(results)
+    
+    # 示例5: 重建索引（日常增删改由写路径增量维护，批量导入后调用）
+    print("\n【示例5】重建索引")
+    get_phone_trie().rebuild()
+    get_phone_suffix_index().rebuild()
     print("索引重建完成")
@@ -17,7 +17,8 @@
 import os
 import datetime
 from typing import List, Dict, Tuple, Optional
-from db_core import DATA_DIR, write_csv, read_csv
+from db_core import DATA_DIR, write_csv, read_csv, iter_csv, parse_time, _batch_result, _finish_batch
+from archive_core import get_archived_tracks
 
 
 # ==================== 坐标处理工具函数 ====================
@@ -166,8 +167,10 @@ def express_spatial_track(order_id: str) -> List[Dict[str, str]]:
         print(f"❌ 读取数据失败：{e}")
         return []
     
-    # 2. 筛选目标快递的轨迹
+    # 2. 筛选目标快递的轨迹（热表中没有时查询冷数据归档）
     target_tracks = [t for t in tracks if t.get('orderId') == order_id]
+    if not target_tracks:
+        target_tracks = get_archived_tracks(order_id)
     
     if not target_tracks:
         print(f"⚠️  未找到快递单号 {order_id} 的轨迹数据")
@@ -175,8 +178,9 @@ def express_spatial_track(order_id: str) -> List[Dict[str, str]]:
     
     # 3. 按操作时间排序
     def safe_sort_key(track_record):
-        """安全的排序键函数，处理空时间"""
-        return track_record.get('operateTime', '1970-01-01 00:00:00')
+        """安全的排序键函数：按解析后的时间排序（兼容 2024/12/10 8:30 与 2024-12-10 08:30:00），空时间排在最前"""
+        epoch = parse_time(track_record.get('operateTime'))
+        return epoch if epoch is not None else float('-inf')
     
     target_tracks.sort(key=safe_sort_key)
     
@@ -494,17 +498,8 @@ def generate_express_track(order_id: str,
         success = write_csv(track_path, track_data)
         
         if success:
+            # 轨迹表上已登记的索引由write_csv增量维护
             print(f"✅ 轨迹记录已写入：{track_path}")
-            
-            # 可选：重建轨迹表索引
-            try:
-                from index_core import HashIndex
-                track_index = HashIndex("ExpressTrack", "orderId")
-                track_index.rebuild()
-                print("✅ 轨迹索引已更新")
-            except ImportError:
-                pass  # 索引模块不存在，跳过
-            
             return True
         else:
             print(f"❌ 轨迹写入失败")
@@ -515,6 +510,67 @@ def generate_express_track(order_id: str,
         return False
 
 
+def generate_express_tracks(events: List[Dict[str, str]]) -> List[Dict]:
+    """
+    批量生成快递轨迹记录（扫描枪批量上报场景）
+    
+    整批在内存键集合上一次校验（快递单号存在、网点存在、操作类型合法），
+    通过校验的记录一次writerows写入，轨迹索引增量维护
+    
+    Args:
+        events: 轨迹事件列表，每项字段同 generate_express_track 的参数：
+            order_id, current_branch_id, operate_type,
+            prev_branch_id（可选）, next_branch_id（可选）, operate_time（可选，默认当前时间）
+        
+    Returns:
+        每条事件的处理结果列表：
+        [{'row': 序号, 'key': 快递单号, 'accepted': 是否写入, 'error': 拒绝原因}]
+        
+    Example:
+        >>> generate_express_tracks([
+        ...     {'order_id': 'EXP001', 'current_branch_id': 'B001', 'operate_type': '0'},
+        ...     {'order_id': 'EXP002', 'current_branch_id': 'B002', 'operate_type': '1'},
+        ... ])
+    """
+    track_path = os.path.join(DATA_DIR, "ExpressTrack.csv")
+    order_ids = {o['orderId'] for o in iter_csv(os.path.join(DATA_DIR, "ExpressOrder.csv"), columns=['orderId'])}
+    branch_ids = {b['branchId'] for b in iter_csv(os.path.join(DATA_DIR, "ExpressBranch.csv"), columns=['branchId'])}
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    accepted = []
+    results = []
+    for row, event in enumerate(events):
+        order_id = event.get('order_id')
+        current_branch_id = event.get('current_branch_id')
+        operate_type = event.get('operate_type')
+        prev_branch_id = event.get('prev_branch_id') or 'NULL'
+        next_branch_id = event.get('next_branch_id') or 'NULL'
+        
+        error = None
+        if not all([order_id, current_branch_id, operate_type]):
+            error = "缺少必填参数（order_id/current_branch_id/operate_type）"
+        elif operate_type not in ['0', '1', '2', '3', '4']:
+            error = f"操作类型错误：{operate_type}（应为0-4）"
+        elif order_id not in order_ids:
+            error = "快递单不存在（orderId未在ExpressOrder表中）"
+        elif any(b != 'NULL' and b not in branch_ids
+                 for b in (current_branch_id, prev_branch_id, next_branch_id)):
+            error = "网点不存在（branchId未在ExpressBranch表中）"
+        
+        results.append(_batch_result(row, order_id, error))
+        if error is None:
+            accepted.append({
+                'orderId': order_id,
+                'operateBranchId': current_branch_id,
+                'prevBranchId': prev_branch_id,
+                'nextBranchId': next_branch_id,
+                'operateType': operate_type,
+                'operateTime': event.get('operate_time') or now
+            })
+    
+    return _finish_batch(track_path, accepted, results)
+
+
 def get_latest_track(order_id: str) -> Optional[Dict]:
     """
     获取快递的最新轨迹记录
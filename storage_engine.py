@@ -0,0 +1,396 @@
+# storage_engine.py
+"""
+存储引擎抽象：db_core 的基础读写原语（read_csv / iter_csv / write_csv / append_change_log
+以及主键查询、条件查询）统一通过存储引擎完成，上层的增删改查函数和GUI调用方式不变
+
+内置两种引擎：
+- csv：现有的CSV文件存储（变更日志、行偏移、散列索引等，默认）
+- sqlite：标准库sqlite3（WAL模式、主键与二级索引、参数化语句由sqlite3按SQL文本缓存预编译）
+
+引擎选择：环境变量 TS2_STORAGE_ENGINE（csv/sqlite），或调用 set_storage_engine()
+选择sqlite后，只有已迁移到数据库中的表由sqlite处理，其余表仍读写CSV文件
+
+迁移：python storage_engine.py migrate [表名 ...]   将CSV表（含变更日志）复制到SQLite
+"""
+
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+import db_core
+from db_core import DATA_DIR, PRIMARY_KEYS
+
+# 当前存储引擎（csv / sqlite）
+STORAGE_ENGINE = os.environ.get("TS2_STORAGE_ENGINE", "csv")
+SQLITE_DB_PATH = "database/ts2.db"
+# SQLite二级索引（等值查询常用列；主键由PRIMARY KEY约束自带索引）
+SQLITE_INDEXES = {
+    'ExpressOrder': ['senderId', 'receiverId', 'sendBranchId', 'targetBranchId', 'orderStatus'],
+    'ExpressTrack': ['orderId', 'operateBranchId'],
+    'User': ['uphone', 'ucity'],
+    'Courier': ['branchId', 'courierPhone'],
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+# 线程内临时覆盖引擎选择（CsvEngine 需要绕过分发直接读写CSV文件）
+_override = threading.local()
+
+
+class StorageEngine(ABC):
+    """
+    存储引擎接口：按表名读写记录（记录为 {列名: 字符串} 字典，与read_csv返回格式一致）
+    更新/删除以主键（PRIMARY_KEYS）定位；未实现全部接口的引擎在实例化时即报错（TypeError）
+    """
+    name = None
+
+    @abstractmethod
+    def has_table(self, table_name):
+        """引擎中是否存在该表"""
+
+    @abstractmethod
+    def scan(self, table_name, predicate=None, columns=None):
+        """按存储顺序流式产出记录（可选行过滤与列裁剪）"""
+
+    @abstractmethod
+    def query(self, table_name, condition):
+        """等值条件查询（如 {"orderStatus": "3"}），返回记录列表"""
+
+    @abstractmethod
+    def get(self, table_name, key_value):
+        """按主键查询单条记录，未找到返回None"""
+
+    @abstractmethod
+    def insert(self, table_name, records):
+        """追加记录（一批一次写入），返回是否成功"""
+
+    @abstractmethod
+    def update(self, table_name, records):
+        """按主键整行更新（不存在时插入），返回是否成功"""
+
+    @abstractmethod
+    def delete(self, table_name, key_values):
+        """按主键删除，返回是否成功"""
+
+    @abstractmethod
+    def bulk_load(self, table_name, records):
+        """以records整体替换表中数据，返回是否成功"""
+
+    @abstractmethod
+    def create_index(self, table_name, column):
+        """在列上建二级索引（已存在时保留），返回是否成功"""
+
+    @abstractmethod
+    def drop_index(self, table_name, column):
+        """删除列上的二级索引，返回是否成功"""
+
+    @abstractmethod
+    def list_indexes(self, table_name):
+        """表上已建二级索引的列名列表"""
+
+
+@contextmanager
+def _csv_direct():
+    """当前线程内临时关闭引擎分发，db_core 原语直接读写CSV文件"""
+    previous = getattr(_override, 'name', None)
+    _override.name = 'csv'
+    try:
+        yield
+    finally:
+        _override.name = previous
+
+
+class CsvEngine(StorageEngine):
+    """CSV文件引擎：直接使用 db_core 现有的CSV实现"""
+    name = 'csv'
+
+    @staticmethod
+    def _path(table_name):
+        return f"{DATA_DIR}/{table_name}.csv"
+
+    def has_table(self, table_name):
+        return db_core._table_signature(self._path(table_name)) is not None
+
+    def scan(self, table_name, predicate=None, columns=None):
+        with _csv_direct():
+            yield from db_core.iter_csv(self._path(table_name), predicate, columns)
+
+    def query(self, table_name, condition):
+        with _csv_direct():
+            return db_core._query_table(self._path(table_name), condition, PRIMARY_KEYS.get(table_name))
+
+    def get(self, table_name, key_value):
+        with _csv_direct():
+            return db_core._get_by_key(self._path(table_name), key_value)
+
+    def insert(self, table_name, records):
+        with _csv_direct():
+            return db_core.write_csv(self._path(table_name), records)
+
+    def update(self, table_name, records):
+        with _csv_direct():
+            return db_core.append_change_log(self._path(table_name), 'U', records)
+
+    def delete(self, table_name, key_values):
+        key_col = PRIMARY_KEYS[table_name]
+        with _csv_direct():
+            return db_core.append_change_log(self._path(table_name), 'D', [{key_col: k} for k in key_values])
+
+    def bulk_load(self, table_name, records):
+        with _csv_direct():
+            return db_core.write_csv(self._path(table_name), records, mode='w')
+
+    def create_index(self, table_name, column):
+        with _csv_direct():
+            return db_core.create_index(table_name, column)
+
+    def drop_index(self, table_name, column):
+        with _csv_direct():
+            return db_core.drop_index(table_name, column)
+
+    def list_indexes(self, table_name):
+        with _csv_direct():
+            return db_core.list_indexes(table_name)
+
+
+def _quote(identifier):
+    """SQL标识符加双引号（列名来自CSV表头）"""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class SqliteEngine(StorageEngine):
+    """
+    SQLite引擎：每张表一个同名数据表，各列为TEXT（保持与CSV一致的字符串语义），
+    有主键的表设置PRIMARY KEY，常用查询列建二级索引；每个线程一个连接，WAL模式下读写互不阻塞
+    """
+    name = 'sqlite'
+
+    def __init__(self, db_path=SQLITE_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._columns = {}  # {表名: 列名列表}
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            # isolation_level=None：自动提交，批量写入显式BEGIN/COMMIT
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def columns(self, table_name):
+        """表的列名（按建表顺序），表不存在时返回None"""
+        if table_name not in self._columns:
+            if not os.path.exists(self.db_path):
+                return None
+            rows = self._conn().execute(f"PRAGMA table_info({_quote(table_name)})").fetchall()
+            if not rows:
+                return None
+            self._columns[table_name] = [row[1] for row in rows]
+        return self._columns[table_name]
+
+    def has_table(self, table_name):
+        return self.columns(table_name) is not None
+
+    def create_table(self, table_name, columns):
+        """建表（已存在时保留）并创建二级索引"""
+        key_col = PRIMARY_KEYS.get(table_name)
+        col_defs = ', '.join(f"{_quote(col)} TEXT" + (" PRIMARY KEY" if col == key_col else '')
+                             for col in columns)
+        self._conn().execute(f"CREATE TABLE IF NOT EXISTS {_quote(table_name)} ({col_defs})")
+        self._columns.pop(table_name, None)
+        for col in SQLITE_INDEXES.get(table_name, []):
+            if col in columns:
+                self.create_index(table_name, col)
+
+    def create_index(self, table_name, column):
+        if column not in (self.columns(table_name) or []):
+            print(f"错误：表{table_name}中不存在字段{column}")
+            return False
+        self._conn().execute(f"CREATE INDEX IF NOT EXISTS {_quote(f'idx_{table_name}_{column}')} "
+                             f"ON {_quote(table_name)} ({_quote(column)})")
+        return True
+
+    def drop_index(self, table_name, column):
+        self._conn().execute(f"DROP INDEX IF EXISTS {_quote(f'idx_{table_name}_{column}')}")
+        return True
+
+    def list_indexes(self, table_name):
+        prefix = f"idx_{table_name}_"
+        rows = self._conn().execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?",
+                                    [table_name]).fetchall()
+        return [name[len(prefix):] for (name,) in rows if name.startswith(prefix)]
+
+    def _select(self, table_name, columns=None):
+        cols = columns or self.columns(table_name)
+        return cols, f"SELECT {', '.join(map(_quote, cols))} FROM {_quote(table_name)}"
+
+    def scan(self, table_name, predicate=None, columns=None):
+        all_cols, sql = self._select(table_name)
+        for row in self._conn().execute(sql + " ORDER BY rowid"):
+            record = dict(zip(all_cols, row))
+            if predicate is not None and not predicate(record):
+                continue
+            if columns is not None:
+                record = {col: record.get(col) for col in columns}
+            yield record
+
+    def query(self, table_name, condition):
+        if not condition:
+            return list(self.scan(table_name))
+        cols, sql = self._select(table_name)
+        if any(k not in cols for k in condition):
+            return []  # 与CSV一致：不存在的列不会匹配任何行
+        where = ' AND '.join(f"{_quote(k)} = ?" for k in condition)
+        rows = self._conn().execute(f"{sql} WHERE {where} ORDER BY rowid", list(condition.values()))
+        return [dict(zip(cols, row)) for row in rows]
+
+    def get(self, table_name, key_value):
+        matches = self.query(table_name, {PRIMARY_KEYS[table_name]: key_value})
+        return matches[0] if matches else None
+
+    def _values(self, table_name, records):
+        """按列顺序取值，缺失字段补'NULL'（与write_csv一致）"""
+        cols = self.columns(table_name)
+        return cols, [[record.get(col, 'NULL') for col in cols] for record in records]
+
+    def insert(self, table_name, records):
+        cols, values = self._values(table_name, records)
+        sql = (f"INSERT INTO {_quote(table_name)} ({', '.join(map(_quote, cols))}) "
+               f"VALUES ({', '.join('?' * len(cols))})")
+        try:
+            with self._transaction() as conn:
+                conn.executemany(sql, values)
+        except sqlite3.Error as e:
+            print(f"写入{table_name}失败：{e}")
+            return False
+        return True
+
+    def update(self, table_name, records):
+        key_col = PRIMARY_KEYS[table_name]
+        cols, values = self._values(table_name, records)
+        assignments = ', '.join(f"{_quote(col)} = excluded.{_quote(col)}" for col in cols if col != key_col)
+        sql = (f"INSERT INTO {_quote(table_name)} ({', '.join(map(_quote, cols))}) "
+               f"VALUES ({', '.join('?' * len(cols))}) "
+               f"ON CONFLICT({_quote(key_col)}) DO UPDATE SET {assignments}")
+        try:
+            with self._transaction() as conn:
+                conn.executemany(sql, values)
+        except sqlite3.Error as e:
+            print(f"更新{table_name}失败：{e}")
+            return False
+        return True
+
+    def delete(self, table_name, key_values):
+        sql = f"DELETE FROM {_quote(table_name)} WHERE {_quote(PRIMARY_KEYS[table_name])} = ?"
+        try:
+            with self._transaction() as conn:
+                conn.executemany(sql, [[k] for k in key_values])
+        except sqlite3.Error as e:
+            print(f"删除{table_name}失败：{e}")
+            return False
+        return True
+
+    def bulk_load(self, table_name, records):
+        cols, values = self._values(table_name, records)
+        sql = (f"INSERT INTO {_quote(table_name)} ({', '.join(map(_quote, cols))}) "
+               f"VALUES ({', '.join('?' * len(cols))})")
+        try:
+            with self._transaction() as conn:
+                conn.execute(f"DELETE FROM {_quote(table_name)}")
+                conn.executemany(sql, values)
+        except sqlite3.Error as e:
+            print(f"导入{table_name}失败：{e}")
+            return False
+        return True
+
+
+ENGINE_CLASSES = {
+    'csv': CsvEngine,
+    'sqlite': SqliteEngine,
+}
+
+
+def get_storage_engine(name=None):
+    """获取引擎实例（进程内单例）；name为None时返回当前配置的引擎"""
+    name = name or STORAGE_ENGINE
+    with _engines_lock:
+        if name not in _engines:
+            if name not in ENGINE_CLASSES:
+                raise ValueError(f"未知的存储引擎：{name}（支持：{', '.join(ENGINE_CLASSES)}）")
+            _engines[name] = ENGINE_CLASSES[name]()
+        return _engines[name]
+
+
+def set_storage_engine(name):
+    """切换当前存储引擎（csv / sqlite）"""
+    global STORAGE_ENGINE
+    if name not in ENGINE_CLASSES:
+        raise ValueError(f"未知的存储引擎：{name}（支持：{', '.join(ENGINE_CLASSES)}）")
+    STORAGE_ENGINE = name
+
+
+def active_engine():
+    """需要接管读写的引擎：当前为CSV引擎（或线程内临时直连CSV）时返回None"""
+    name = getattr(_override, 'name', None) or STORAGE_ENGINE
+    return None if name == 'csv' else get_storage_engine(name)
+
+
+def _csv_tables():
+    """数据目录下的全部表名（含按月分区的表）"""
+    tables = set()
+    for entry in os.listdir(DATA_DIR):
+        if entry.endswith('.csv'):
+            tables.add(entry[:-4])
+        elif db_core.is_partitioned(entry):
+            tables.add(entry)
+    return sorted(tables)
+
+
+def migrate_csv_to_sqlite(tables=None, db_path=SQLITE_DB_PATH):
+    """
+    将CSV表（已合并变更日志）复制到SQLite数据库；已存在的表整体替换
+    :param tables: 表名列表，None表示数据目录下全部表
+    :return: {表名: 行数}
+    """
+    engine = SqliteEngine(db_path)
+    csv_engine = get_storage_engine('csv')
+    migrated = {}
+    for table_name in tables or _csv_tables():
+        with _csv_direct():
+            columns, _ = db_core._read_fieldnames(f"{DATA_DIR}/{table_name}.csv")
+        if not columns:
+            print(f"⚠️ 跳过{table_name}：无法读取列名")
+            continue
+        records = list(csv_engine.scan(table_name))
+        engine.create_table(table_name, columns)
+        if not engine.bulk_load(table_name, records):
+            print(f"❌ {table_name} 迁移失败")
+            continue
+        migrated[table_name] = len(records)
+        print(f"✅ {table_name}：{len(records)}条数据已迁移到 {db_path}")
+    return migrated
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) >= 2 and sys.argv[1] == 'migrate':
+        migrate_csv_to_sqlite(sys.argv[2:] or None)
+    else:
+        print("用法：python storage_engine.py migrate [表名 ...]")
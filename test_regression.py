@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# test_regression.py
+# 回归测试：在 database/ 的临时副本上运行，断言各查询接口与整表扫描（暴力计算）的结果一致
+# 运行：python test_regression.py  或  python -m pytest -q test_regression.py
+# 测试按定义顺序执行、共用同一份副本（后面的测试在前面写入的数据上继续验证）
+
+import contextlib
+import csv
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import traceback
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
+
+import db_core
+from db_core import DATA_DIR, read_csv, iter_csv, parse_time
+
+# 不复制运行时生成的文件（索引、锁、变更日志、编码目录、sqlite数据库），由测试从头建立
+RUNTIME_ENTRIES = ('index', 'lock', 'log', 'archive', 'encoding.meta', 'ts2.db', 'ts2.db-wal', 'ts2.db-shm')
+
+_workdir = None
+_old_cwd = None
+
+
+def setup_module(module=None):
+    """复制 database/ 到临时目录并切换工作目录（各模块的数据路径均为相对路径 database/...）"""
+    global _workdir, _old_cwd
+    _workdir = tempfile.mkdtemp(prefix="ts2-test-")
+    shutil.copytree(os.path.join(REPO_DIR, "database"), os.path.join(_workdir, "database"),
+                    ignore=lambda src, names: [n for n in names if n in RUNTIME_ENTRIES])
+    _old_cwd = os.getcwd()
+    os.chdir(_workdir)
+
+
+def teardown_module(module=None):
+    os.chdir(_old_cwd)
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽被测函数的提示输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+ORDER_PATH = f"{DATA_DIR}/ExpressOrder.csv"
+USER_PATH = f"{DATA_DIR}/User.csv"
+TRACK_PATH = f"{DATA_DIR}/ExpressTrack.csv"
+
+
+def _ids(records, key='orderId'):
+    return sorted(record[key] for record in records)
+
+
+def _hot_orders():
+    return read_csv(ORDER_PATH)
+
+
+def _new_order(order_id, send_time, status='0', goods='测试物品'):
+    users = [user['uid'] for user in read_csv(USER_PATH)]
+    branches = [branch['branchId'] for branch in read_csv(f"{DATA_DIR}/ExpressBranch.csv")]
+    return {'orderId': order_id, 'senderId': users[0], 'receiverId': users[1], 'goodsName': goods,
+            'goodsWeight': '1.5', 'sendBranchId': branches[0], 'targetBranchId': branches[1],
+            'sendTime': send_time, 'estimatedTime': 'NULL', 'orderStatus': status}
+
+
+def _check_order_indexes():
+    """快递单表各类索引的查询结果与暴力扫描一致（散列、位图、有序、时间、组合索引）"""
+    from archive_core import archived_group_counts
+    from index_core import get_ordered_index, get_time_index, get_composite_index
+    orders = _hot_orders()
+
+    # 散列索引（senderId）与位图索引（orderStatus）参与的等值查询
+    for column in ('senderId', 'orderStatus', 'targetBranchId'):
+        for value in {order[column] for order in orders} | {'不存在的值'}:
+            expected = _ids(order for order in orders if order[column] == value)
+            assert _ids(db_core.query_express_order({column: value})) == expected, (column, value)
+    for order in orders:
+        assert db_core.query_express_order({'orderId': order['orderId']}) == [order]
+
+    # 位图索引分组计数（含条件），计入已归档的快递单
+    expected = {}
+    for order in orders:
+        expected[order['orderStatus']] = expected.get(order['orderStatus'], 0) + 1
+    for value, count in archived_group_counts('orderStatus').items():
+        expected[value] = expected.get(value, 0) + count
+    assert db_core.count_group_by('ExpressOrder', 'orderStatus') == expected
+    for status in ('3', '4'):
+        expected = {}
+        for order in orders:
+            if order['orderStatus'] == status:
+                expected[order['targetBranchId']] = expected.get(order['targetBranchId'], 0) + 1
+        for value, count in archived_group_counts('targetBranchId', {'orderStatus': status}).items():
+            expected[value] = expected.get(value, 0) + count
+        assert db_core.count_group_by('ExpressOrder', 'targetBranchId', {'orderStatus': status}) == expected
+
+    # 时间索引：任意区间与按epoch秒过滤的结果一致，且按时间升序
+    epochs = sorted({parse_time(order['sendTime']) for order in orders} - {None})
+    windows = [(None, None), (epochs[0], epochs[-1]), (epochs[len(epochs) // 3], epochs[2 * len(epochs) // 3] + 1),
+               (epochs[-1] + 1, None)]
+    for start, end in windows:
+        result = db_core.query_by_time('ExpressOrder', 'sendTime', start, end)
+        expected = [order for order in orders if (epoch := parse_time(order['sendTime'])) is not None and
+                    (start is None or epoch >= start) and (end is None or epoch < end)]
+        assert _ids(result) == _ids(expected), (start, end)
+        times = [parse_time(order['sendTime']) for order in result]
+        assert times == sorted(times)
+
+    # 组合索引：(目标网点, 状态) + 寄件时间区间
+    branches = {order['targetBranchId'] for order in orders}
+    for start, end in windows:
+        result = db_core._delivery_orders(branches, None if start is None and end is None else (start, end))
+        expected = [order for order in orders if order['orderStatus'] in db_core.DELIVERY_STATUSES and
+                    (epoch := parse_time(order['sendTime'])) is not None and
+                    (start is None or epoch >= start) and (end is None or epoch < end)]
+        assert _ids(result) == _ids(expected), (start, end)
+
+    # 索引本身（不合并变更日志）与基础表逐行一致：行号从2开始，同一时间按行号升序
+    base = read_csv(ORDER_PATH, apply_log=False)
+    timed = sorted((epoch, row, order) for row, order in enumerate(base, 2)
+                   if (epoch := parse_time(order['sendTime'])) is not None)
+    time_index = get_time_index('ExpressOrder', 'sendTime')
+    composite = get_composite_index('ExpressOrder', db_core.DELIVERY_INDEX_PREFIX, 'sendTime')
+    for start, end in windows:
+        in_window = [(row, order) for epoch, row, order in timed
+                     if (start is None or epoch >= start) and (end is None or epoch < end)]
+        assert time_index.search_range(start, end) == [row for row, _ in in_window], (start, end)
+        for branch in branches:
+            assert composite.search((branch, '3'), start, end) == \
+                [row for row, order in in_window if (order['targetBranchId'], order['orderStatus']) == (branch, '3')]
+
+    # 有序索引：基础表中每个单号都能定位到它所在的行
+    index = get_ordered_index('ExpressOrder', 'orderId')
+    for order in base:
+        rows = index.search(order['orderId'])
+        assert order['orderId'] in _ids(db_core.fetch_rows('ExpressOrder', rows)), order['orderId']
+    assert [key for key, _ in index.range_scan()] == sorted(order['orderId'] for order in base)
+
+
+# ==================== 基础读写 ====================
+
+def test_encoding_migration():
+    """数据表统一转码为UTF-8后内容不变，编码目录登记为utf-8"""
+    tables = sorted(name[:-4] for name in os.listdir(DATA_DIR) if name.endswith('.csv'))
+    before = {table: read_csv(f"{DATA_DIR}/{table}.csv") for table in tables}
+    with quiet():
+        db_core.migrate_csv_encoding()
+    for table in tables:
+        path = f"{DATA_DIR}/{table}.csv"
+        assert db_core.detect_encoding(path) in ('utf-8', 'utf-8-sig'), table
+        assert read_csv(path) == before[table], table
+    with quiet():
+        db_core.migrate_csv_encoding()  # 重复执行是幂等的
+    assert read_csv(ORDER_PATH) == before['ExpressOrder']
+
+
+def test_iter_csv_and_row_locator():
+    """iter_csv 的过滤/投影与 read_csv 一致；按行号读取与文件中的行一致"""
+    orders = read_csv(ORDER_PATH)
+    assert list(iter_csv(ORDER_PATH)) == orders
+    status = orders[0]['orderStatus']
+    assert list(iter_csv(ORDER_PATH, predicate=lambda o: o['orderStatus'] == status)) == \
+        [order for order in orders if order['orderStatus'] == status]
+    assert list(iter_csv(ORDER_PATH, columns=['orderId'])) == [{'orderId': o['orderId']} for o in orders]
+    rows = list(range(2, len(orders) + 2))
+    assert db_core.fetch_rows('ExpressOrder', rows[::-1]) == orders[::-1]
+    assert db_core.fetch_rows('ExpressOrder', [0, 1, len(orders) + 2]) == []
+
+
+def test_table_cache():
+    """LRU表缓存：重复读取命中缓存，文件改动后不返回旧内容，预算为0时不缓存"""
+    db_core.clear_table_cache()
+    first = read_csv(USER_PATH)
+    hits = db_core.table_cache_stats()['hits']
+    assert read_csv(USER_PATH) == first
+    assert db_core.table_cache_stats()['hits'] == hits + 1
+    user = dict(first[0], uid='UTEST0', uphone='13700000000', uidcard='')
+    with quiet():
+        assert db_core.insert_user(user)
+    assert read_csv(USER_PATH) == first + [user]
+    with quiet():
+        assert db_core.delete_user('UTEST0')
+    assert read_csv(USER_PATH) == first
+
+    budget = db_core.table_cache_stats()['max_bytes']
+    db_core.set_table_cache_budget(0)
+    try:
+        assert read_csv(USER_PATH) == first
+        assert db_core.table_cache_stats()['tables'] == 0
+    finally:
+        db_core.set_table_cache_budget(budget)
+
+
+def test_file_lock_excludes_readers():
+    """排他锁持有期间其他线程的共享锁等待；同一线程可重入"""
+    lock = db_core._file_lock(ORDER_PATH)
+    entered = threading.Event()
+
+    def reader():
+        with lock.shared():
+            entered.set()
+
+    with lock.exclusive():
+        with lock.shared():  # 重入
+            pass
+        thread = threading.Thread(target=reader)
+        thread.start()
+        assert not entered.wait(0.2)
+    thread.join(5)
+    assert entered.is_set()
+
+
+def test_typed_rows():
+    """类型化记录下标访问返回原文，属性返回解析后的值"""
+    from typed_rows import load_express_orders
+    orders = read_csv(ORDER_PATH)
+    typed = load_express_orders()
+    assert [record.to_dict() for record in typed] == orders
+    for record, order in zip(typed, orders):
+        assert record.sendTime == parse_time(order['sendTime'])
+        status = order['orderStatus']
+        assert record.orderStatus == (int(status) if status and status.isdigit() else None)
+
+
+# ==================== 增删改与索引同步 ====================
+
+def test_crud_keeps_indexes_in_sync():
+    """单条/批量插入、更新、状态流转、删除后，各类索引的查询结果与暴力扫描一致"""
+    from index_core import get_ordered_index, get_time_index, get_composite_index
+    with quiet():
+        assert db_core.create_index('ExpressOrder', 'senderId')
+        assert db_core.create_index('ExpressOrder', 'orderStatus', kind='bitmap')
+        assert db_core.create_index('ExpressOrder', 'targetBranchId', kind='bitmap')
+        assert db_core.create_index('ExpressOrder', 'goodsName', kind='text')
+        assert get_ordered_index('ExpressOrder', 'orderId').build()
+        assert get_time_index('ExpressOrder', 'sendTime').build()
+        assert get_composite_index('ExpressOrder', db_core.DELIVERY_INDEX_PREFIX, 'sendTime').build()
+    _check_order_indexes()
+
+    users = read_csv(USER_PATH)
+    with quiet():
+        assert db_core.insert_express_order(_new_order('TST001', '2024-12-15 10:00:00', goods='回归测试茶叶'))
+        assert not db_core.insert_express_order(_new_order('TST001', '2024-12-15 10:00:00'))  # 单号重复
+        results = db_core.insert_express_orders([
+            _new_order('TST002', '2024/12/1 8:30', status='3'),
+            _new_order('TST003', '2023-01-05 12:00:00', status='2'),
+            _new_order('TST002', '2024-12-16 09:00:00'),  # 批内重复
+            dict(_new_order('TST004', '2024-12-16 09:00:00'), senderId='不存在的用户'),
+        ])
+    assert [result['accepted'] for result in results] == [True, True, False, False]
+    _check_order_indexes()
+
+    with quiet():
+        assert db_core.update_express_order('TST001', {'orderStatus': '1', 'senderId': users[2]['uid'],
+                                                       'sendTime': '2022-06-01 00:00:00'})
+        assert not db_core.update_express_order('TST001', {'orderStatus': '4'})  # 非法流转
+        results = db_core.update_express_orders_status({'TST003': '3', 'TST002': '4', 'NOPE': '1'})
+    assert [result['accepted'] for result in results] == [True, True, False]
+    _check_order_indexes()
+    assert db_core.query_express_order({'orderId': 'TST001'})[0]['senderId'] == users[2]['uid']
+
+    with quiet():
+        assert db_core.delete_express_order('TST003')
+        assert not db_core.delete_express_order('TST003')
+    assert db_core.query_express_order({'orderId': 'TST003'}) == []
+    _check_order_indexes()
+
+    # 文本索引随写路径维护
+    assert _ids(db_core.text_search('ExpressOrder', 'goodsName', '回归测试', limit=None)) == ['TST001']
+    with quiet():
+        assert db_core.update_express_order('TST001', {'goodsName': '普通物品'})
+    assert db_core.text_search('ExpressOrder', 'goodsName', '回归测试', limit=None) == []
+
+    # 合并变更日志（整表重写）后按签名重建，结果不变
+    with quiet():
+        assert db_core.compact_table(ORDER_PATH)
+    _check_order_indexes()
+
+
+def test_user_secondary_index():
+    """用户表任意列上的散列索引随更新/删除维护"""
+    with quiet():
+        assert db_core.create_index('User', 'ucity')
+        uid = read_csv(USER_PATH)[0]['uid']
+        assert db_core.update_user(uid, {'ucity': '测试市'})
+    users = read_csv(USER_PATH)
+    for city in {user['ucity'] for user in users}:
+        assert _ids(db_core.query_user({'ucity': city}), 'uid') == \
+            _ids((user for user in users if user['ucity'] == city), 'uid'), city
+    assert _ids(db_core.query_user({'ucity': '测试市'}), 'uid') == [uid]
+
+
+def test_bulk_loader():
+    """批量导入：合法行写入且索引同步，外键/主键冲突的行被拒绝"""
+    import bulk_loader
+    columns = list(_hot_orders()[0].keys())
+    # 单号按降序写入：追加的索引条目须在内存中保持有序
+    rows = [_new_order(f"BLK{i:03d}", f"2024-11-{i % 28 + 1:02d} 10:00:00", status=str(i % 4))
+            for i in range(39, -1, -1)]
+    rows.append(dict(_new_order('BLK999', '2024-11-01 10:00:00'), receiverId='不存在的用户'))
+    rows.append(_new_order('TST001', '2024-11-01 10:00:00'))  # 单号已存在
+    source = os.path.join(_workdir, "bulk_orders.csv")
+    with open(source, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    with quiet():
+        stats = bulk_loader.bulk_load('ExpressOrder', source, workers=1)
+    assert stats['rows'] == 42 and stats['accepted'] == 40 and stats['rejected'] == 2
+    assert sorted(error['key'] for error in stats['errors']) == ['BLK999', 'TST001']
+    assert {f"BLK{i:03d}" for i in range(40)} <= set(_ids(_hot_orders()))
+    _check_order_indexes()
+
+
+# ==================== 分区 ====================
+
+def test_partition_round_trip():
+    """按月分区及还原后数据不变，分区表上的查询与写入结果与暴力扫描一致"""
+    before = _hot_orders()
+    with quiet():
+        assert db_core.partition_table('ExpressOrder')
+    assert db_core.is_partitioned('ExpressOrder')
+    assert not os.path.exists(ORDER_PATH)
+    assert sum(p['rowCount'] for p in db_core.partition_stats('ExpressOrder')) == len(before)
+    assert _ids(_hot_orders()) == _ids(before)
+    assert sorted(map(sorted, (o.items() for o in _hot_orders()))) == sorted(map(sorted, (o.items() for o in before)))
+    _check_order_indexes()
+
+    with quiet():
+        assert db_core.insert_express_order(_new_order('PRT001', '2025-01-20 10:00:00'))
+        assert db_core.update_express_order('PRT001', {'orderStatus': '1'})
+    assert db_core.query_express_order({'orderId': 'PRT001'})[0]['orderStatus'] == '1'
+    assert _ids(db_core.query_by_time('ExpressOrder', 'sendTime', '2025-01-01 00:00:00', '2025-02-01 00:00:00')) == \
+        _ids(o for o in _hot_orders() if '2025-01' <= db_core.format_time(parse_time(o['sendTime'])) < '2025-02')
+    _check_order_indexes()
+
+    during = _hot_orders()
+    with quiet():
+        assert db_core.unpartition_table('ExpressOrder')
+    assert not db_core.is_partitioned('ExpressOrder')
+    assert os.path.exists(ORDER_PATH)
+    assert _ids(_hot_orders()) == _ids(during)
+    _check_order_indexes()
+
+
+# ==================== 手机号前缀/尾号 ====================
+
+def _orders_by_phone(match):
+    phones = {user['uid']: user['uphone'] for user in read_csv(USER_PATH)}
+    return sorted(order['orderId'] for order in _hot_orders()
+                  if any(match(phones.get(order[col]) or '') for col in ('senderId', 'receiverId')))
+
+
+def test_phone_prefix_and_suffix_search():
+    """前缀/尾号查询与暴力匹配一致，写路径（插入、删除、改手机号）增量维护"""
+    from phone_search_example import search_orders_by_phone_prefix
+    from trie_index import get_phone_trie, get_phone_suffix_index
+    phones = sorted({user['uphone'] for user in read_csv(USER_PATH)})
+    prefixes = {'1', '138', '999'} | {phone[:k] for phone in phones for k in (3, 7, 11)}
+    suffixes = {'0', '9999'} | {phone[-k:] for phone in phones for k in (1, 4)}
+
+    def check():
+        for prefix in prefixes:
+            assert sorted(get_phone_trie().search_prefix(prefix)) == \
+                _orders_by_phone(lambda p: p.startswith(prefix)), prefix
+        for suffix in suffixes:
+            assert sorted(get_phone_suffix_index().search_suffix(suffix)) == \
+                _orders_by_phone(lambda p: p.endswith(suffix)), suffix
+        with quiet():
+            found = search_orders_by_phone_prefix(phones[0][:3])
+            found_suffix = search_orders_by_phone_prefix(phones[0][-4:], suffix=True)
+        assert sorted(r['快递单号'] for r in found) == _orders_by_phone(lambda p: p.startswith(phones[0][:3]))
+        assert sorted(r['快递单号'] for r in found_suffix) == _orders_by_phone(lambda p: p.endswith(phones[0][-4:]))
+        limited = get_phone_trie().search_prefix('1', limit=3)
+        assert len(limited) == min(3, len(_orders_by_phone(lambda p: p.startswith('1'))))
+
+    check()
+    with quiet():
+        assert db_core.insert_express_order(_new_order('PHN001', '2024-12-20 10:00:00'))
+        assert db_core.delete_express_order('BLK000')
+        sender = read_csv(USER_PATH)[0]['uid']
+        assert db_core.update_user(sender, {'uphone': '15912345678'})
+    prefixes |= {'159', '1591234'}
+    suffixes |= {'5678'}
+    check()
+
+    # 重建后与增量维护的结果一致
+    with quiet():
+        get_phone_trie().rebuild()
+        get_phone_suffix_index().rebuild()
+    check()
+
+
+# ==================== 归档 ====================
+
+def test_archive_round_trip():
+    """终态快递单及其轨迹归档后可按单号读回，分组统计不变，热表中不再保留"""
+    from archive_core import archive_orders, get_archived_order, get_archived_tracks, is_archived, ARCHIVE_STATUSES
+    orders = _hot_orders()
+    tracks = read_csv(TRACK_PATH)
+    terminal = [order for order in orders if order['orderStatus'] in ARCHIVE_STATUSES]
+    assert terminal
+    counts = {column: db_core.count_group_by('ExpressOrder', column) for column in ('orderStatus', 'targetBranchId')}
+    courier = read_csv(f"{DATA_DIR}/Courier.csv")[0]
+    epochs = {parse_time(order['sendTime']) for order in orders} - {None}
+    deliveries = {day: db_core.join_courier_orders(courier['courierId'], day)
+                  for day in {db_core.format_time(epoch)[:10] for epoch in epochs}}
+
+    with quiet():
+        stats = archive_orders(segment_orders=4)
+    assert stats['orders'] == len(terminal)
+    hot_ids = set(_ids(_hot_orders()))
+    for order in terminal:
+        assert order['orderId'] not in hot_ids
+        assert is_archived(order['orderId'])
+        assert get_archived_order(order['orderId']) == order
+        assert db_core.query_express_order({'orderId': order['orderId']}) == [order]
+        assert get_archived_tracks(order['orderId']) == [t for t in tracks if t['orderId'] == order['orderId']]
+    assert _ids(_hot_orders()) == _ids(o for o in orders if o['orderStatus'] not in ARCHIVE_STATUSES)
+    archived_ids = {order['orderId'] for order in terminal}
+    assert read_csv(TRACK_PATH) == [t for t in tracks if t['orderId'] not in archived_ids]
+    for column, expected in counts.items():
+        assert db_core.count_group_by('ExpressOrder', column) == expected, column
+    for day, expected in deliveries.items():
+        assert db_core.join_courier_orders(courier['courierId'], day) == expected, day
+    _check_order_indexes()
+
+    # 归档的单号不能重复使用；再次归档没有新的快递单
+    with quiet():
+        assert not db_core.insert_express_order(_new_order(terminal[0]['orderId'], '2024-12-15 10:00:00'))
+        assert archive_orders()['orders'] == 0
+
+    # 批量导入轨迹：已归档快递单的轨迹可以导入，不存在的快递单被拒绝
+    import bulk_loader
+    source = os.path.join(_workdir, "bulk_tracks.csv")
+    with open(source, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(tracks[0].keys()))
+        writer.writeheader()
+        writer.writerows([dict(tracks[0], orderId=terminal[0]['orderId']), dict(tracks[0], orderId='NOPE')])
+    with quiet():
+        stats = bulk_loader.bulk_load('ExpressTrack', source, workers=1)
+    assert stats['accepted'] == 1 and [error['key'] for error in stats['errors']] == ['NOPE']
+
+
+# ==================== SQLite存储引擎 ====================
+
+def test_sqlite_engine():
+    """迁移到SQLite后增删改查结果与CSV引擎一致，切回CSV引擎后CSV文件不受影响"""
+    import storage_engine
+    tables = ['ExpressOrder', 'User']
+    csv_data = {table: read_csv(f"{DATA_DIR}/{table}.csv") for table in tables}
+    with quiet():
+        migrated = storage_engine.migrate_csv_to_sqlite(tables)
+    assert migrated == {table: len(csv_data[table]) for table in tables}
+
+    storage_engine.set_storage_engine('sqlite')
+    try:
+        for table in tables:
+            assert sorted(map(sorted, (r.items() for r in read_csv(f"{DATA_DIR}/{table}.csv")))) == \
+                sorted(map(sorted, (r.items() for r in csv_data[table]))), table
+        order = csv_data['ExpressOrder'][0]
+        assert db_core.query_express_order({'orderId': order['orderId']}) == [order]
+        status = order['orderStatus']
+        assert _ids(db_core.query_express_order({'orderStatus': status})) == \
+            _ids(o for o in csv_data['ExpressOrder'] if o['orderStatus'] == status)
+        with quiet():
+            assert db_core.insert_express_order(_new_order('SQL001', '2024-12-15 10:00:00'))
+            assert not db_core.insert_express_order(_new_order('SQL001', '2024-12-15 10:00:00'))
+            assert db_core.update_express_order('SQL001', {'orderStatus': '1'})
+        assert db_core.query_express_order({'orderId': 'SQL001'})[0]['orderStatus'] == '1'
+        assert 'SQL001' in _ids(db_core.query_by_time('ExpressOrder', 'sendTime',
+                                                      '2024-12-15 00:00:00', '2024-12-16 00:00:00'))
+        with quiet():
+            assert db_core.delete_express_order('SQL001')
+        assert db_core.query_express_order({'orderId': 'SQL001'}) == []
+        assert _ids(read_csv(ORDER_PATH)) == _ids(csv_data['ExpressOrder'])
+    finally:
+        storage_engine.set_storage_engine('csv')
+    assert read_csv(ORDER_PATH) == csv_data['ExpressOrder']
+    _check_order_indexes()
+
+
+if __name__ == "__main__":
+    tests = [(name, func) for name, func in list(globals().items()) if name.startswith('test_') and callable(func)]
+    setup_module()
+    failed = 0
+    try:
+        for name, func in tests:
+            try:
+                with quiet():
+                    func()
+                print(f"✓ {name}")
+            except Exception:
+                failed += 1
+                print(f"✗ {name}")
+                traceback.print_exc()
+    finally:
+        teardown_module()
+    print(f"\n{len(tests) - failed}/{len(tests)} 通过")
+    sys.exit(1 if failed else 0)
@@ -1,97 +1,468 @@
 # trie_index.py
 import os
-import pickle
+import struct
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from heapq import merge
 from db_core import DATA_DIR, INDEX_DIR
+from db_core import (iter_csv, _iter_base_records, _load_partitions, _load_change_log, _file_lock, _file_signature,
+                     _routed_engine)
+from archive_core import iter_archived_orders
+
+# 手机号 -> 快递单号 的压缩基数树（radix trie）
+# - 单分支的路径合并为一条边（边标签为一段数字），节点存放在并列数组中（不为每个节点建对象和字典），
+#   同一节点的子节点在数组中连续存放（按层序编号）
+# - 全部 (手机号, 快递单号) 按手机号、单号排序后存为一个有序倒排数组，只有手机号结束的节点（终止节点）拥有倒排；
+#   每个节点记录其子树在倒排数组中的区间 [lo, hi)，前缀查询定位到节点后直接读取该区间（一次切片，无需遍历子树）；
+#   只有增量叠加层中有以该前缀开头的手机号时，才按手机号遍历子树中的终止节点以合并增量
+# - 快递单号以字节区 + 偏移数组存放，按需解码
+# 磁盘格式（phone_order_trie.idx）：文件头 + 各数组 + 边标签字节区 + 单号偏移数组 + 单号字节区
+# 增量维护：新增/删除快递单、用户改手机号时由写路径调用 add_order / remove_order / update_order_phones，
+# 增量追加到 phone_order_trie.delta（每行"操作,手机号,单号"）并在内存中叠加到主索引之上；
+# 增量条目数达到倒排条目数的一定比例时合并重写主索引（只用索引自身的数据，不重新读取数据表）
+# 手机号尾号查询（如后4位"8001"）由 PhoneSuffixIndex 提供：同一结构，以反转后的手机号为键，
+# 尾号查询即反转键上的前缀查询
+PHONE_DELTA_MIN_ENTRIES = 1024   # 增量少于该条目数时不合并
+PHONE_DELTA_RATIO = 0.2          # 增量条目数达到倒排条目数的该比例时合并
+ORDER_PATH = f"{DATA_DIR}/ExpressOrder.csv"
+
+_build_context = None  # 构建工作进程内的 (uid -> 索引键, 变更日志中的单号集合)
+
+
+def _valid_phone(phone):
+    """11位数字的手机号原样返回，否则返回None"""
+    phone = (phone or '').strip()
+    return phone if phone.isdigit() and len(phone) == 11 else None
+
+
+def _phone_postings(orders, uid_to_phone, skip_keys=()):
+    """由一批快递单生成一棵子树的有序倒排：升序、去重的 (手机号, 单号) 列表（寄件人、收件人各一条）"""
+    pairs = set()
+    for order in orders:
+        order_id = (order.get('orderId') or '').strip()
+        if not order_id or order_id in skip_keys:
+            continue  # 跳过无订单ID的记录；变更日志中的单号以日志中的版本为准
+        for col in ('senderId', 'receiverId'):
+            phone = uid_to_phone.get((order.get(col) or '').strip())
+            if phone:
+                pairs.add((phone, order_id))
+    return sorted(pairs)
 
-class TrieNode:
-    def __init__(self):
-        self.children = {}  # 子节点：{字符: TrieNode}
-        self.order_ids = set()  # 该前缀对应的快递单ID集合
+
+def _init_build_worker(uid_to_phone, changed_keys):
+    global _build_context
+    _build_context = (uid_to_phone, changed_keys)
+
+
+def _build_partition(month):
+    """工作进程：为一个月份分区中的快递单（基础表版本）构建子树"""
+    uid_to_phone, changed_keys = _build_context
+    return _phone_postings(_iter_base_records(ORDER_PATH, months=[month]), uid_to_phone, changed_keys)
 
 
 class PhoneTrieIndex:
+    NAME = "phone_order_trie"  # 索引文件名（不含扩展名）
+    DESCRIPTION = "手机号前缀-Trie索引"
+    MAGIC = b'TS2TRIE1'
+    HEADER = struct.Struct('<8sIIII')  # 魔数、节点数、边标签字节数、倒排条目数、单号字节数
+    NODE_ARRAYS = ('label_start', 'label_len', 'child_start', 'child_count', 'post_lo', 'post_hi')
+
     def __init__(self):
-        self.root = TrieNode()
-        self.index_path = os.path.join(INDEX_DIR, "phone_order_trie.idx")  # 索引保存路径
-
-    def insert(self, phone: str, order_id: str):
-        """插入手机号与快递单的关联关系"""
-        node = self.root
-        for char in phone:
-            if char not in node.children:
-                node.children[char] = TrieNode()
-            node = node.children[char]
-            node.order_ids.add(order_id)  # 每个前缀都关联订单ID
-
-    def search_prefix(self, prefix: str) -> set:
-        """查询前缀对应的所有快递单ID"""
+        self.index_path = os.path.join(INDEX_DIR, f"{self.NAME}.idx")  # 索引保存路径
+        self.delta_path = os.path.join(INDEX_DIR, f"{self.NAME}.delta")
+        self._set_arrays([], [])
+        self._overlay = {}  # 增量叠加层 {手机号: {单号: 是否存在}}
+        self._signature = None  # 已加载的主索引文件签名
+        self._delta_pos = 0  # 增量文件中已重放到的字节位置
+        self._delta_count = 0  # 已重放的增量条目数
+
+    @staticmethod
+    def _key(phone):
+        """手机号在树中的键（前缀索引即手机号本身）"""
+        return phone
+
+    def _set_arrays(self, phones, postings):
+        """
+        由有序的去重手机号列表和对应的倒排构建压缩基数树
+        :param phones: 升序、不重复的手机号列表
+        :param postings: 与phones一一对应的快递单号列表（每个列表已升序）
+        """
+        # 倒排数组：第i个手机号的单号占 [starts[i], starts[i+1])
+        starts = [0]
+        for order_ids in postings:
+            starts.append(starts[-1] + len(order_ids))
+        blob = bytearray()
+        offsets = array('I', [0])
+        for order_ids in postings:
+            for order_id in order_ids:
+                blob += order_id.encode('utf-8')
+                offsets.append(len(blob))
+        self.order_blob = bytes(blob)
+        self.order_offsets = offsets
+
+        # 按层序建树：每个节点对应手机号区间 [a, b)，区间内的手机号共享长度为depth的前缀
+        keys = [phone.encode('utf-8') for phone in phones]
+        arrays = {name: array('I') for name in self.NODE_ARRAYS}
+        labels = bytearray()
+        queue = [(0, len(keys), 0, b'')]  # (区间起点, 区间终点, 前缀长度, 边标签)
+        head = 0
+        while head < len(queue):
+            a, b, depth, label = queue[head]
+            head += 1
+            arrays['label_start'].append(len(labels))
+            arrays['label_len'].append(len(label))
+            labels += label
+            arrays['post_lo'].append(starts[a])
+            arrays['post_hi'].append(starts[b])
+            if a < b and len(keys[a]) == depth:
+                a += 1  # 终止节点：手机号恰好在此结束（排在子树最前）
+            arrays['child_start'].append(len(queue))
+            children = 0
+            while a < b:
+                # 同一首字符的手机号连续排列，子节点边标签为该组的最长公共前缀（去掉已匹配部分）
+                first = keys[a][depth]
+                end = a + 1
+                while end < b and keys[end][depth] == first:
+                    end += 1
+                low, high = keys[a], keys[end - 1]
+                lcp = depth + 1
+                while lcp < len(low) and lcp < len(high) and low[lcp] == high[lcp]:
+                    lcp += 1
+                queue.append((a, end, lcp, low[depth:lcp]))
+                children += 1
+                a = end
+            arrays['child_count'].append(children)
+        for name, values in arrays.items():
+            setattr(self, name, values)
+        self.labels = bytes(labels)
+
+    def _order_id(self, i):
+        """倒排数组中第i个快递单号"""
+        return self.order_blob[self.order_offsets[i]:self.order_offsets[i + 1]].decode('utf-8')
+
+    def _label(self, node):
+        start = self.label_start[node]
+        return self.labels[start:start + self.label_len[node]]
+
+    def _find(self, prefix: bytes):
+        """定位前缀所在的节点（前缀可止于边的中间），返回 (节点, 根到该节点的完整路径)，不存在返回None"""
+        node, pos, path = 0, 0, b''
+        labels = self.labels
+        while pos < len(prefix):
+            start = self.child_start[node]
+            for child in range(start, start + self.child_count[node]):
+                if labels[self.label_start[child]] == prefix[pos]:
+                    break
+            else:
+                return None
+            label = self._label(child)
+            n = min(len(label), len(prefix) - pos)
+            if label[:n] != prefix[pos:pos + n]:
+                return None
+            node, pos, path = child, pos + n, path + label
+        return node, path
+
+    def _iter_base_groups(self, prefix: str):
+        """按手机号升序产出主索引中以prefix开头的 (手机号, [单号])：在前缀所在子树中按序访问终止节点"""
+        found = self._find(prefix.encode('utf-8'))
+        if found is None:
+            return
+        stack = [found]
+        while stack:
+            node, path = stack.pop()
+            start, count = self.child_start[node], self.child_count[node]
+            # 终止节点自身的倒排排在子树区间最前，其后依次是各子节点的区间
+            lo, own_end = self.post_lo[node], self.post_lo[start] if count else self.post_hi[node]
+            if own_end > lo:
+                yield path.decode('utf-8'), [self._order_id(i) for i in range(lo, own_end)]
+            for child in range(start + count - 1, start - 1, -1):
+                stack.append((child, path + self._label(child)))
+
+    def _iter_base_range(self, prefix: str):
+        """按 (手机号, 单号) 顺序产出主索引中以prefix开头的快递单号：前缀所在节点的倒排区间 [lo, hi)"""
+        found = self._find(prefix.encode('utf-8'))
+        if found is None:
+            return
+        node, _ = found
+        for i in range(self.post_lo[node], self.post_hi[node]):
+            yield self._order_id(i)
+
+    def _iter_groups(self, prefix: str):
+        """按手机号升序产出以prefix开头的 (手机号, [单号])，主索引与增量叠加层合并"""
+        overlay = self._overlay
+        extra = sorted(phone for phone in overlay if phone.startswith(prefix))
+        i = 0
+        for phone, order_ids in self._iter_base_groups(prefix):
+            while i < len(extra) and extra[i] < phone:
+                yield from self._merged_group(extra[i], [])
+                i += 1
+            if i < len(extra) and extra[i] == phone:
+                i += 1
+            yield from self._merged_group(phone, order_ids)
+        for phone in extra[i:]:
+            yield from self._merged_group(phone, [])
+
+    def _merged_group(self, phone, order_ids):
+        """把叠加层中该手机号的增量并入主索引的倒排（为空时不产出）"""
+        changes = self._overlay.get(phone)
+        if changes:
+            existing = set(order_ids)
+            order_ids = [order_id for order_id in order_ids if changes.get(order_id, True)]
+            order_ids += sorted(order_id for order_id, present in changes.items()
+                                if present and order_id not in existing)
+        if order_ids:
+            yield phone, order_ids
+
+    def iter_prefix(self, prefix: str):
+        """按手机号顺序流式产出前缀匹配的快递单ID（同一快递单的寄件人、收件人都匹配时只产出一次）"""
         if not prefix:  # 严格处理空前缀
-            return set()
-        node = self.root
-        for char in prefix:
-            if char not in node.children:
-                return set()  # 前缀不存在，返回空
-            node = node.children[char]
-        return node.order_ids.copy()  # 返回副本，避免外部修改
-    def build(self):
-        """从用户表和快递单表构建Trie索引"""
-        # 1. 读取用户表（手机号与用户ID映射，过滤无效数据）
-        user_path = os.path.join(DATA_DIR, "User.csv")
-        from db_core import read_csv
-        users = read_csv(user_path)
-        # 过滤掉手机号为空或无效的用户
-        phone_to_uid = {}
-        for user in users:
-            uphone = user.get('uphone', '').strip()
-            uid = user.get('uid', '').strip()
-            if uphone and uid and uphone.isdigit() and len(uphone) == 11:  # 验证手机号有效性
-                phone_to_uid[uphone] = uid
-
-        # 2. 读取快递单表（关联寄件人/收件人）
-        order_path = os.path.join(DATA_DIR, "ExpressOrder.csv")
-        orders = read_csv(order_path)
-
-        # 3. 清空现有索引（避免累积旧数据）
-        self.root = TrieNode()  # 关键修复：重建前清空根节点
-
-        # 4. 建立手机号与快递单的关联
-        for order in orders:
-            order_id = order.get('orderId', '').strip()
-            if not order_id:
-                continue  # 跳过无订单ID的记录
-
-            # 关联寄件人手机号
-            sender_id = order.get('senderId', '').strip()
-            sender_phone = next((p for p, uid in phone_to_uid.items() if uid == sender_id), None)
-            if sender_phone:
-                self.insert(sender_phone, order_id)
-
-            # 关联收件人手机号
-            receiver_id = order.get('receiverId', '').strip()
-            receiver_phone = next((p for p, uid in phone_to_uid.items() if uid == receiver_id), None)
-            if receiver_phone:
-                self.insert(receiver_phone, order_id)
-
-        # 5. 保存索引
-        self.save()
-        print("手机号前缀-Trie索引构建完成")
+            return
+        # 按需加载（并补齐其他进程追加的增量），索引文件不存在或格式不符时重建
+        if not self.load() and not self.build():
+            return
+        if any(phone.startswith(prefix) for phone in self._overlay):
+            order_ids = (order_id for _, ids in self._iter_groups(prefix) for order_id in ids)
+        else:
+            order_ids = self._iter_base_range(prefix)
+        seen = set()
+        for order_id in order_ids:
+            if order_id not in seen:
+                seen.add(order_id)
+                yield order_id
+
+    def search_prefix(self, prefix: str, limit=None) -> list:
+        """
+        查询前缀对应的快递单ID（按手机号顺序）
+        :param limit: 最多返回的条数，None表示不限（"13"这类短前缀建议限制条数，只解码需要的部分）
+        """
+        result = []
+        for order_id in self.iter_prefix(prefix):
+            if limit is not None and len(result) >= limit:
+                break
+            result.append(order_id)
+        return result
+
+    def build(self, workers=None):
+        """
+        从用户表和快递单表（含已归档的快递单）构建Trie索引
+        以 uid -> 手机号 映射关联寄件人/收件人（每张快递单O(1)）；快递单表已按月分区时，
+        各分区由工作进程分别生成子树（有序倒排），再多路归并为一棵树
+        :param workers: 工作进程数，默认为CPU核数；1表示在当前进程中构建
+        """
+        # 构建期间持有增量文件的排他锁：写路径的增量在构建完成后再追加，不会随旧增量一起被清除
+        with _file_lock(self.delta_path).exclusive():
+            # 1. 读取用户表（uid与手机号索引键映射，过滤无效数据）
+            uid_to_phone = {}
+            for user in iter_csv(os.path.join(DATA_DIR, "User.csv"), columns=['uid', 'uphone']):
+                uid, uphone = (user.get('uid') or '').strip(), _valid_phone(user.get('uphone'))
+                if uid and uphone:  # 验证手机号有效性
+                    uid_to_phone[uid] = self._key(uphone)
+
+            # 2. 按分区构建子树（基础表版本，变更日志中的快递单以日志为准）；
+            #    快递单表由存储引擎（如sqlite）接管时没有CSV基础表和变更日志，直接扫描引擎中的行
+            if _routed_engine(ORDER_PATH) is not None:
+                parts = [_phone_postings(iter_csv(ORDER_PATH, columns=['orderId', 'senderId', 'receiverId']),
+                                         uid_to_phone)]
+            else:
+                changes = _load_change_log(ORDER_PATH)
+                months = [month for month, _, _ in _load_partitions(ORDER_PATH) or []]
+                workers = workers or os.cpu_count() or 1
+                if len(months) > 1 and workers > 1:
+                    with ProcessPoolExecutor(min(workers, len(months)), initializer=_init_build_worker,
+                                             initargs=(uid_to_phone, set(changes))) as pool:
+                        parts = list(pool.map(_build_partition, months))
+                else:
+                    parts = [_phone_postings(_iter_base_records(ORDER_PATH), uid_to_phone, changes)]
+                parts.append(_phone_postings((order for order in changes.values() if order is not None),
+                                             uid_to_phone))
+            # 已归档的快递单同样可按手机号查询（归档不调用写路径钩子，索引中的单号保持不变）
+            parts.append(_phone_postings(iter_archived_orders(), uid_to_phone))
+
+            # 3. 归并子树，重建压缩基数树（替换现有索引）
+            phones, postings = [], []
+            for phone, order_id in merge(*parts):
+                if not phones or phones[-1] != phone:
+                    phones.append(phone)
+                    postings.append([])
+                if not postings[-1] or postings[-1][-1] != order_id:
+                    postings[-1].append(order_id)
+            self._set_arrays(phones, postings)
+
+            # 4. 保存索引
+            self.save()
+        print(f"{self.DESCRIPTION}构建完成")
         return True
 
     def save(self):
-        """保存索引到文件"""
+        """保存索引到文件（先写临时文件再替换），已并入的增量文件随之删除；调用方需持有增量文件的排他锁"""
         os.makedirs(INDEX_DIR, exist_ok=True)
-        with open(self.index_path, 'wb') as f:
-            pickle.dump(self, f)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, len(self.post_lo), len(self.labels),
+                                     len(self.order_offsets) - 1, len(self.order_blob)))
+            for name in self.NODE_ARRAYS:
+                getattr(self, name).tofile(f)
+            f.write(self.labels)
+            self.order_offsets.tofile(f)
+            f.write(self.order_blob)
+        os.replace(tmp_path, self.index_path)
+        if os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
+        self._overlay = {}
+        self._signature = _file_signature(self.index_path)
+        self._delta_pos = self._delta_count = 0
 
-    def load(self) -> bool:
-        """从文件加载索引"""
-        if os.path.exists(self.index_path):
+    def _load_file(self) -> bool:
+        """读取主索引文件（文件不存在或格式不符时返回False）"""
+        try:
             with open(self.index_path, 'rb') as f:
-                loaded = pickle.load(f)
-                self.root = loaded.root
-                return True
-        return False
+                data = f.read()
+            magic, nodes, label_bytes, count, blob_bytes = self.HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return False
+        item = array('I').itemsize
+        if magic != self.MAGIC or \
+                len(data) != self.HEADER.size + (len(self.NODE_ARRAYS) * nodes + count + 1) * item + label_bytes + blob_bytes:
+            return False
+        pos = self.HEADER.size
+        for name in self.NODE_ARRAYS:
+            values = array('I')
+            values.frombytes(data[pos:pos + nodes * item])
+            setattr(self, name, values)
+            pos += nodes * item
+        self.labels = data[pos:pos + label_bytes]
+        pos += label_bytes
+        self.order_offsets = array('I')
+        self.order_offsets.frombytes(data[pos:pos + (count + 1) * item])
+        pos += (count + 1) * item
+        self.order_blob = data[pos:]
+        return True
+
+    def load(self) -> bool:
+        """从文件加载索引并重放增量（主索引未变化时只重放新增的增量；文件不存在或格式不符时返回False）"""
+        with _file_lock(self.delta_path).shared():
+            signature = _file_signature(self.index_path)
+            if signature is None:
+                return False
+            if signature != self._signature:
+                if not self._load_file():
+                    return False
+                self._overlay = {}
+                self._signature = signature
+                self._delta_pos = self._delta_count = 0
+            self._replay_delta()
+        return True
+
+    def _replay_delta(self):
+        """重放增量文件中尚未应用的条目（只处理完整的行）"""
+        try:
+            with open(self.delta_path, 'rb') as f:
+                f.seek(self._delta_pos)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].decode('utf-8').splitlines():
+            op, phone, order_id = line.split(',', 2)
+            self._overlay.setdefault(phone, {})[order_id] = op == 'I'
+            self._delta_count += 1
+        self._delta_pos += end
+
+    def _append_delta(self, entries):
+        """
+        追加一批增量 [(操作, 手机号, 单号)] 并应用到内存，增量足够多时合并回主索引
+        索引尚未建立时不做任何事（首次build时会包含这些数据）
+        """
+        if not entries:
+            return True
+        with _file_lock(self.delta_path).exclusive():
+            if not self.load():  # 先补齐其他进程追加的增量
+                return False
+            with open(self.delta_path, 'a', encoding='utf-8', newline='') as f:
+                f.writelines(f"{op},{phone},{order_id}\n" for op, phone, order_id in entries)
+            self._delta_pos = os.path.getsize(self.delta_path)
+            for op, phone, order_id in entries:
+                self._overlay.setdefault(phone, {})[order_id] = op == 'I'
+            self._delta_count += len(entries)
+            if self._delta_count >= max(PHONE_DELTA_MIN_ENTRIES, (len(self.order_offsets) - 1) * PHONE_DELTA_RATIO):
+                # 合并：由主索引与叠加层归并出完整倒排后重建数组（不读取数据表）
+                groups = list(self._iter_groups(''))
+                self._set_arrays([phone for phone, _ in groups], [order_ids for _, order_ids in groups])
+                self.save()
+        return True
+
+    def _keys(self, phones):
+        """有效手机号对应的索引键（无效手机号跳过）"""
+        return [self._key(phone) for phone in map(_valid_phone, phones) if phone]
+
+    def add_order(self, order_id, phones):
+        """新增快递单后调用：登记寄件人、收件人的手机号（无效手机号跳过）"""
+        return self._append_delta([('I', key, order_id) for key in self._keys(phones)])
+
+    def add_orders(self, orders):
+        """批量新增快递单后调用：orders 为 [(单号, [手机号])]，一次追加全部增量"""
+        return self._append_delta([('I', key, order_id) for order_id, phones in orders
+                                   for key in self._keys(phones)])
+
+    def remove_order(self, order_id, phones):
+        """删除快递单后调用：从寄件人、收件人的手机号下移除该快递单"""
+        return self._append_delta([('D', key, order_id) for key in self._keys(phones)])
+
+    def update_order_phones(self, orders):
+        """
+        用户修改手机号后调用：只移动该用户作为寄件人/收件人的快递单
+        （与其他用户共用旧手机号时，其他用户的快递单不受影响；同一快递单另一方仍使用旧手机号时保留旧手机号下的条目）
+        :param orders: [(单号, 旧手机号列表, 新手机号列表)]
+        """
+        entries = []
+        for order_id, old_phones, new_phones in orders:
+            old_keys, new_keys = set(self._keys(old_phones)), set(self._keys(new_phones))
+            entries += [('D', key, order_id) for key in sorted(old_keys - new_keys)]
+            entries += [('I', key, order_id) for key in sorted(new_keys - old_keys)]
+        return self._append_delta(entries)
 
     def rebuild(self):
-        """重建索引（数据更新后调用）"""
-        return self.build()
\ No newline at end of file
+        """重建索引（从数据表完整重建；日常写入由增量维护，无需调用）"""
+        return self.build()
+
+
+class PhoneSuffixIndex(PhoneTrieIndex):
+    """手机号尾号索引：以反转后的手机号为键的同结构基数树（增量维护、构建方式与前缀索引相同）"""
+    NAME = "phone_suffix_trie"
+    DESCRIPTION = "手机号尾号-Trie索引"
+    MAGIC = b'TS2TRIS1'
+
+    @staticmethod
+    def _key(phone):
+        return phone[::-1]
+
+    def iter_suffix(self, suffix: str):
+        """按反转手机号顺序流式产出尾号匹配的快递单ID（去重）"""
+        return self.iter_prefix(suffix[::-1])
+
+    def search_suffix(self, suffix: str, limit=None) -> list:
+        """
+        根据手机号尾号查询快递单ID（如后4位 "8001"）
+        :param limit: 最多返回的快递单数，None表示不限
+        """
+        return self.search_prefix(suffix[::-1], limit=limit)
+
+
+_phone_trie = None
+_phone_suffix_index = None
+
+
+def get_phone_trie():
+    """获取（进程内共享的）手机号前缀索引实例，其他进程追加的增量在下次查询时自动补齐"""
+    global _phone_trie
+    if _phone_trie is None:
+        _phone_trie = PhoneTrieIndex()
+    return _phone_trie
+
+
+def get_phone_suffix_index():
+    """获取（进程内共享的）手机号尾号索引实例"""
+    global _phone_suffix_index
+    if _phone_suffix_index is None:
+        _phone_suffix_index = PhoneSuffixIndex()
+    return _phone_suffix_index
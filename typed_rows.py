@@ -0,0 +1,158 @@
+# typed_rows.py
+"""
+快递单/轨迹的紧凑类型化行表示
+
+read_csv 返回的每一行都是只含字符串的字典，百万级快递单时字典本身的开销就有
+每行数百字节，而 goodsWeight、orderStatus、时间字段又被每个使用方反复解析。
+这里按表结构（schema）一次性解析为 __slots__ 记录：
+- 重量为 float，状态为 int，时间为 epoch 秒（int）
+- 网点ID、用户ID等高重复字段经 sys.intern 驻留，同值共享同一个字符串对象
+- 属性访问返回类型化的值（record.goodsWeight -> 2.5）
+- 下标访问返回CSV中的原文（record['goodsWeight'] -> '2.5'，'NULL'、'2024/12/10 8:30' 等原样返回）：
+  解析会丢失原文的字段（数值、时间）另存一份驻留的原文，因此可直接交给
+  GUI.update_tree_view、write_csv 等按字典使用的代码，写回时与原数据逐字一致；记录视为只读
+
+按需使用（opt-in）：read_csv / iter_csv / query_* 仍返回字符串字典，这是GUI、视图和变更日志等
+全部调用方依赖的接口；需要在内存中长期持有大量快递单/轨迹并反复按数值、时间计算的代码
+（如统计分析、benchmark.py rows）再用 load_express_orders / load_express_tracks 加载
+"""
+
+import os
+import sys
+from collections.abc import Mapping
+
+from db_core import DATA_DIR, iter_csv, parse_time
+
+
+# ==================== 字段类型（解析函数） ====================
+
+def _parse_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_small_int(value):
+    return int(value) if value and value.isdigit() else None
+
+
+def _intern(value):
+    return sys.intern(value) if value is not None else None
+
+
+FIELD_TYPES = {
+    'str': lambda v: v,          # 原样保存
+    'id': _intern,               # 驻留字符串（高重复ID）
+    'float': _parse_float,       # 浮点数
+    'int': _parse_small_int,     # 小整数（状态/类型码）
+    'time': parse_time,          # epoch秒
+}
+# 解析后无法还原原文的类型（如 '1234567' -> 1234567.0、'NULL' -> None），原文另存
+RAW_KINDS = ('float', 'int', 'time')
+
+
+class TypedRecord(Mapping):
+    """类型化记录基类：子类通过 SCHEMA 声明 (字段名, 类型) 并设置同名 __slots__ 及 _raw"""
+    __slots__ = ()
+    SCHEMA = ()
+    _parsers = ()      # ((字段名, 解析函数), ...)，由 __init_subclass__ 按SCHEMA生成
+    _raw_fields = ()   # 另存原文的字段名（按 _raw 中的顺序）
+    _raw_pos = {}      # {字段名: 在 _raw 中的位置}
+    _fields = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._parsers = tuple((name, FIELD_TYPES[kind]) for name, kind in cls.SCHEMA)
+        cls._raw_fields = tuple(name for name, kind in cls.SCHEMA if kind in RAW_KINDS)
+        cls._raw_pos = {name: i for i, name in enumerate(cls._raw_fields)}
+        cls._fields = frozenset(name for name, _ in cls.SCHEMA)
+
+    def __init__(self, row):
+        """由CSV行字典构建（按schema解析各字段，数值/时间字段的原文驻留后另存）"""
+        get = row.get
+        for name, parse in self._parsers:
+            setattr(self, name, parse(get(name)))
+        self._raw = tuple(sys.intern(get(name) or '') for name in self._raw_fields)
+
+    # ---- 字典兼容视图（值为CSV中的原文）----
+    def __getitem__(self, key):
+        pos = self._raw_pos.get(key)
+        if pos is not None:
+            return self._raw[pos]
+        if key not in self._fields:
+            raise KeyError(key)
+        value = getattr(self, key)
+        return '' if value is None else value
+
+    def __iter__(self):
+        return (name for name, _ in self.SCHEMA)
+
+    def __len__(self):
+        return len(self.SCHEMA)
+
+    def to_dict(self):
+        """转换为普通字符串字典（与read_csv返回的行格式一致）"""
+        return {name: self[name] for name in self}
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name, _ in self.SCHEMA)
+        return f"{type(self).__name__}({fields})"
+
+
+class ExpressOrderRecord(TypedRecord):
+    """快递单记录"""
+    SCHEMA = (
+        ('orderId', 'str'),
+        ('senderId', 'id'),
+        ('receiverId', 'id'),
+        ('goodsName', 'id'),
+        ('goodsWeight', 'float'),
+        ('sendBranchId', 'id'),
+        ('targetBranchId', 'id'),
+        ('sendTime', 'time'),
+        ('estimatedTime', 'time'),
+        ('orderStatus', 'int'),
+    )
+    __slots__ = tuple(name for name, _ in SCHEMA) + ('_raw',)
+
+
+class ExpressTrackRecord(TypedRecord):
+    """快递轨迹记录"""
+    SCHEMA = (
+        ('orderId', 'id'),
+        ('operateBranchId', 'id'),
+        ('prevBranchId', 'id'),
+        ('nextBranchId', 'id'),
+        ('operateType', 'int'),
+        ('operateTime', 'time'),
+    )
+    __slots__ = tuple(name for name, _ in SCHEMA) + ('_raw',)
+
+
+# ==================== 加载接口 ====================
+
+def load_typed(table_name, record_class, predicate=None):
+    """
+    流式读取表并逐行转换为类型化记录（已合并变更日志）
+
+    Args:
+        table_name: 表名（如 "ExpressOrder"）
+        record_class: 记录类型（ExpressOrderRecord / ExpressTrackRecord）
+        predicate: 可选的行过滤函数（作用于原始字符串行，在转换前过滤）
+
+    Returns:
+        记录列表
+    """
+    file_path = os.path.join(DATA_DIR, f"{table_name}.csv")
+    return [record_class(row) for row in iter_csv(file_path, predicate=predicate)]
+
+
+def load_express_orders(predicate=None):
+    """加载快递单为 ExpressOrderRecord 列表"""
+    return load_typed("ExpressOrder", ExpressOrderRecord, predicate)
+
+
+def load_express_tracks(predicate=None):
+    """加载快递轨迹为 ExpressTrackRecord 列表"""
+    return load_typed("ExpressTrack", ExpressTrackRecord, predicate)